@@ -0,0 +1,42 @@
+"""Compares the row by row pydantic formatting path against the columnar one on a full year of games
+
+usage:
+    python -m benchmarks.bench_formatting --year 2019
+"""
+import argparse
+import time
+
+from src.data.data_scraping import get_raw_games
+from src.data.data_formatting import raw_game_to_objects, format_game_batches, batch_to_records
+
+
+def row_path(game_data):
+    return game_data.apply(lambda game_row: raw_game_to_objects(game_row), axis=1, result_type='expand').values
+
+
+def columnar_path(game_data):
+    return [batch_to_records(batch) for batch in format_game_batches(game_data)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--year', type=int, default=2019)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    game_data = get_raw_games(args.year, args.year)
+    game_data = game_data.rename(columns={'winner_id': 'w_id', 'loser_id': 'l_id'})
+    print(f'{len(game_data)} games ({args.year})')
+
+    for name, path in [('row', row_path), ('columnar', columnar_path)]:
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            path(game_data)
+            timings.append(time.perf_counter() - start)
+        best = min(timings)
+        print(f'{name:>10}: {best:.3f}s best of {args.repeat} ({len(game_data) / best:,.0f} games/s)')
+
+
+if __name__ == '__main__':
+    main()
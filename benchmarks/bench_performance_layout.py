@@ -0,0 +1,111 @@
+"""Per player query latency on the single performance table against the winning / losing table split it replaced
+
+Both layouts are seeded with the same synthetic games into one throwaway sqlite db (so they share the page cache), pass
+--db-url to seed an empty mysql database instead
+
+usage:
+    python -m benchmarks.bench_performance_layout --games 500000 --players 20000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import create_engine, select, func, union_all, MetaData, Table, Column, Integer, SmallInteger, String, Boolean
+from sqlalchemy.engine import Engine
+
+from benchmarks.bench_schema import synthetic_rows, after_metadata, seed
+from src.db.models.orm.game import Game as ORMGame
+from src.db.models.orm.tournament import Tournament as ORMTournament
+from src.db.models.orm.performance import Performance as ORMPerformance, PERFORMANCE_STATS
+from src.constants import API_PAGE_LIMIT
+
+
+def split_tables(metadata: MetaData) -> dict:
+    """The winning and losing performance tables as they were, one performance per game each
+    """
+    return {won: Table(name, metadata,
+                       Column('id', Integer, primary_key=True),
+                       *[Column(stat, SmallInteger) for stat in PERFORMANCE_STATS],
+                       Column('won', Boolean, nullable=False),
+                       Column('game_id', String(50), unique=True),
+                       Column('player_id', Integer, index=True))
+            for name, won in [('wperformance', True), ('lperformance', False)]}
+
+
+def games_page(game_ids):
+    return select(ORMGame.id).join(ORMTournament, ORMGame.tournament_id == ORMTournament.id).\
+        where(ORMGame.id.in_(game_ids)).order_by(ORMTournament.start_date, ORMGame.id).limit(API_PAGE_LIMIT)
+
+
+def queries(split: dict) -> dict:
+    """name -> (split layout, single table) statement per player id
+    """
+    performance = ORMPerformance.__table__
+
+    def split_union(player_id, *columns):
+        return union_all(*[select(*[table.c[column] for column in columns]).where(table.c.player_id == player_id)
+                           for table in split.values()])
+
+    def single(player_id, *columns):
+        return select(*[performance.c[column] for column in columns]).where(performance.c.player_id == player_id)
+
+    def record(performances):
+        return select(performances.c.won, func.count()).group_by(performances.c.won)
+
+    def totals(performances):
+        return select(*[func.sum(performances.c[stat]) for stat in PERFORMANCE_STATS])
+
+    return {
+        'game ids': (lambda player_id: split_union(player_id, 'game_id'),
+                     lambda player_id: single(player_id, 'game_id')),
+        # /player/{id}/games
+        'games page': (lambda player_id: games_page(split_union(player_id, 'game_id')),
+                       lambda player_id: games_page(single(player_id, 'game_id'))),
+        'win / loss record': (lambda player_id: record(split_union(player_id, 'won').subquery()),
+                              lambda player_id: record(single(player_id, 'won').subquery())),
+        'stat totals': (lambda player_id: totals(split_union(player_id, *PERFORMANCE_STATS).subquery()),
+                        lambda player_id: totals(single(player_id, *PERFORMANCE_STATS).subquery())),
+    }
+
+
+def time_query(engine: Engine, statement, player_ids: list) -> float:
+    with engine.connect() as conn:
+        start = time.perf_counter()
+        for player_id in player_ids:
+            conn.execute(statement(player_id)).all()
+        return (time.perf_counter() - start) / len(player_ids)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--db-url', help='empty database to seed both layouts into, sqlite if not given')
+    parser.add_argument('--games', type=int, default=500000)
+    parser.add_argument('--players', type=int, default=20000)
+    parser.add_argument('--n', type=int, default=2000, help='players queried')
+    args = parser.parse_args()
+
+    engine = create_engine(args.db_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'layout.db')}")
+    rows = synthetic_rows(args.games, args.players)
+
+    start = time.perf_counter()
+    seed(engine, after_metadata(), rows)
+    split = split_tables(MetaData())
+    split[True].metadata.create_all(engine)
+    with engine.begin() as conn:
+        for won, table in split.items():
+            conn.execute(table.insert(), [row for row in rows['performance'] if row['won'] == won])
+    print(f'seeded {args.games:,} games in {time.perf_counter() - start:.1f}s')
+
+    rng = random.Random(1)
+    player_ids = [rng.randrange(args.players) for _ in range(args.n)]
+
+    print(f"\n{'query':>20} {'split':>10} {'single':>10}")
+    for name, (split_statement, single_statement) in queries(split).items():
+        before, after = time_query(engine, split_statement, player_ids), time_query(engine, single_statement, player_ids)
+        print(f'{name:>20} {before * 1e6:>8.0f}us {after * 1e6:>8.0f}us')
+
+
+if __name__ == '__main__':
+    main()
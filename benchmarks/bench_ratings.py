@@ -0,0 +1,75 @@
+"""Replays a full match history through the Elo engine (layered numpy updates) against rating one game at a time
+
+By default replays a synthetic history roughly the size of the full WTA + ITF one, pass --db-url to replay the games
+stored in an existing db instead (i.e. mysql+pymysql://...)
+
+usage:
+    python -m benchmarks.bench_ratings --games 1000000 --players 30000
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from src.ratings import EloRatings, order_games, RATING_GAME_COLUMNS
+from src.db.db import DBClient, QueryDB
+from src.constants import ELO_OVERALL, ELO_INITIAL_RATING, ELO_K, ROUND_ORDER
+
+
+def synthetic_games(n_games: int, n_players: int, games_per_tournament: int = 31) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    winners = rng.integers(0, n_players, n_games)
+    losers = (winners + rng.integers(1, n_players, n_games)) % n_players
+    tournaments = np.arange(n_games) // games_per_tournament
+    return pd.DataFrame({'id': [f'{tournament}_{i}' for i, tournament in enumerate(tournaments)],
+                         # a few tournaments start each week
+                         'start_date': [datetime(1968, 1, 1) + timedelta(weeks=int(week)) for week in tournaments // 8],
+                         'round': rng.choice(ROUND_ORDER, n_games),
+                         'surface': rng.choice(['Hard', 'Clay', 'Grass', 'Carpet'], n_games),
+                         'winner_id': winners, 'loser_id': losers}, columns=RATING_GAME_COLUMNS)
+
+
+def sequential(games: pd.DataFrame) -> dict:
+    ratings = {}
+    for winner_id, loser_id, surface in zip(games['winner_id'].tolist(), games['loser_id'].tolist(), games['surface'].tolist()):
+        for key in [ELO_OVERALL, surface]:
+            winner, loser = ratings.get((winner_id, key), ELO_INITIAL_RATING), ratings.get((loser_id, key), ELO_INITIAL_RATING)
+            delta = ELO_K * (1 - 1 / (1 + 10 ** ((loser - winner) / 400)))
+            ratings[winner_id, key], ratings[loser_id, key] = winner + delta, loser - delta
+    return ratings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--db-url', help='sync database url to read games from, synthetic games if not given')
+    parser.add_argument('--games', type=int, default=1000000)
+    parser.add_argument('--players', type=int, default=30000)
+    args = parser.parse_args()
+
+    if args.db_url:
+        games = QueryDB(DBClient(db_url=args.db_url).session).get_rating_games(unrated_only=False)
+    else:
+        games = synthetic_games(args.games, args.players)
+    print(f'{len(games):,} games')
+
+    start = time.perf_counter()
+    games = order_games(games)
+    print(f'   order: {time.perf_counter() - start:.2f}s')
+
+    start = time.perf_counter()
+    ratings = EloRatings()
+    ratings.rate(games)
+    print(f'  layered: {time.perf_counter() - start:.2f}s')
+
+    start = time.perf_counter()
+    expected = sequential(games)
+    print(f'sequential: {time.perf_counter() - start:.2f}s')
+
+    error = max(abs(ratings[key] - rating) for key, rating in expected.items())
+    print(f'max rating difference {error:.2e}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""Table size and query latency of the compact schema against the schema as first released (FLOAT stats, DATETIME dates,
+VARCHAR(50) codes, no tournament start date index)
+
+Builds both schemas in throwaway sqlite dbs by default and seeds them with the same synthetic games, pass --before-url
+and --after-url to run against two empty mysql databases instead (sizes then come from information_schema)
+
+usage:
+    python -m benchmarks.bench_schema --games 200000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, select, func, text, MetaData, Float, Integer, String, DateTime, SmallInteger
+from sqlalchemy.engine import Engine
+
+from src.db.db import _player_stats_select
+from src.db.models.orm.base import Base as ORMBase
+from src.db.models.orm.types import DateTimeDate
+from src.db.models.orm.player import Player as ORMPlayer  # noqa: F401, registers the player table
+from src.db.models.orm.game import Game as ORMGame
+from src.db.models.orm.tournament import Tournament as ORMTournament
+from src.db.models.orm.performance import Performance as ORMPerformance, PERFORMANCE_STATS
+from src.constants import ROUND_ORDER, WTA_IDENTIFIER
+
+TABLES = ['player', 'tournament', 'game', 'performance']
+
+
+def before_metadata() -> MetaData:
+    """The models' tables with the column types they were first created with
+    """
+    metadata = MetaData()
+    for name in TABLES:
+        table = ORMBase.metadata.tables[name].to_metadata(metadata)
+        for column in table.columns:
+            if isinstance(column.type, DateTimeDate):
+                column.type = DateTime()
+            elif isinstance(column.type, String) and column.type.length == 10:
+                column.type = String(50)
+            elif isinstance(column.type, SmallInteger):
+                column.type = Float() if column.name in PERFORMANCE_STATS else Integer()
+        for index in list(table.indexes):
+            if 'start_date' in index.columns:
+                table.indexes.remove(index)
+    return metadata
+
+
+def after_metadata() -> MetaData:
+    metadata = MetaData()
+    for name in TABLES:
+        ORMBase.metadata.tables[name].to_metadata(metadata)
+    return metadata
+
+
+def synthetic_rows(n_games: int, n_players: int, games_per_tournament: int = 31) -> dict:
+    rng = random.Random(0)
+    n_tournaments = n_games // games_per_tournament + 1
+    players = [{'id': i, 'first_name': f'First{i}', 'last_name': f'Last{i}', 'nationality': 'USA', 'hand': 'R',
+                'dob': datetime(1960, 1, 1) + timedelta(days=rng.randrange(15000))} for i in range(n_players)]
+    tournaments = [{'id': f'{i}', 'name': f'Tournament {i}', 'surface': rng.choice(['Hard', 'Clay', 'Grass']),
+                    'draw_size': 32, 'level': 'I', 'start_date': datetime(1968, 1, 1) + timedelta(weeks=i // 8)}
+                   for i in range(n_tournaments)]
+    games, performances = [], []
+    for i in range(n_games):
+        game_id = f'{i // games_per_tournament}_{i}'
+        games.append({'id': game_id, 'tournament_id': f'{i // games_per_tournament}', 'round': rng.choice(ROUND_ORDER),
+                      'score': '6-4 6-4', 'circuit': WTA_IDENTIFIER})
+        for won in [True, False]:
+            performances.append({'game_id': game_id, 'player_id': rng.randrange(n_players), 'won': won,
+                                 **{stat: rng.randrange(80) for stat in PERFORMANCE_STATS}})
+    return {'player': players, 'tournament': tournaments, 'game': games, 'performance': performances}
+
+
+def seed(engine: Engine, metadata: MetaData, rows: dict, chunk_size: int = 10000) -> None:
+    metadata.create_all(engine)
+    with engine.begin() as conn:
+        for name in TABLES:
+            for i in range(0, len(rows[name]), chunk_size):
+                conn.execute(metadata.tables[name].insert(), rows[name][i:i + chunk_size])
+    if engine.dialect.name == 'sqlite':
+        with engine.connect() as conn:
+            conn.exec_driver_sql('VACUUM')
+
+
+def table_sizes(engine: Engine) -> dict:
+    with engine.connect() as conn:
+        if engine.dialect.name == 'sqlite':
+            # dbstat counts pages per table and index
+            rows = conn.exec_driver_sql('SELECT name, SUM(pgsize) FROM dbstat GROUP BY name').all()
+            return dict(rows)
+        conn.exec_driver_sql('ANALYZE TABLE ' + ', '.join(TABLES))
+        rows = conn.execute(text('SELECT table_name, data_length + index_length FROM information_schema.tables '
+                                 'WHERE table_schema = DATABASE()')).all()
+        return dict(rows)
+
+
+def queries(n_players: int) -> dict:
+    rng = random.Random(1)
+    return {
+        # export and listing year ranges
+        'games in a year': lambda: select(ORMGame.id).join(ORMTournament, ORMGame.tournament_id == ORMTournament.id).
+        where(ORMTournament.start_date >= datetime(2000, 1, 1), ORMTournament.start_date < datetime(2001, 1, 1)).
+        order_by(ORMTournament.start_date, ORMGame.id),
+        # player stats refresh
+        'player stats for a year': lambda: _player_stats_select(2000, 2000, None),
+        'player games': lambda: select(ORMGame.id).where(ORMGame.id.in_(
+            select(ORMPerformance.game_id).where(ORMPerformance.player_id == rng.randrange(n_players)))),
+        'serve totals': lambda: select(*[func.sum(getattr(ORMPerformance, stat)) for stat in PERFORMANCE_STATS]),
+    }
+
+
+def time_query(engine: Engine, statement, n: int) -> float:
+    with engine.connect() as conn:
+        start = time.perf_counter()
+        for _ in range(n):
+            conn.execute(statement()).all()
+        return (time.perf_counter() - start) / n
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--before-url', help='empty database for the old schema, sqlite if not given')
+    parser.add_argument('--after-url', help='empty database for the new schema, sqlite if not given')
+    parser.add_argument('--games', type=int, default=200000)
+    parser.add_argument('--players', type=int, default=20000)
+    parser.add_argument('--n', type=int, default=20)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    engines = {'before': create_engine(args.before_url or f"sqlite:///{os.path.join(tmp, 'before.db')}"),
+               'after': create_engine(args.after_url or f"sqlite:///{os.path.join(tmp, 'after.db')}")}
+
+    rows = synthetic_rows(args.games, args.players)
+    for name, metadata in [('before', before_metadata()), ('after', after_metadata())]:
+        start = time.perf_counter()
+        seed(engines[name], metadata, rows)
+        print(f'seeded {name} in {time.perf_counter() - start:.1f}s')
+
+    sizes = {name: table_sizes(engine) for name, engine in engines.items()}
+    print(f"\n{'table/index':>32} {'before':>10} {'after':>10}")
+    for table in sorted(set(sizes['before']) | set(sizes['after'])):
+        before, after = sizes['before'].get(table, 0), sizes['after'].get(table, 0)
+        print(f'{table:>32} {before / 2 ** 20:>8.1f}MB {after / 2 ** 20:>8.1f}MB')
+    print(f"{'total':>32} {sum(sizes['before'].values()) / 2 ** 20:>8.1f}MB {sum(sizes['after'].values()) / 2 ** 20:>8.1f}MB")
+
+    print(f"\n{'query':>32} {'before':>10} {'after':>10}")
+    for name, statement in queries(args.players).items():
+        before, after = (time_query(engines[schema], statement, args.n) for schema in ['before', 'after'])
+        print(f'{name:>32} {before * 1000:>8.2f}ms {after * 1000:>8.2f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Build time and per query latency of the player name index over a player list the size of wta_players.csv
+
+Uses random names by default, pass --players-csv to index a real players file (i.e. a downloaded wta_players.csv)
+
+usage:
+    python -m benchmarks.bench_search --players 50000
+"""
+import argparse
+import random
+import string
+import time
+
+import pandas as pd
+
+from src.search import PlayerIndex
+
+
+QUERIES = ['s', 'wi', 'serena', 'williams', 'will', 'williams s', 'safarova', 'illia', 'a b', 'mar']
+
+
+def random_players(n: int) -> list:
+    rng = random.Random(0)
+
+    def name():
+        return ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 10))).title()
+    return [(name(), name(), i) for i in range(n)] + [('Serena', 'Williams', -1), ('Lucie', 'Šafářová', -2)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--players', type=int, default=50000)
+    parser.add_argument('--players-csv', help='index the players in this csv instead')
+    parser.add_argument('--n', type=int, default=10000)
+    args = parser.parse_args()
+
+    if args.players_csv:
+        players = pd.read_csv(args.players_csv, encoding='ISO-8859-1')
+        entries = list(zip(players['X'], players['X.1'], players['200000']))
+    else:
+        entries = random_players(args.players)
+
+    start = time.perf_counter()
+    index = PlayerIndex(entries)
+    print(f'indexed {len(index):,} players in {time.perf_counter() - start:.2f}s')
+
+    for query in QUERIES:
+        start = time.perf_counter()
+        for _ in range(args.n):
+            index.search(query)
+        print(f'{query!r:>14}: {(time.perf_counter() - start) / args.n * 1e6:.1f}us')
+
+
+if __name__ == '__main__':
+    main()
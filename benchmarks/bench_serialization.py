@@ -0,0 +1,74 @@
+"""Per request cost of turning an orm Game (tournament, both performances and players) into a response body,
+through the response model as FastAPI does by default against the precompiled encoder + orjson fast path
+
+usage:
+    python -m benchmarks.bench_serialization --n 20000
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime
+
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from fastapi.responses import JSONResponse
+
+from src.serialization import Serializer
+from src.db.models.orm.player import Player as ORMPlayer
+from src.db.models.orm.tournament import Tournament as ORMTournament
+from src.db.models.orm.game import Game as ORMGame
+from src.db.models.orm.performance import Performance as ORMPerformance
+from src.db.models.pydantic.game import Game
+from src.constants import WTA_IDENTIFIER
+
+
+def build_game() -> ORMGame:
+    def performance(id, won):
+        player = ORMPlayer(id=id, first_name='First', last_name='Last', nationality='USA', dob=datetime(2000, 1, 1), hand='R')
+        return ORMPerformance(id=id, game_id='2020-1_1', player_id=id, player=player, won=won, aces=3., double_faults=1.,
+                     serve_points=60., first_serve_in=40., first_serve_won=30., second_serve_won=10., serve_games=10.,
+                     break_points_faced=4., break_points_saved=2.)
+
+    tournament = ORMTournament(id='2020-1', name='Test', surface='Hard', draw_size=32, level='P', start_date=datetime(2020, 1, 6))
+    return ORMGame(id='2020-1_1', tournament=tournament, w_performance=performance(1, True),
+                   l_performance=performance(2, False), round='F', score='6-0 6-0', circuit=WTA_IDENTIFIER)
+
+
+async def validated_path(game: ORMGame, n: int) -> bytes:
+    # from_orm in the route, then FastAPI validates the response again and encodes it
+    field = create_response_field(name='response', type_=Game)
+    serializer = Serializer(fast=False)
+    for _ in range(n):
+        content = await serialize_response(field=field, response_content=serializer.from_orm(game, Game))
+        body = JSONResponse(content).body
+    return body
+
+
+async def fast_path(game: ORMGame, n: int) -> bytes:
+    # response returned directly so FastAPI skips its own validation
+    serializer = Serializer(fast=True)
+    for _ in range(n):
+        body = serializer.respond(serializer.from_orm(game, Game)).body
+    return body
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--n', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    game = build_game()
+    loop = asyncio.new_event_loop()
+    for name, path in [('validated', validated_path), ('fast', fast_path)]:
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            loop.run_until_complete(path(game, args.n))
+            timings.append(time.perf_counter() - start)
+        best = min(timings)
+        print(f'{name:>10}: {best / args.n * 1e6:.1f}us per game response, best of {args.repeat} ({args.n} responses)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+"""Compares sync and async throughput of the read endpoints against a local db
+
+By default seeds a throwaway sqlite db, pass --sync-url and --async-url to hit an existing one (i.e. the mysql instance,
+mysql+pymysql:// and mysql+aiomysql://). Each variant is served by uvicorn in a child process while a pool of threads
+fires requests at it.
+
+usage:
+    python -m benchmarks.load_test --requests 2000 --concurrency 32
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import socket
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Generator
+
+import requests
+import uvicorn
+from fastapi import FastAPI, Depends, HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.main import app as async_app, get_db_client
+from src.db.db import DBClient, CommandDB, QueryDB
+from src.db.async_db import AsyncDBClient
+from src.db.models.orm.player import Player as ORMPlayer
+from src.db.models.pydantic.player import Player
+from src.db.models.orm.tournament import Tournament as ORMTournament
+from src.db.models.orm.game import Game as ORMGame
+from src.db.models.pydantic.game import Game
+from src.db.models.orm.performance import Performance as ORMPerformance
+from src.constants import WTA_IDENTIFIER
+
+
+def seed(sync_url: str, n_players: int, n_games: int) -> None:
+    db = DBClient(db_url=sync_url)
+    db.generate_schema()
+    command_db = CommandDB(db.session)
+    command_db.ingest_rows([{'id': i, 'first_name': f'First{i}', 'last_name': f'Last{i}', 'nationality': 'USA', 'hand': 'R'}
+                            for i in range(n_players)], ORMPlayer, bulk=True)
+    command_db.ingest_rows([{'id': 'bench', 'name': 'Bench', 'surface': 'Hard', 'draw_size': 128, 'level': 'G',
+                             'start_date': datetime(2020, 1, 1)}], ORMTournament, bulk=True)
+    command_db.ingest_rows([{'id': f'bench_{i}', 'tournament_id': 'bench', 'round': 'R128', 'score': '6-0 6-0',
+                             'circuit': WTA_IDENTIFIER} for i in range(n_games)], ORMGame, bulk=True)
+    for offset, won in [(0, True), (1, False)]:
+        command_db.ingest_rows([{'game_id': f'bench_{i}', 'player_id': (2 * i + offset) % n_players, 'won': won, 'aces': 1}
+                                for i in range(n_games)], ORMPerformance, bulk=True)
+    db.session.close()
+    db.engine.dispose()
+
+
+def build_sync_app(sync_url: str) -> FastAPI:
+    # the read endpoints as they were before the async stack, plain `def` routes run in the threadpool
+    app = FastAPI()
+    # dependency teardown runs on a different threadpool thread than the route itself
+    connect_args = {'check_same_thread': False} if sync_url.startswith('sqlite') else {}
+    Session = sessionmaker(bind=create_engine(sync_url, connect_args=connect_args))
+
+    def get_query_db() -> Generator[QueryDB, None, None]:
+        session = Session()
+        try:
+            yield QueryDB(session)
+        finally:
+            session.close()
+
+    @app.get('/player/{player_id}', response_model=Player)
+    def read_player_by_id(player_id: int, query_db: QueryDB = Depends(get_query_db)) -> Player:
+        player = query_db.get_object_by_id(player_id, ORMPlayer)
+        if player is None:
+            raise HTTPException(status_code=404, detail='Player not found')
+        return player
+
+    @app.get('/game/{game_id}', response_model=Game)
+    def read_game_by_id(game_id: str, query_db: QueryDB = Depends(get_query_db)) -> Game:
+        game = query_db.get_object_by_id(game_id, ORMGame)
+        if game is None:
+            raise HTTPException(status_code=404, detail='Game not found')
+        return game
+
+    return app
+
+
+def serve(variant: str, url: str, port: int) -> None:
+    if variant == 'sync':
+        app = build_sync_app(url)
+    else:
+        db = AsyncDBClient(db_url=url)
+        async_app.dependency_overrides[get_db_client] = lambda: db
+        app = async_app
+    uvicorn.run(app, host='127.0.0.1', port=port, log_level='warning')
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(base_url: str, timeout: float = 10) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            requests.get(f'{base_url}/player/0', timeout=1)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    raise RuntimeError(f'server at {base_url} never came up')
+
+
+def run_load(base_url: str, paths: list, concurrency: int) -> tuple:
+    local = threading.local()
+
+    def get(path):
+        # one keep-alive session per client thread
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        session = local.session
+        start = time.perf_counter()
+        response = session.get(f'{base_url}{path}')
+        response.raise_for_status()
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(get, paths))
+    return time.perf_counter() - start, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sync-url', help='sync database url, seeds a temporary sqlite db if not given')
+    parser.add_argument('--async-url', help='async database url, required with --sync-url')
+    parser.add_argument('--players', type=int, default=2000)
+    parser.add_argument('--games', type=int, default=5000)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    args = parser.parse_args()
+
+    if args.sync_url:
+        if not args.async_url:
+            parser.error('--async-url is required with --sync-url')
+        sync_url, async_url = args.sync_url, args.async_url
+    else:
+        db_path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+        sync_url, async_url = f'sqlite:///{db_path}', f'sqlite+aiosqlite:///{db_path}'
+        seed(sync_url, args.players, args.games)
+        print(f'seeded {args.players} players, {args.games} games into {db_path}')
+
+    # same mix of player and game lookups for both variants
+    rng = random.Random(0)
+    paths = [f'/player/{rng.randrange(args.players)}' if rng.random() < 0.5 else f'/game/bench_{rng.randrange(args.games)}'
+             for _ in range(args.requests)]
+
+    for variant, url in [('sync', sync_url), ('async', async_url)]:
+        port = free_port()
+        server = multiprocessing.Process(target=serve, args=(variant, url, port), daemon=True)
+        server.start()
+        try:
+            base_url = f'http://127.0.0.1:{port}'
+            wait_until_up(base_url)
+            # warm up connections / pools before timing
+            run_load(base_url, paths[:args.concurrency * 2], args.concurrency)
+            elapsed, latencies = run_load(base_url, paths, args.concurrency)
+        finally:
+            server.terminate()
+            server.join()
+        latencies.sort()
+        print(f'{variant:>6}: {len(paths) / elapsed:,.0f} req/s, '
+              f'p50 {statistics.median(latencies) * 1000:.1f}ms, '
+              f'p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f}ms '
+              f'({len(paths)} requests, concurrency {args.concurrency})')
+
+
+if __name__ == '__main__':
+    main()
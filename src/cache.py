@@ -0,0 +1,164 @@
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple, Union
+from collections import OrderedDict
+import asyncio
+import logging
+import time
+
+from aioredis import Redis, RedisError
+
+from .constants import CACHE_PREFIX, CACHE_VERSION_CHANNEL
+from .settings.api import API_CACHE_CONFIG
+
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    '''
+    Bounded LRU + TTL cache of api responses, versioned by the last ingested sha
+    '''
+
+    def __init__(self,
+                 max_entries: int = API_CACHE_CONFIG['max_entries'],
+                 ttl: float = API_CACHE_CONFIG['ttl'],
+                 version_ttl: float = API_CACHE_CONFIG['version_ttl'],
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        """
+        Args:
+            max_entries (int, optional): least recently used entries evicted beyond this, 0 disables. Defaults to api_cache_config['max_entries'].
+            ttl (float, optional): seconds an entry is served for. Defaults to api_cache_config['ttl'].
+            version_ttl (float, optional): seconds between version checks. Defaults to api_cache_config['version_ttl'].
+            clock (Callable[[], float], optional): time source. Defaults to time.monotonic.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.version_ttl = version_ttl
+        self._clock = clock
+
+        # key -> (expires at, value), most recently used last
+        self._entries: 'OrderedDict[Hashable, Tuple[float, Any]]' = OrderedDict()
+        self.version: Optional[str] = None
+        self._version_expires = float('-inf')
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= self._clock():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (self._clock() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def version_expired(self) -> bool:
+        """True once `version_ttl` has passed since the version was last set, i.e. time to check for a new ingest
+        """
+        return self._version_expires <= self._clock()
+
+    def set_version(self, version: Optional[str]) -> None:
+        """Records the current data version, a change drops every entry
+
+        Args:
+            version (Optional[str]): last ingested sha
+        """
+        if version != self.version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self.version = version
+        self._version_expires = self._clock() + self.version_ttl
+
+    def stats(self) -> Dict[str, Any]:
+        return {'version': self.version, 'entries': len(self._entries), 'max_entries': self.max_entries,
+                'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'invalidations': self.invalidations}
+
+
+class RedisResponseCache:
+    '''
+    Serialized api responses in redis, shared by every api replica. Keys include the data version so a new ingest
+    never serves old responses
+    '''
+
+    def __init__(self, redis: Redis, ttl: int = API_CACHE_CONFIG['redis_ttl']) -> None:
+        self.redis = redis
+        self.ttl = ttl
+
+    @staticmethod
+    def _key(version: Optional[str], key: Tuple[str, Any]) -> str:
+        return ':'.join([CACHE_PREFIX, str(version), *map(str, key)])
+
+    async def get(self, version: Optional[str], key: Tuple[str, Any]) -> Optional[bytes]:
+        """Serialized response, None if not cached or redis unavailable (falls back to the db)
+        """
+        try:
+            return await self.redis.get(self._key(version, key))
+        except (RedisError, OSError, asyncio.TimeoutError) as e:
+            logger.warning('redis cache get failed: %r', e)
+            return None
+
+    async def set(self, version: Optional[str], key: Tuple[str, Any], payload: Union[str, bytes]) -> None:
+        try:
+            await self.redis.set(self._key(version, key), payload, expire=self.ttl)
+        except (RedisError, OSError, asyncio.TimeoutError) as e:
+            logger.warning('redis cache set failed: %r', e)
+
+    async def get_many(self, version: Optional[str], keys: List[Tuple[str, Any]]) -> List[Optional[bytes]]:
+        """`get` for many keys in one round trip, in the same order
+        """
+        try:
+            return await self.redis.mget(*(self._key(version, key) for key in keys))
+        except (RedisError, OSError, asyncio.TimeoutError) as e:
+            logger.warning('redis cache get failed: %r', e)
+            return [None] * len(keys)
+
+    async def set_many(self, version: Optional[str], payloads: Dict[Tuple[str, Any], Union[str, bytes]]) -> None:
+        """`set` for many keys in one round trip
+        """
+        pipeline = self.redis.pipeline()
+        for key, payload in payloads.items():
+            pipeline.set(self._key(version, key), payload, expire=self.ttl)
+        try:
+            await pipeline.execute()
+        except (RedisError, OSError, asyncio.TimeoutError) as e:
+            logger.warning('redis cache set failed: %r', e)
+
+
+async def publish_version(redis: Redis, version: str) -> None:
+    """Tells every api replica a new sha was ingested, called by the worker after each ingest
+
+    Args:
+        redis (Redis): i.e. arq's redis connection
+        version (str): last ingested sha
+    """
+    await redis.publish(CACHE_VERSION_CHANNEL, version)
+
+
+async def subscribe_versions(redis: Redis, cache: ResponseCache) -> None:
+    """Moves the in process cache to each version published, runs until cancelled
+
+    Args:
+        redis (Redis): redis the worker publishes to
+        cache (ResponseCache): this replica's cache
+    """
+    channel, = await redis.subscribe(CACHE_VERSION_CHANNEL)
+    async for version in channel.iter(encoding='utf-8'):
+        cache.set_version(version)
@@ -9,10 +9,50 @@ SOURCE_COL = 'source'
 
 WTA_IDENTIFIER = 'WAT'
 ITF_IDENTIFIER = 'ITF'
+CIRCUITS = [WTA_IDENTIFIER, ITF_IDENTIFIER]
 
 SCRAPING_HEADER = {
     'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_12_2) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/55.0.2883.95 Safari/537.36'
 }
 
+# concurrent yearly csv downloads and retries per download (backoff doubles each retry)
+SCRAPING_MAX_WORKERS = 8
+SCRAPING_RETRIES = 3
+SCRAPING_BACKOFF = 0.5
+
 INGEST_YEAR_FROM = 1968
 INGEST_YEAR_TO = datetime.now().year
+# years fetched ahead of the year being loaded on a first run, and years downloaded at once (each year's circuits
+# download concurrently too, so up to SCRAPING_MAX_WORKERS files in flight)
+INGEST_PREFETCH_YEARS = 2
+INGEST_FETCH_WORKERS = 4
+
+# redis key the api response cache is namespaced under, the last ingested sha is also published on it after each ingest
+CACHE_PREFIX = 'tennis_sql'
+CACHE_VERSION_CHANNEL = f'{CACHE_PREFIX}:version'
+
+# most ids looked up by a single batch request
+API_BATCH_MAX_IDS = 1000
+
+# games per page of a listing route by default, and at most
+API_PAGE_LIMIT = 100
+API_PAGE_MAX_LIMIT = 500
+
+# rows fetched from the server side cursor (and written to the response) at a time by the export route
+API_EXPORT_CHUNK_SIZE = 1000
+
+# elo ratings, every player starts at the initial rating, K the most a single game moves it
+ELO_INITIAL_RATING = 1500.
+ELO_K = 32.
+# surface the rating across all surfaces is stored under
+ELO_OVERALL = 'All'
+# games of a tournament are rated in this round order, then by match number (rounds not listed go first)
+ROUND_ORDER = ['ER', 'Q1', 'Q2', 'Q3', 'Q4', 'R128', 'R64', 'R32', 'R16', 'RR', 'QF', 'SF', 'BR', 'F']
+
+# players returned by a name search by default, and at most
+API_SEARCH_LIMIT = 10
+API_SEARCH_MAX_LIMIT = 100
+
+# upper bounds of the /metrics histograms, request and db time in seconds and statements per request
+METRICS_LATENCY_BUCKETS = [.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1., 2.5, 5., 10.]
+METRICS_QUERY_BUCKETS = [0, 1, 2, 3, 5, 10, 25, 50, 100]
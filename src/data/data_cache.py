@@ -0,0 +1,157 @@
+from typing import Optional, Dict
+from functools import lru_cache
+import hashlib
+import json
+import os
+import threading
+import time
+import logging
+import requests
+
+from ..settings.scraping import SCRAPING_CACHE_CONFIG
+
+
+logger = logging.getLogger(__name__)
+
+
+class CsvCache:
+    '''
+    Content addressed on disk cache of downloaded files, revalidated with the ETag / Last-Modified github returns
+    '''
+
+    INDEX_FILE = 'index.json'
+
+    def __init__(self, cache_dir: str, max_bytes: int = SCRAPING_CACHE_CONFIG['max_bytes']) -> None:
+        """
+        Args:
+            cache_dir (str): directory files are stored in, created on first write
+            max_bytes (int, optional): least recently used files evicted beyond this size. Defaults to SCRAPING_CACHE_CONFIG['max_bytes'].
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        # shared between download threads
+        self._lock = threading.Lock()
+        self._index: Dict[str, dict] = self._load_index()
+
+    def get(self, session: requests.Session, url: str, frozen: bool = False, headers: Optional[dict] = None) -> Optional[bytes]:
+        """Gets file content, from disk if unchanged since last downloaded
+
+        Args:
+            session (requests.Session): session to download with
+            url (str): file url
+            frozen (bool, optional): file can no longer change, served from disk without revalidating. Defaults to False.
+            headers (Optional[dict], optional): additional request headers. Defaults to None.
+
+        Raises:
+            HTTPError: if request fails with anything other than 404
+
+        Returns:
+            Optional[bytes]: file content, None if file doesn't exist
+        """
+        with self._lock:
+            entry = self._index.get(url)
+            if entry is not None and entry['digest'] is not None and not os.path.exists(self._object_path(entry['digest'])):
+                # file removed from disk since, download again
+                del self._index[url]
+                entry = None
+            if entry is not None and frozen:
+                return self._read(entry)
+
+        headers = dict(headers or {})
+        if entry is not None and entry['digest'] is not None:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        req = session.get(url, headers=headers)
+        if req.status_code == 304:
+            with self._lock:
+                return self._read(entry)
+        if req.status_code == 404:
+            # remembered only for files that can't change i.e. years never played
+            if frozen:
+                with self._lock:
+                    self._index[url] = {'digest': None, 'size': 0, 'accessed': time.time()}
+                    self._save_index()
+            return None
+        req.raise_for_status()
+
+        with self._lock:
+            self._write(url, req.content, req.headers.get('ETag'), req.headers.get('Last-Modified'))
+        return req.content
+
+    @property
+    def size(self) -> int:
+        # files shared by several urls only take space once
+        return sum({entry['digest']: entry['size'] for entry in self._index.values()}.values())
+
+    def _read(self, entry: dict) -> Optional[bytes]:
+        entry['accessed'] = time.time()
+        self._save_index()
+        if entry['digest'] is None:
+            return None
+        with open(self._object_path(entry['digest']), 'rb') as f:
+            return f.read()
+
+    def _write(self, url: str, content: bytes, etag: Optional[str], last_modified: Optional[str]) -> None:
+        digest = hashlib.sha256(content).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # write then rename so a partial file is never read
+            with open(path + '.tmp', 'wb') as f:
+                f.write(content)
+            os.replace(path + '.tmp', path)
+
+        previous = self._index.get(url)
+        self._index[url] = {'digest': digest, 'size': len(content), 'etag': etag,
+                            'last_modified': last_modified, 'accessed': time.time()}
+        if previous is not None and previous['digest'] not in (None, digest):
+            self._remove_unreferenced(previous['digest'])
+        self._evict()
+        self._save_index()
+
+    def _evict(self) -> None:
+        """Drops least recently used entries until cache fits in `max_bytes`
+        """
+        for url, entry in sorted(self._index.items(), key=lambda item: item[1]['accessed']):
+            if self.size <= self.max_bytes:
+                break
+            del self._index[url]
+            logger.info('EVICTED: %s', url)
+            if entry['digest'] is not None:
+                self._remove_unreferenced(entry['digest'])
+
+    def _remove_unreferenced(self, digest: str) -> None:
+        if all(entry['digest'] != digest for entry in self._index.values()):
+            try:
+                os.remove(self._object_path(digest))
+            except FileNotFoundError:
+                pass
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.cache_dir, 'objects', digest[:2], digest)
+
+    def _load_index(self) -> Dict[str, dict]:
+        try:
+            with open(os.path.join(self.cache_dir, CsvCache.INDEX_FILE)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save_index(self) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = os.path.join(self.cache_dir, CsvCache.INDEX_FILE)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self._index, f)
+        os.replace(path + '.tmp', path)
+
+
+@lru_cache(maxsize=None)
+def get_cache() -> Optional[CsvCache]:
+    """Process wide cache configured by SCRAPING_CACHE_CONFIG, None if disabled
+    """
+    if not SCRAPING_CACHE_CONFIG['cache_dir']:
+        return None
+    return CsvCache(SCRAPING_CACHE_CONFIG['cache_dir'], SCRAPING_CACHE_CONFIG['max_bytes'])
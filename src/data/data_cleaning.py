@@ -7,16 +7,24 @@ import io
 from ..constants import SOURCE_COL, WTA_IDENTIFIER, ITF_IDENTIFIER
 
 
-def get_game_id(tournament_id: str, match_num: int) -> str:
+@overload
+def get_game_id(tournament_id: str, match_num: int) -> str: ...
+@overload
+def get_game_id(tournament_id: pd.Series, match_num: pd.Series) -> pd.Series: ...
+
+
+def get_game_id(tournament_id: Union[pd.Series, str], match_num: Union[pd.Series, int]) -> Union[pd.Series, str]:
     """Generate unique game_id
 
     Args:
-        tournament_id (str): id of tournament game played in
-        match_num (int): game number within tournament
+        tournament_id (Union[pd.Series, str]): id of tournament game played in
+        match_num (Union[pd.Series, int]): game number within tournament
 
     Returns:
-        str: game_id
+        Union[pd.Series, str]: game_id
     """
+    if isinstance(tournament_id, pd.Series):
+        return tournament_id.astype(str) + '_' + match_num.astype(str)
     return f'{tournament_id}_{match_num}'
 
 
@@ -38,7 +46,11 @@ def to_datetime(date: Union[pd.Series, int, float, str]) -> Union[pd.Series, dat
     format = '%Y%m%d'
 
     if isinstance(date, pd.Series):
-        return pd.to_datetime(date, format=format)
+        if pd.api.types.is_datetime64_any_dtype(date):
+            return date
+        # mirrors the scalar path below, anything that can't be read as an int date becomes NaT
+        date = np.trunc(pd.to_numeric(date, errors='coerce')).astype('Int64').astype(str)
+        return pd.to_datetime(date, format=format, errors='coerce')
     else:
         if isinstance(date, datetime):
             return date
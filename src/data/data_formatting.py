@@ -1,5 +1,6 @@
-from typing import Tuple, Iterator
+from typing import Tuple, Iterator, List, Type
 import pandas as pd
+import numpy as np
 
 from ..constants import SOURCE_COL
 from .data_cleaning import to_datetime, get_game_id
@@ -7,6 +8,12 @@ from ..db.models.pydantic.player import PlayerCreate
 from ..db.models.pydantic.tournament import TournamentCreate
 from ..db.models.pydantic.game import GameCreate
 from ..db.models.pydantic.performance import PerformanceCreate
+from ..db.models.pydantic.base import CreateModel
+
+
+# columns uniquely identifying a row of a formatted batch, see `dedup_batch`
+ID_KEYS = ('id',)
+PERFORMANCE_KEYS = ('game_id', 'won')
 
 
 def format_player(row: pd.Series, id: str = '200000', fname: str = 'X', lname: str = 'X.1', nationality: str = 'UNK', dob: str = '19000000', hand: str = 'U') -> PlayerCreate:
@@ -87,3 +94,134 @@ def _format_performances(row: pd.Series,  game_id: str,  player_id: str = 'id',
                                 serve_games=row[prefix + serve_games],
                                 break_points_faced=row[prefix + b_points_faced],
                                 break_points_saved=row[prefix + b_points_saved])
+
+
+def format_player_batch(player_data: pd.DataFrame, id: str = '200000', fname: str = 'X', lname: str = 'X.1', nationality: str = 'UNK', dob: str = '19000000', hand: str = 'U') -> pd.DataFrame:
+    """Columnar equivalent of `format_player`, formats every player row at once
+
+    Args:
+        player_data (pd.DataFrame): rows of Jeff Sackmans players csv
+
+    Returns:
+        pd.DataFrame: player batch, columns match the fields of `PlayerCreate`
+    """
+    return pd.DataFrame({'id': player_data[id].astype('int64'),
+                         'first_name': _str_column(player_data[fname]),
+                         'last_name': _str_column(player_data[lname]),
+                         'nationality': _str_column(player_data[nationality]),
+                         'dob': _datetime_column(player_data[dob]),
+                         'hand': _str_column(player_data[hand])})
+
+
+def format_game_batches(game_data: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Columnar equivalent of `raw_game_to_objects`, formats every game row at once rather than row by row
+
+    Args:
+        game_data (pd.DataFrame): game rows with winner_id/loser_id renamed to w_id/l_id
+
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]: tournament, game, winning and losing performance batches,
+            columns match the fields of the respective pydantic create objects
+    """
+    tournaments = _format_tournament_batch(game_data)
+    games = _format_game_batch(game_data)
+    w_performances, l_performances = _format_performance_batches(game_data, games['id'])
+    return tournaments, games, w_performances, l_performances
+
+
+def dedup_batch(batch: pd.DataFrame, keys: Tuple[str, ...] = ID_KEYS) -> pd.DataFrame:
+    """Drops rows sharing the same key columns, the first occurrence wins
+
+    Args:
+        batch (pd.DataFrame): formatted batch
+        keys (Tuple[str, ...], optional): columns identifying a row. Defaults to ID_KEYS.
+
+    Returns:
+        pd.DataFrame: batch with unique keys
+    """
+    return batch.drop_duplicates(subset=list(keys), keep='first').reset_index(drop=True)
+
+
+def batch_to_objects(batch: pd.DataFrame, model: Type[CreateModel]) -> np.ndarray:
+    """Converts a formatted batch to an array of pydantic create objects, batch values are trusted so validation is skipped
+
+    Args:
+        batch (pd.DataFrame): formatted batch i.e. from `format_game_batches`
+        model (Type[CreateModel]): pydantic create object each row describes
+
+    Returns:
+        np.ndarray: object array of pydantic create objects
+    """
+    objects = np.empty(len(batch), dtype=object)
+    # assigning a list keeps numpy from iterating over each pydantic object
+    objects[:] = [model.construct(**record) for record in batch_to_records(batch)]
+    return objects
+
+
+def batch_to_records(batch: pd.DataFrame) -> List[dict]:
+    """Formatted batch to a list of column -> value dicts
+    """
+    return batch.to_dict('records')
+
+
+def _format_tournament_batch(game_data: pd.DataFrame, id: str = 'tourney_id', name: str = 'tourney_name', surface: str = 'surface', draw_size: str = 'draw_size', level: str = 'tourney_level', start_date: str = 'tourney_date') -> pd.DataFrame:
+    """Create tournament batch from game rows, columnar version of `_format_tournament`
+    """
+    return pd.DataFrame({'id': _str_column(game_data[id]),
+                         'name': _str_column(game_data[name]),
+                         'surface': _str_column(game_data[surface]),
+                         'draw_size': game_data[draw_size].astype('int64'),
+                         'level': _str_column(game_data[level]),
+                         'start_date': _datetime_column(game_data[start_date])})
+
+
+def _format_game_batch(game_data: pd.DataFrame, tournament_id: str = 'tourney_id', match_num: str = 'match_num', round: str = 'round', score: str = 'score', circuit: str = SOURCE_COL) -> pd.DataFrame:
+    """Create game batch from game rows, columnar version of `_format_game`
+    """
+    return pd.DataFrame({'id': get_game_id(game_data[tournament_id], game_data[match_num]),
+                         'tournament_id': _str_column(game_data[tournament_id]),
+                         'round': _str_column(game_data[round]),
+                         'score': _str_column(game_data[score]),
+                         'circuit': _str_column(game_data[circuit])})
+
+
+def _format_performance_batches(game_data: pd.DataFrame, game_id: pd.Series, player_id: str = 'id', aces: str = 'ace', double_faults: str = 'df',
+                                serve_points: str = 'svpt', f_serve_in: str = '1stIn', f_serve_won: str = '1stWon', s_serve_won: str = '2ndWon', serve_games: str = 'SvGms', b_points_faced: str = 'bpFaced',
+                                b_points_saved: str = 'bpSaved', w_prefix: str = 'w_', l_prefix: str = 'l_') -> Iterator[pd.DataFrame]:
+    """Create winning and losing performance batches from game rows, columnar version of `_format_performances`
+    """
+    stats = {'aces': aces,
+             'double_faults': double_faults,
+             'serve_points': serve_points,
+             'first_serve_in': f_serve_in,
+             'first_serve_won': f_serve_won,
+             'second_serve_won': s_serve_won,
+             'serve_games': serve_games,
+             'break_points_faced': b_points_faced,
+             'break_points_saved': b_points_saved}
+
+    for prefix, outcome in [(w_prefix, True), (l_prefix, False)]:
+        performances = pd.DataFrame({'game_id': game_id,
+                                     'player_id': game_data[prefix + player_id].astype('int64'),
+                                     'won': outcome})
+        for field, column in stats.items():
+            performances[field] = _float_column(game_data[prefix + column])
+        yield performances
+
+
+def _str_column(column: pd.Series) -> pd.Series:
+    """Same coercion as pydantic str fields followed by `CreateModel.nan_to_none`
+    """
+    null = column.isna()
+    column = column.astype(str)
+    return column.where(~(null | (column == 'nan')), None)
+
+
+def _float_column(column: pd.Series) -> pd.Series:
+    column = pd.to_numeric(column).astype(float)
+    return column.astype(object).where(column.notna(), None)
+
+
+def _datetime_column(column: pd.Series) -> pd.Series:
+    column = to_datetime(column)
+    return column.astype(object).where(column.notna(), None)
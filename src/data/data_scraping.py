@@ -1,68 +1,129 @@
-from typing import Iterator, Tuple
+from typing import Iterator, Tuple, Optional
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import logging
 import pandas as pd
 import requests
 from requests.exceptions import HTTPError
-from io import StringIO
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from io import BytesIO, StringIO
 
-from ..constants import PLAYER_URL, WTA_URL, ITF_URL, SOURCE_COL, WTA_IDENTIFIER, ITF_IDENTIFIER, SCRAPING_HEADER
+from ..constants import PLAYER_URL, WTA_URL, ITF_URL, SOURCE_COL, WTA_IDENTIFIER, ITF_IDENTIFIER, SCRAPING_HEADER, \
+    SCRAPING_MAX_WORKERS, SCRAPING_RETRIES, SCRAPING_BACKOFF
+from ..settings.scraping import SCRAPING_CACHE_CONFIG
+from .data_cache import CsvCache, get_cache
 
 
-def get_raw_players(n_players: int = None) -> pd.DataFrame:
+logger = logging.getLogger(__name__)
+
+
+def get_raw_players(n_players: int = None, player_url: str = PLAYER_URL, cache: Optional[CsvCache] = None) -> pd.DataFrame:
     '''
     Gets all WTA players in Jeff Sackmans WTA data
 
     args:
         n_players: (ignore just used for testing) Number of players to return
+        player_url: players file url
+        cache: on disk cache to revalidate against, defaults to the process wide cache (if enabled)
 
     returns:
         dataframe of players
     '''
+    with _scraping_session(1, SCRAPING_RETRIES, SCRAPING_BACKOFF) as session:
+        content = _fetch(session, player_url, cache or get_cache(), frozen=False)
+    if content is None:
+        raise HTTPError(f'NOT FOUND: {player_url}')
+
     return pd.read_csv(
-        PLAYER_URL,
+        BytesIO(content),
         mangle_dupe_cols=True,  # duplicate columns i.e. X, X -> X, X.1
         nrows=n_players,
         encoding="ISO-8859-1",
     )
 
 
-def get_raw_games(year_from: int, year_to: int, n_games: int = None) -> pd.DataFrame:
+def get_raw_games(year_from: int, year_to: int, n_games: int = None, wta_url: Optional[str] = WTA_URL, itf_url: Optional[str] = ITF_URL,
+                  max_workers: int = SCRAPING_MAX_WORKERS, retries: int = SCRAPING_RETRIES, backoff: float = SCRAPING_BACKOFF,
+                  cache: Optional[CsvCache] = None) -> pd.DataFrame:
     '''
-    Gets all WTA and ITF games
+    Gets all WTA and ITF games, yearly files are downloaded concurrently
 
     args:
         n_games: (ignore just used for testing) returns most recent WTA matches
+        wta_url: yearly WTA file url, formatted with the year (None to skip WTA)
+        itf_url: yearly ITF file url, formatted with the year (None to skip ITF)
+        max_workers: max concurrent downloads
+        retries: retries per download on connection errors or 429/5xx responses
+        backoff: seconds to wait before the first retry, doubles with each retry
+        cache: on disk cache to revalidate against, defaults to the process wide cache (if enabled)
 
     returns:
         raw dataframe of games
     '''
-    data = None
-    for year in range(year_from, year_to + 1):
-        # each year we try scrape wta and itf data
-        for url, identifier in [(WTA_URL, WTA_IDENTIFIER), (ITF_URL, ITF_IDENTIFIER)]:
-            try:
-                req = requests.get(url.format(year),
-                                   headers=SCRAPING_HEADER)
-                # raises HttpError error if one
-                req.raise_for_status()
-
-                # TODO add to logger
-                print(f"GOT: {url.format(year)}")
-
-                new_data = pd.read_csv(StringIO(req.text))
-                new_data[SOURCE_COL] = identifier
-
-                if data is None:
-                    data = new_data
-                else:
-                    data = data.append(new_data, ignore_index=True)
-            # file doesn't exist
-            except HTTPError:
-                # TODO add to logger
-                print(f'NOT FOUND: {url.format(year)}')
-            except AttributeError:
-                # basically if ITF_URL is None
-                pass
-    return data
+    # each year we try scrape wta and itf data
+    files = [(url.format(year), identifier, _is_frozen(year))
+             for year in range(year_from, year_to + 1)
+             for url, identifier in [(wta_url, WTA_IDENTIFIER), (itf_url, ITF_IDENTIFIER)] if url is not None]
+
+    cache = cache or get_cache()
+    with _scraping_session(max_workers, retries, backoff) as session, ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # map keeps the year, WTA then ITF order of files
+        frames = [frame for frame in executor.map(lambda file: _get_games_file(session, cache, *file), files) if frame is not None]
+
+    if not frames:
+        return None
+    return pd.concat(frames, ignore_index=True)
+
+
+def _get_games_file(session: requests.Session, cache: Optional[CsvCache], url: str, identifier: str, frozen: bool) -> Optional[pd.DataFrame]:
+    """Downloads a single games file, None if the file doesn't exist (i.e. year not yet played)
+    """
+    content = _fetch(session, url, cache, frozen)
+    if content is None:
+        logger.info('NOT FOUND: %s', url)
+        return None
+    logger.info('GOT: %s', url)
+
+    # decoded the same way requests decodes response text
+    games = pd.read_csv(StringIO(content.decode('utf-8', errors='replace')))
+    games[SOURCE_COL] = identifier
+    return games
+
+
+def _fetch(session: requests.Session, url: str, cache: Optional[CsvCache], frozen: bool) -> Optional[bytes]:
+    """File content through the cache if there is one, None if the file doesn't exist
+
+    Raises:
+        HTTPError: on anything other than 404 once retries are exhausted
+    """
+    if cache is not None:
+        return cache.get(session, url, frozen=frozen, headers=SCRAPING_HEADER)
+
+    req = session.get(url, headers=SCRAPING_HEADER)
+    if req.status_code == 404:
+        return None
+    req.raise_for_status()
+    return req.content
+
+
+def _is_frozen(year: int) -> bool:
+    """Yearly files this old are no longer expected to change
+    """
+    return year <= datetime.now().year - SCRAPING_CACHE_CONFIG['frozen_years']
+
+
+def _scraping_session(max_workers: int, retries: int, backoff: float) -> requests.Session:
+    """Session shared between download threads, retrying failed requests with exponential backoff
+    """
+    # urllib3 sleeps backoff_factor * 2 ** (retry - 1) between retries
+    retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=[429, 500, 502, 503, 504], raise_on_status=False)
+    adapter = HTTPAdapter(max_retries=retry, pool_maxsize=max_workers)
+
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
 
 
 def get_last_commit_sha() -> str:
@@ -0,0 +1,197 @@
+from typing import Optional, Tuple, List
+import json
+import os
+import shutil
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency, `poetry install -E snapshot`
+    pa, pq = None, None
+
+from ..constants import SOURCE_COL
+
+
+MANIFEST_FILE = 'manifest.json'
+PLAYERS_FILE = 'players.parquet'
+GAMES_DIR = 'games'
+
+# explicit dtypes of the columns formatting relies on, so every partition loads back the same regardless of what
+# pd.read_csv inferred for that year (i.e. float ids in a year with a missing value)
+PLAYER_DTYPES = {'200000': 'Int64', '19000000': 'float64', 'X': 'object', 'X.1': 'object', 'UNK': 'object', 'U': 'object'}
+GAME_DTYPES = {
+    **{column: 'Int64' for column in ['draw_size', 'tourney_date', 'match_num', 'winner_id', 'loser_id']},
+    **{column: 'object' for column in ['tourney_id', 'tourney_name', 'surface', 'tourney_level', 'score', 'round', SOURCE_COL]},
+    **{prefix + column: 'float64' for prefix in ['w_', 'l_']
+       for column in ['ace', 'df', 'svpt', '1stIn', '1stWon', '2ndWon', 'SvGms', 'bpSaved', 'bpFaced']}
+}
+
+
+class SnapshotWriter:
+    '''
+    Writes a snapshot incrementally (i.e. a year of games at a time), only replaces any existing snapshot once
+    exited without error so a failed write never leaves half a snapshot
+
+    usage:
+        with SnapshotWriter(snapshot_dir, sha) as writer:
+            writer.write_players(player_data)
+            writer.write_games(game_data)
+    '''
+
+    def __init__(self, snapshot_dir: str, sha: Optional[str] = None, year_from: Optional[int] = None, year_to: Optional[int] = None) -> None:
+        """
+        Args:
+            snapshot_dir (str): directory to write to
+            sha (Optional[str], optional): github sha the data was scraped at. Defaults to None.
+            year_from (Optional[int], optional): first year scraped. Defaults to None (first year of games written).
+            year_to (Optional[int], optional): last year scraped. Defaults to None (last year of games written).
+        """
+        _require_pyarrow()
+        self.snapshot_dir = snapshot_dir
+        self.sha, self.year_from, self.year_to = sha, year_from, year_to
+        self.partitions: List[Tuple[int, str, int]] = []
+        # written next to the old snapshot then swapped in
+        self._tmp_dir = snapshot_dir.rstrip(os.sep) + '.tmp'
+
+    def __enter__(self) -> 'SnapshotWriter':
+        shutil.rmtree(self._tmp_dir, ignore_errors=True)
+        os.makedirs(os.path.join(self._tmp_dir, GAMES_DIR))
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is not None:
+            shutil.rmtree(self._tmp_dir, ignore_errors=True)
+            return
+
+        years = [year for year, _, _ in self.partitions]
+        with open(os.path.join(self._tmp_dir, MANIFEST_FILE), 'w') as f:
+            json.dump({'sha': self.sha,
+                       'year_from': min(years, default=0) if self.year_from is None else self.year_from,
+                       'year_to': max(years, default=0) if self.year_to is None else self.year_to,
+                       'partitions': self.partitions}, f)
+
+        shutil.rmtree(self.snapshot_dir, ignore_errors=True)
+        os.replace(self._tmp_dir, self.snapshot_dir)
+
+    def write_players(self, player_data: pd.DataFrame) -> pd.DataFrame:
+        """Writes player data as returned by `get_raw_players`, returns it unchanged
+        """
+        _write_parquet(_typed(player_data, PLAYER_DTYPES), os.path.join(self._tmp_dir, PLAYERS_FILE))
+        return player_data
+
+    def write_games(self, game_data: Optional[pd.DataFrame]) -> Optional[pd.DataFrame]:
+        """Writes game data as returned by `get_raw_games` partitioned by year and circuit, returns it unchanged. Not
+        thread safe, partitions are by tournament start date so calls for different years may share one
+        """
+        if game_data is None:
+            return None
+
+        typed = _typed(game_data, GAME_DTYPES)
+        years = (typed['tourney_date'] // 10000).fillna(0).astype(int)
+        # partitions keep the scraped year, WTA then ITF order
+        for (year, circuit), games in typed.groupby([years, SOURCE_COL], sort=False):
+            path = _partition_path(self._tmp_dir, year, circuit)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if os.path.exists(path):
+                # same partition written twice, keep both
+                games = pd.concat([_read_parquet(path), games], ignore_index=True)
+                self.partitions = [partition for partition in self.partitions if partition[:2] != (int(year), circuit)]
+            _write_parquet(games, path)
+            self.partitions.append((int(year), circuit, len(games)))
+        return game_data
+
+
+def write_snapshot(snapshot_dir: str, player_data: pd.DataFrame, game_data: pd.DataFrame, sha: Optional[str] = None,
+                   year_from: Optional[int] = None, year_to: Optional[int] = None) -> None:
+    """Writes raw player and game data to parquet, games partitioned by year and circuit. Replaces any existing snapshot
+
+    Args:
+        snapshot_dir (str): directory to write to
+        player_data (pd.DataFrame): data as returned by `get_raw_players`
+        game_data (pd.DataFrame): data as returned by `get_raw_games`
+        sha (Optional[str], optional): github sha the data was scraped at. Defaults to None.
+        year_from (Optional[int], optional): first year scraped. Defaults to None (first year in game_data).
+        year_to (Optional[int], optional): last year scraped. Defaults to None (last year in game_data).
+    """
+    with SnapshotWriter(snapshot_dir, sha, year_from, year_to) as writer:
+        writer.write_players(player_data)
+        writer.write_games(game_data)
+
+
+def load_snapshot(snapshot_dir: str, year_from: Optional[int] = None, year_to: Optional[int] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Loads a snapshot written by `write_snapshot`, files are memory mapped rather than read
+
+    Args:
+        snapshot_dir (str): directory snapshot was written to
+        year_from (Optional[int], optional): first year of games to load. Defaults to None (all).
+        year_to (Optional[int], optional): last year of games to load. Defaults to None (all).
+
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame]: player and game data, same columns as the raw csv data
+    """
+    return load_snapshot_players(snapshot_dir), load_snapshot_games(snapshot_dir, year_from, year_to)
+
+
+def load_snapshot_players(snapshot_dir: str) -> pd.DataFrame:
+    """Player data of a snapshot, see `load_snapshot`
+    """
+    _require_pyarrow()
+    return _typed(_read_parquet(os.path.join(snapshot_dir, PLAYERS_FILE)), PLAYER_DTYPES)
+
+
+def load_snapshot_games(snapshot_dir: str, year_from: Optional[int] = None, year_to: Optional[int] = None) -> Optional[pd.DataFrame]:
+    """Game data of a snapshot, None if no games in the years asked for. See `load_snapshot`
+    """
+    _require_pyarrow()
+    games = [_read_parquet(_partition_path(snapshot_dir, year, circuit))
+             for year, circuit, _ in _read_manifest(snapshot_dir)['partitions']
+             if (year_from is None or year >= year_from) and (year_to is None or year <= year_to)]
+    if not games:
+        return None
+    return _typed(pd.concat(games, ignore_index=True), GAME_DTYPES)
+
+
+def is_snapshot_current(snapshot_dir: str, sha: str, year_from: int, year_to: int) -> bool:
+    """Whether a snapshot exists that was taken at `sha` and covers every year asked for
+    """
+    try:
+        manifest = _read_manifest(snapshot_dir)
+    except FileNotFoundError:
+        return False
+    return manifest['sha'] == sha and manifest['year_from'] <= year_from and manifest['year_to'] >= year_to
+
+
+def _typed(data: pd.DataFrame, dtypes: dict) -> pd.DataFrame:
+    data = data.copy()
+    for column, dtype in dtypes.items():
+        if column not in data:
+            continue
+        if dtype == 'object':
+            # mixed ints and strings can't be written, stringified the same way pydantic str fields would
+            data[column] = data[column].where(data[column].isna(), data[column].astype(str)).astype(object)
+        else:
+            data[column] = pd.to_numeric(data[column]).astype(dtype)
+    return data
+
+
+def _write_parquet(data: pd.DataFrame, path: str) -> None:
+    pq.write_table(pa.Table.from_pandas(data, preserve_index=False), path)
+
+
+def _read_parquet(path: str) -> pd.DataFrame:
+    return pq.read_table(path, memory_map=True).to_pandas()
+
+
+def _read_manifest(snapshot_dir: str) -> dict:
+    with open(os.path.join(snapshot_dir, MANIFEST_FILE)) as f:
+        return json.load(f)
+
+
+def _partition_path(snapshot_dir: str, year: int, circuit: str) -> str:
+    return os.path.join(snapshot_dir, GAMES_DIR, f'year={year}', f'{SOURCE_COL}={circuit}', 'part.parquet')
+
+
+def _require_pyarrow() -> None:
+    if pq is None:
+        raise ImportError('pyarrow is required for snapshots, install with `poetry install -E snapshot`')
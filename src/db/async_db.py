@@ -0,0 +1,248 @@
+from typing import Union, Optional, Iterable, Dict, List, AsyncIterator
+from datetime import datetime
+
+from sqlalchemy import select, and_, or_, Column
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker, contains_eager
+from sqlalchemy.engine import Row
+
+from ..constants import API_PAGE_LIMIT, API_EXPORT_CHUNK_SIZE
+from ..pagination import Cursor
+from ..settings.db import DB_CONFIG
+
+from .db import DBClient, EAGER_LOADS, GAME_PERFORMANCE_LOADS, W_PERFORMANCE, L_PERFORMANCE
+from .pool import pool_options, pool_metrics
+from .models.orm.base import Base as ORMBase
+from .models.orm.github import Github as ORMGithub
+from .models.orm.player import Player as ORMPlayer
+from .models.orm.game import Game as ORMGame
+from .models.orm.tournament import Tournament as ORMTournament
+from .models.orm.performance import Performance as ORMPerformance, PERFORMANCE_STATS
+from .models.orm.player_stats import PlayerStats as ORMPlayerStats
+from .models.orm.head_to_head import HeadToHead as ORMHeadToHead
+from .models.orm.rating import PlayerRating as ORMPlayerRating
+
+
+# games paginated by tournament start date then id, start date is nullable so undated tournaments are explicitly last
+GAME_ORDER = [ORMTournament.start_date.is_(None), ORMTournament.start_date, ORMGame.id]
+
+
+class AsyncDBClient:
+
+    def __init__(self,
+                 db_user: str = DB_CONFIG['db_user'],
+                 db_pwd: str = DB_CONFIG['db_pwd'],
+                 db_host: str = DB_CONFIG['db_host'],
+                 db_port: str = DB_CONFIG['db_port'],
+                 db_name: str = DB_CONFIG['db_name'],
+                 echo: bool = DB_CONFIG['db_echo'],
+                 db_url: Optional[str] = None) -> None:
+        """Async engine for the read side, one per process, sessions are created per request
+
+        Args:
+            db_user (str, optional): database user name. Defaults to db_config['user'].
+            db_pwd (str, optional): database password. Defaults to db_config['password'].
+            db_host (str, optional): database host. Defaults to db_config['host'].
+            db_port (str, optional): database port. Defaults to db_config['port'].
+            db_name (str, optional): database name. Defaults to db_config['database'].
+            echo (bool, optional): log every statement. Defaults to db_config['db_echo'].
+            db_url (Optional[str], optional): full async database url, overrides the mysql settings above (i.e. sqlite+aiosqlite in tests). Defaults to None.
+        """
+        connection_str = db_url or f'mysql+aiomysql://{db_user}:{db_pwd}@{db_host}:{db_port}/{db_name}'
+        self.engine = create_async_engine(connection_str, echo=echo, **pool_options(connection_str, is_async=True))
+        DBClient.listen_query_timer(self.engine.sync_engine)
+
+        # nothing is written on the read side so objects never need expiring
+        self.Session = sessionmaker(bind=self.engine, class_=AsyncSession, expire_on_commit=False)
+
+    def pool_metrics(self) -> dict:
+        return pool_metrics(self.engine.sync_engine.pool)
+
+    async def dispose(self):
+        await self.engine.dispose()
+
+
+class AsyncQueryDB:
+    '''
+    Read side, async equivalent of `QueryDB`
+    '''
+
+    def __init__(self, session: AsyncSession) -> None:
+        self.session = session
+
+    async def get_object_by_id(self, id: Union[int, str], table: ORMBase, eager: bool = True) -> Optional[ORMBase]:
+        """Given id and table to look in will return object if one
+
+        Args:
+            id (Union[int, str]): object id
+            table (ORMBase): table object resides in
+            eager (bool, optional): load the relationships in `EAGER_LOADS` in the same statement, the response schemas
+                need them as lazy loads aren't possible here. Defaults to True.
+
+        Returns:
+            ORMBase: Object instance
+        """
+        statement = select(table)
+        if eager:
+            statement = statement.options(*EAGER_LOADS.get(table, []))
+        result = await self.session.execute(statement.filter(table.id == id))
+        return result.unique().scalar_one_or_none()
+
+    async def get_objects_by_ids(self, ids: Iterable[Union[int, str]], table: ORMBase, eager: bool = True) -> Dict[Union[int, str], ORMBase]:
+        """Same as `get_object_by_id` for many ids in a single `WHERE id IN (...)` statement
+
+        Args:
+            ids (Iterable[Union[int, str]]): object ids
+            table (ORMBase): table objects reside in
+            eager (bool, optional): load the relationships in `EAGER_LOADS` in the same statement. Defaults to True.
+
+        Returns:
+            Dict[Union[int, str], ORMBase]: id -> object instance, ids without an object left out
+        """
+        statement = select(table)
+        if eager:
+            statement = statement.options(*EAGER_LOADS.get(table, []))
+        result = await self.session.execute(statement.filter(table.id.in_(set(ids))))
+        return {obj.id: obj for obj in result.unique().scalars()}
+
+    async def get_players(self) -> List[ORMPlayer]:
+        result = await self.session.execute(select(ORMPlayer))
+        return result.scalars().all()
+
+    async def get_player_games(self, player_id: int, after: Optional[Cursor] = None, limit: int = API_PAGE_LIMIT) -> List[ORMGame]:
+        """Page of games a player played (won or lost), keyset paginated on (tournament start date, game id) with
+        games of undated tournaments last
+
+        Args:
+            player_id (int): player id
+            after (Optional[Cursor], optional): games after this position, None for the first page. Defaults to None.
+            limit (int, optional): games in the page. Defaults to API_PAGE_LIMIT.
+
+        Returns:
+            List[ORMGame]: games with everything they nest loaded
+        """
+        # won and lost in a single player_id index lookup
+        game_ids = select(ORMPerformance.game_id).where(ORMPerformance.player_id == player_id)
+        return await self._get_games_page(ORMGame.id.in_(game_ids), after, limit)
+
+    async def get_tournament_games(self, tournament_id: str, after: Optional[Cursor] = None, limit: int = API_PAGE_LIMIT) -> List[ORMGame]:
+        """Page of games in a tournament, same as `get_player_games` otherwise
+        """
+        return await self._get_games_page(ORMGame.tournament_id == tournament_id, after, limit)
+
+    async def get_head_to_head_games(self, player_a_id: int, player_b_id: int) -> List[ORMGame]:
+        """Every game between two players (either order), ordered by tournament start date then game id
+
+        Args:
+            player_a_id (int): player id
+            player_b_id (int): other player id
+
+        Returns:
+            List[ORMGame]: games with everything they nest loaded
+        """
+        # pair index lookup, the games then by primary key
+        game_ids = select(ORMHeadToHead.game_id).where(ORMHeadToHead.player_a_id == min(player_a_id, player_b_id),
+                                                       ORMHeadToHead.player_b_id == max(player_a_id, player_b_id))
+        return await self._get_games_page(ORMGame.id.in_(game_ids), None, None)
+
+    async def _get_games_page(self, where, after: Optional[Cursor], limit: Optional[int]) -> List[ORMGame]:
+        # tournament joined for the ordering anyway so loaded from that join
+        statement = select(ORMGame).join(ORMGame.tournament).\
+            options(contains_eager(ORMGame.tournament), *GAME_PERFORMANCE_LOADS).where(where)
+        if after is not None:
+            statement = statement.where(_after_game(*after))
+        statement = statement.order_by(*GAME_ORDER).limit(limit)
+        result = await self.session.execute(statement)
+        return result.unique().scalars().all()
+
+    async def stream_games(self, year_from: Optional[int] = None, year_to: Optional[int] = None,
+                           circuit: Optional[str] = None, surface: Optional[str] = None,
+                           chunk_size: int = API_EXPORT_CHUNK_SIZE) -> AsyncIterator[List[Row]]:
+        """Every game flattened to one row with its tournament and both performances, read through a server side
+        cursor so only `chunk_size` rows are held at a time. Ordered by tournament start date then game id
+
+        Args:
+            year_from (Optional[int], optional): tournaments starting this year or later. Defaults to None.
+            year_to (Optional[int], optional): tournaments starting this year or earlier. Defaults to None.
+            circuit (Optional[str], optional): i.e. WTA_IDENTIFIER or ITF_IDENTIFIER. Defaults to None.
+            surface (Optional[str], optional): i.e. Hard, Clay, Grass. Defaults to None.
+            chunk_size (int, optional): rows per chunk. Defaults to API_EXPORT_CHUNK_SIZE.
+
+        Yields:
+            AsyncIterator[List[Row]]: chunks of rows, columns as in `export_columns()`
+        """
+        statement = select(*_export_columns()).select_from(ORMGame).\
+            join(ORMTournament, ORMGame.tournament_id == ORMTournament.id).\
+            outerjoin(W_PERFORMANCE, ORMGame.w_performance.of_type(W_PERFORMANCE)).\
+            outerjoin(L_PERFORMANCE, ORMGame.l_performance.of_type(L_PERFORMANCE))
+        if year_from is not None:
+            statement = statement.where(ORMTournament.start_date >= datetime(year_from, 1, 1))
+        if year_to is not None:
+            statement = statement.where(ORMTournament.start_date < datetime(year_to + 1, 1, 1))
+        if circuit is not None:
+            statement = statement.where(ORMGame.circuit == circuit)
+        if surface is not None:
+            statement = statement.where(ORMTournament.surface == surface)
+        statement = statement.order_by(ORMTournament.start_date, ORMGame.id).\
+            execution_options(stream_results=True, max_row_buffer=chunk_size)
+
+        result = await self.session.stream(statement)
+        async for rows in result.partitions(chunk_size):
+            yield rows
+
+    async def get_player_stats(self, player_id: int, year: Optional[int] = None, surface: Optional[str] = None) -> List[ORMPlayerStats]:
+        """A player's `player_stats` rows, ordered by year then surface
+
+        Args:
+            player_id (int): player id
+            year (Optional[int], optional): only this year. Defaults to None.
+            surface (Optional[str], optional): only this surface, i.e. Hard, Clay, Grass. Defaults to None.
+
+        Returns:
+            List[ORMPlayerStats]: one row per (year, surface) the player played in
+        """
+        statement = select(ORMPlayerStats).where(ORMPlayerStats.player_id == player_id)
+        if year is not None:
+            statement = statement.where(ORMPlayerStats.year == year)
+        if surface is not None:
+            statement = statement.where(ORMPlayerStats.surface == surface)
+        result = await self.session.execute(statement.order_by(ORMPlayerStats.year, ORMPlayerStats.surface))
+        return result.scalars().all()
+
+    async def get_player_ratings(self, player_id: int) -> List[ORMPlayerRating]:
+        """A player's ratings, overall and per surface, ordered by surface
+        """
+        result = await self.session.execute(
+            select(ORMPlayerRating).where(ORMPlayerRating.player_id == player_id).order_by(ORMPlayerRating.surface))
+        return result.scalars().all()
+
+    async def get_last_ingested_sha(self) -> Optional[str]:
+        result = await self.session.execute(
+            select(ORMGithub.sha).order_by(ORMGithub.date.desc()).limit(1))
+        return result.scalar_one_or_none()
+
+
+def _after_game(start_date, game_id):
+    """Games after the position in `GAME_ORDER`
+    """
+    if start_date is None:
+        return and_(ORMTournament.start_date.is_(None), ORMGame.id > game_id)
+    return or_(ORMTournament.start_date > start_date,
+               and_(ORMTournament.start_date == start_date, ORMGame.id > game_id),
+               ORMTournament.start_date.is_(None))
+
+
+def _export_columns() -> List[Column]:
+    return [ORMGame.id.label('game_id'), ORMGame.tournament_id, ORMTournament.name.label('tournament_name'),
+            ORMTournament.surface, ORMTournament.level, ORMTournament.start_date,
+            ORMGame.round, ORMGame.score, ORMGame.circuit,
+            W_PERFORMANCE.player_id.label('winner_id'), L_PERFORMANCE.player_id.label('loser_id'),
+            # outcome implied by the prefix
+            *[getattr(W_PERFORMANCE, stat).label(f'w_{stat}') for stat in PERFORMANCE_STATS],
+            *[getattr(L_PERFORMANCE, stat).label(f'l_{stat}') for stat in PERFORMANCE_STATS]]
+
+
+def export_columns() -> List[str]:
+    """Column names of the rows `AsyncQueryDB.stream_games` yields
+    """
+    return [column.key for column in _export_columns()]
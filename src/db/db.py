@@ -1,18 +1,56 @@
-from typing import Union, List, Optional
+from typing import Union, List, Optional, NamedTuple, Dict, Iterable, Set, Tuple
 from datetime import datetime
+import logging
+import time
 import numpy as np
+import pandas as pd
 
 from sqlalchemy import event
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy.orm.exc import FlushError
+from sqlalchemy import create_engine, select, Column, UniqueConstraint, func, case, extract, literal, tuple_
+from sqlalchemy.orm import sessionmaker, Session, joinedload, aliased
+from sqlalchemy.dialects import mysql, sqlite, postgresql
+from sqlalchemy.engine import Engine
 
 from ..settings.db import DB_CONFIG
+from ..metrics import record_query
+from .pool import pool_options, pool_metrics
+from .migrations import migrate_columns, migrate_performance_tables
 
 from .models.orm.base import Base as ORMBase
 from .models.orm.github import Github as ORMGithub
+from .models.orm.checkpoint import IngestCheckpoint as ORMIngestCheckpoint
+from .models.orm.game import Game as ORMGame
+from .models.orm.tournament import Tournament as ORMTournament
+from .models.orm.performance import Performance as ORMPerformance, PERFORMANCE_STATS
+from .models.orm.player_stats import PlayerStats as ORMPlayerStats
+from .models.orm.head_to_head import HeadToHead as ORMHeadToHead
+from .models.orm.rating import PlayerRating as ORMPlayerRating, RatedGame as ORMRatedGame
 from .models.pydantic.base import BaseModel
 from .models.pydantic.github import Github, GithubCreate
+from .models.pydantic.checkpoint import IngestCheckpointCreate
+
+
+logger = logging.getLogger(__name__)
+
+# relationships a table's response schema nests, loaded in the same statement as the object itself rather than a
+# lazy load per relationship when serializing (and required by the async session which can't lazy load at all)
+GAME_PERFORMANCE_LOADS = [
+    joinedload(ORMGame.w_performance).joinedload(ORMPerformance.player),
+    joinedload(ORMGame.l_performance).joinedload(ORMPerformance.player),
+]
+EAGER_LOADS = {
+    ORMGame: [joinedload(ORMGame.tournament), *GAME_PERFORMANCE_LOADS],
+}
+
+# a game's winning and losing performance side by side (i.e. one row per game), joined through
+# `ORMGame.w_performance.of_type(W_PERFORMANCE)` so each join carries its outcome
+W_PERFORMANCE = aliased(ORMPerformance, name='w_performance')
+L_PERFORMANCE = aliased(ORMPerformance, name='l_performance')
+
+
+class IngestCounts(NamedTuple):
+    inserted: int
+    updated: int
 
 
 class DBClient:
@@ -22,7 +60,9 @@ class DBClient:
                  db_pwd: str = DB_CONFIG['db_pwd'],
                  db_host: str = DB_CONFIG['db_host'],
                  db_port: str = DB_CONFIG['db_port'],
-                 db_name: str = DB_CONFIG['db_name']) -> None:
+                 db_name: str = DB_CONFIG['db_name'],
+                 echo: bool = DB_CONFIG['db_echo'],
+                 db_url: Optional[str] = None) -> None:
         """Create connection to database
 
         Args:
@@ -31,9 +71,11 @@ class DBClient:
             db_host (str, optional): database host. Defaults to db_config['host'].
             db_port (str, optional): database port. Defaults to db_config['port'].
             db_name (str, optional): database name. Defaults to db_config['database'].
+            echo (bool, optional): log every statement. Defaults to db_config['db_echo'].
+            db_url (Optional[str], optional): full database url, overrides the mysql settings above (i.e. sqlite in tests). Defaults to None.
         """
-        connection_str = f'mysql+pymysql://{db_user}:{db_pwd}@{db_host}:{db_port}/{db_name}'
-        self.engine = create_engine(connection_str, echo=True)
+        connection_str = db_url or f'mysql+pymysql://{db_user}:{db_pwd}@{db_host}:{db_port}/{db_name}'
+        self.engine = create_engine(connection_str, echo=echo, **pool_options(connection_str))
 
         # creates session objects if more needed (used in tests mainly)
         self._Session = sessionmaker(bind=self.engine)
@@ -42,12 +84,23 @@ class DBClient:
 
         # some values are mapped to numpy int so need to convert
         # https://github.com/worldveil/dejavu/issues/142
-        event.listen(self.engine, "before_cursor_execute", DBClient.add_own_encoders)
+        if self.engine.dialect.name == 'mysql':
+            event.listen(self.engine, "before_cursor_execute", DBClient.add_own_encoders)
+        DBClient.listen_query_timer(self.engine)
+
+    def pool_metrics(self) -> dict:
+        return pool_metrics(self.engine.pool)
 
     def generate_schema(self):
-        """Any class inheriting ORMBase will have a table generated for them
+        """Any class inheriting ORMBase will have a table generated for them, indexes added and column types
+        changed since a table was created are migrated, as are tables since replaced (see `migrations`)
         """
         ORMBase.metadata.create_all(self.engine)
+        for tbl in ORMBase.metadata.sorted_tables:
+            for index in tbl.indexes:
+                index.create(self.engine, checkfirst=True)
+        migrate_columns(self.engine)
+        migrate_performance_tables(self.engine)
 
     def clear_db(self):
         """All rows in all tables will be cleared
@@ -60,6 +113,25 @@ class DBClient:
     def add_own_encoders(conn, cursor, query, *args):
         cursor.connection.encoders[np.int64] = lambda value, encoders: int(value)
 
+    @staticmethod
+    def listen_query_timer(engine: Engine) -> None:
+        """Times every statement into the metrics of the api request running it (see `metrics.record_query`)
+
+        Args:
+            engine (Engine): sync engine (or async_engine.sync_engine)
+        """
+        event.listen(engine, "before_cursor_execute", DBClient.start_query_timer)
+        event.listen(engine, "after_cursor_execute", DBClient.stop_query_timer)
+
+    @staticmethod
+    def start_query_timer(conn, cursor, query, parameters, context, executemany):
+        # one execution context per statement, so concurrent statements never share a start time
+        context.query_start = time.perf_counter()
+
+    @staticmethod
+    def stop_query_timer(conn, cursor, query, parameters, context, executemany):
+        record_query(time.perf_counter() - context.query_start)
+
 
 class CommandDB:
     '''
@@ -69,40 +141,246 @@ class CommandDB:
     def __init__(self, session: Session) -> None:
         self.session = session
 
-    def ingest_objects(self, objects: List[BaseModel], table: ORMBase, bulk: bool = False) -> None:
+    def ingest_objects(self, objects: List[BaseModel], table: ORMBase, bulk: bool = False, chunk_size: int = DB_CONFIG['db_chunk_size']) -> None:
         """Handles all ingestion to db
 
         Args:
             objects (List[BaseModel]): list of objects to be ingested
             table (ORMBase): table to ingest objects into
             bulk (bool, optional): if true will not check for duplicates (should only be true if db empty). Defaults to False.
+            chunk_size (int, optional): rows per INSERT when bulk. Defaults to db_config['db_chunk_size'].
+        """
+        # id left out when unset (i.e. performances) so the db assigns it
+        self.ingest_rows([obj.dict(exclude={'id'} if obj.id is None else None) for obj in objects],
+                         table, bulk=bulk, chunk_size=chunk_size)
+
+    def ingest_rows(self, rows: List[dict], table: ORMBase, bulk: bool = False, chunk_size: int = DB_CONFIG['db_chunk_size']) -> IngestCounts:
+        """Same as `ingest_objects` but for rows of column -> value, i.e. a formatted batch, avoids building any objects
+
+        Args:
+            rows (List[dict]): rows to be ingested, all rows must share the same columns
+            table (ORMBase): table to ingest rows into
+            bulk (bool, optional): if true will not check for duplicates (should only be true if db empty). Defaults to False.
+            chunk_size (int, optional): rows per INSERT (or upsert). Defaults to db_config['db_chunk_size'].
+
+        Returns:
+            IngestCounts: number of rows inserted and updated
         """
         if bulk:
-            objects = [table(**obj.dict()) for obj in objects]
-            self.session.add_all(objects)
+            return IngestCounts(inserted=self._bulk_insert(rows, table, chunk_size), updated=0)
+        return self._upsert(rows, table, chunk_size)
+
+    def _bulk_insert(self, rows: List[dict], table: ORMBase, chunk_size: int) -> int:
+        """Core level executemany INSERT per chunk of rows, bypasses the ORM unit of work and identity map entirely
+        """
+        start = time.perf_counter()
+        insert = table.__table__.insert()
+        for i in range(0, len(rows), chunk_size):
+            self.session.execute(insert, rows[i:i + chunk_size])
+            self.session.commit()
+
+        elapsed = time.perf_counter() - start
+        logger.info('bulk inserted %d rows into %s in %.2fs (%.0f rows/s)',
+                    len(rows), table.__tablename__, elapsed, len(rows) / elapsed if elapsed else 0)
+        return len(rows)
+
+    def _upsert(self, rows: List[dict], table: ORMBase, chunk_size: int) -> IngestCounts:
+        """Inserts rows, updating any whose key already exists, one statement per chunk of rows (a merge per row on
+        dialects without an upsert statement)
+        """
+        if not rows:
+            return IngestCounts(inserted=0, updated=0)
+
+        keys = CommandDB._upsert_keys(table, rows[0])
+        names = [key.name for key in keys]
+        values = [column for column in rows[0] if column not in names]
+        statement = self._upsert_statement(table, keys, values)
+        if statement is None:
+            updated = self._merge_rows(rows, table, keys, chunk_size)
+            counts = IngestCounts(inserted=len(rows) - updated, updated=updated)
+            logger.info('merged into %s: %d inserted, %d updated', table.__tablename__, counts.inserted, counts.updated)
+            return counts
+
+        updated = 0
+        for i in range(0, len(rows), chunk_size):
+            chunk = rows[i:i + chunk_size]
+            # rows whose key already exists will be updated rather than inserted
+            if len(keys) == 1:
+                existing = keys[0].in_({row[names[0]] for row in chunk})
+            else:
+                existing = tuple_(*keys).in_({tuple(row[name] for name in names) for row in chunk})
+            updated += len(self.session.execute(select(*keys).where(existing)).fetchall())
+            self.session.execute(statement, chunk)
+            self.session.commit()
+
+        counts = IngestCounts(inserted=len(rows) - updated, updated=updated)
+        logger.info('upserted into %s: %d inserted, %d updated', table.__tablename__, counts.inserted, counts.updated)
+        return counts
+
+    def _upsert_statement(self, table: ORMBase, keys: List[Column], values: List[str]):
+        """INSERT .. ON DUPLICATE KEY UPDATE (mysql) or INSERT .. ON CONFLICT DO UPDATE (sqlite, postgres) of `values` columns,
+        None for any other dialect
+        """
+        dialect = self.session.get_bind().dialect.name
+        if dialect == 'mysql':
+            statement = mysql.insert(table.__table__)
+            return statement.on_duplicate_key_update({column: statement.inserted[column] for column in values})
+        if dialect in ('sqlite', 'postgresql'):
+            statement = (sqlite if dialect == 'sqlite' else postgresql).insert(table.__table__)
+            return statement.on_conflict_do_update(index_elements=keys,
+                                                   set_={column: statement.excluded[column] for column in values})
+        return None
+
+    def _merge_rows(self, rows: List[dict], table: ORMBase, keys: List[Column], chunk_size: int) -> int:
+        """Per row fallback of `_upsert`, updates the row sharing a row's key else adds it, committed per chunk
+
+        Returns:
+            int: number of rows updated
+        """
+        updated = 0
+        for i in range(0, len(rows), chunk_size):
+            for row in rows[i:i + chunk_size]:
+                # autoflushed first, so rows earlier in the chunk are found too
+                existing = self.session.execute(
+                    select(table).where(*[key == row[key.name] for key in keys])).scalar_one_or_none()
+                if existing is None:
+                    self.session.add(table(**row))
+                else:
+                    for column, value in row.items():
+                        setattr(existing, column, value)
+                    updated += 1
             self.session.commit()
+        return updated
+
+    @staticmethod
+    def _upsert_keys(table: ORMBase, row: dict) -> List[Column]:
+        """Columns identifying an existing row, the primary key if given else a unique constraint's columns
+        (i.e. performance game_id and won)
+        """
+        if 'id' in row:
+            return [table.__table__.columns['id']]
+        return next(list(constraint.columns) for constraint in table.__table__.constraints
+                    if isinstance(constraint, UniqueConstraint) and all(column.name in row for column in constraint.columns))
+
+    def refresh_player_stats(self, years: Iterable[int], player_ids: Optional[Iterable[int]] = None,
+                             chunk_size: int = DB_CONFIG['db_chunk_size']) -> None:
+        """Recomputes the `player_stats` rows of players over a range of years from their performances. Rows are
+        replaced rather than incremented so running it again (i.e. a resumed or repeated ingest) never double counts
+
+        Args:
+            years (Iterable[int]): years games were loaded for, every year between the first and last is recomputed
+            player_ids (Optional[Iterable[int]], optional): players whose games were loaded, None for every player
+                (i.e. after a bulk load of whole years). Defaults to None.
+            chunk_size (int, optional): players per DELETE / INSERT .. SELECT. Defaults to db_config['db_chunk_size'].
+        """
+        years = set(years)
+        if not years:
+            return
+        year_from, year_to = min(years), max(years)
+
+        start = time.perf_counter()
+        if player_ids is None:
+            self._refresh_player_stats(year_from, year_to, None)
         else:
-            for obj in objects:
-                try:
-                    self._add_object(obj, table)
-                except FlushError:
-                    self.session.rollback()
-                    self._update_object(obj, table)
-
-    def _add_object(self, obj: BaseModel, table: ORMBase) -> None:
-        self.session.add(table(**obj.dict()))
+            player_ids = sorted(set(player_ids))
+            for i in range(0, len(player_ids), chunk_size):
+                self._refresh_player_stats(year_from, year_to, player_ids[i:i + chunk_size])
+
+        logger.info('refreshed player stats for %s players %d-%d in %.2fs',
+                    'all' if player_ids is None else len(player_ids), year_from, year_to, time.perf_counter() - start)
+
+    def _refresh_player_stats(self, year_from: int, year_to: int, player_ids: Optional[List[int]]) -> None:
+        delete = ORMPlayerStats.__table__.delete().\
+            where(ORMPlayerStats.year.between(year_from, year_to))
+        if player_ids is not None:
+            delete = delete.where(ORMPlayerStats.player_id.in_(player_ids))
+        self.session.execute(delete)
+
+        stats = _player_stats_select(year_from, year_to, player_ids)
+        self.session.execute(ORMPlayerStats.__table__.insert().from_select([c.key for c in stats.selected_columns], stats))
         self.session.commit()
 
-    def _update_object(self, obj: BaseModel, table: ORMBase) -> None:
-        self.session.query(table).\
-            filter(table.id == obj.id).update(obj.dict())
+    def refresh_head_to_head(self, game_ids: Optional[Iterable[str]] = None,
+                             chunk_size: int = DB_CONFIG['db_chunk_size']) -> None:
+        """Rebuilds the `head_to_head` rows of games from their performances, replaced rather than added so
+        updated games (i.e. a corrected winner) never leave a stale pair
+
+        Args:
+            game_ids (Optional[Iterable[str]], optional): games loaded, None for every game. Defaults to None.
+            chunk_size (int, optional): games per DELETE / INSERT .. SELECT. Defaults to db_config['db_chunk_size'].
+        """
+        start = time.perf_counter()
+        if game_ids is None:
+            self._refresh_head_to_head(None)
+        else:
+            game_ids = list(set(game_ids))
+            for i in range(0, len(game_ids), chunk_size):
+                self._refresh_head_to_head(game_ids[i:i + chunk_size])
+
+        logger.info('refreshed head to head of %s games in %.2fs',
+                    'all' if game_ids is None else len(game_ids), time.perf_counter() - start)
+
+    def _refresh_head_to_head(self, game_ids: Optional[List[str]]) -> None:
+        delete = ORMHeadToHead.__table__.delete()
+        pairs = _head_to_head_select()
+        if game_ids is not None:
+            delete = delete.where(ORMHeadToHead.game_id.in_(game_ids))
+            pairs = pairs.where(W_PERFORMANCE.game_id.in_(game_ids))
+        self.session.execute(delete)
+        self.session.execute(ORMHeadToHead.__table__.insert().from_select([c.key for c in pairs.selected_columns], pairs))
         self.session.commit()
 
+    def save_ratings(self, ratings: List[dict], game_ids: List[str], chunk_size: int = DB_CONFIG['db_chunk_size']) -> None:
+        """Replaces the ratings of players and marks the games they were rated from, in one transaction so games are
+        never applied twice
+
+        Args:
+            ratings (List[dict]): every `player_rating` row of the players rated, i.e. `EloRatings.to_rows()`
+            game_ids (List[str]): games applied
+            chunk_size (int, optional): rows per statement. Defaults to db_config['db_chunk_size'].
+        """
+        player_ids = sorted({rating['player_id'] for rating in ratings})
+        for i in range(0, len(player_ids), chunk_size):
+            self.session.execute(ORMPlayerRating.__table__.delete().
+                                 where(ORMPlayerRating.player_id.in_(player_ids[i:i + chunk_size])))
+        for i in range(0, len(ratings), chunk_size):
+            self.session.execute(ORMPlayerRating.__table__.insert(), ratings[i:i + chunk_size])
+        for i in range(0, len(game_ids), chunk_size):
+            self.session.execute(ORMRatedGame.__table__.insert(), [{'game_id': game_id} for game_id in game_ids[i:i + chunk_size]])
+        self.session.commit()
+        logger.info('rated %d games, %d ratings updated', len(game_ids), len(ratings))
+
     def add_last_ingested_sha(self, sha: str) -> None:
         github = ORMGithub(**GithubCreate(sha=sha).dict())
         self.session.add(github)
         self.session.commit()
 
+    def start_checkpoints(self, year: int, circuits: List[str], sha: str) -> None:
+        """Marks (year, circuit) partitions as being loaded, partitions started previously keep their original sha
+        """
+        started = {checkpoint.circuit for checkpoint in self.session.query(ORMIngestCheckpoint).
+                   filter(ORMIngestCheckpoint.year == year, ORMIngestCheckpoint.circuit.in_(circuits))}
+        self.session.add_all([ORMIngestCheckpoint(**IngestCheckpointCreate(year=year, circuit=circuit, sha=sha).dict(exclude={'id'}))
+                              for circuit in circuits if circuit not in started])
+        self.session.commit()
+
+    def complete_checkpoints(self, year: int, games: Dict[str, int]) -> None:
+        """Marks (year, circuit) partitions as fully loaded
+
+        Args:
+            year (int): year of partitions
+            games (Dict[str, int]): circuit -> number of games loaded
+        """
+        for circuit, n_games in games.items():
+            self.session.query(ORMIngestCheckpoint).\
+                filter(ORMIngestCheckpoint.year == year, ORMIngestCheckpoint.circuit == circuit).\
+                update({'done': True, 'games': n_games})
+        self.session.commit()
+
+    def clear_checkpoints(self) -> None:
+        self.session.query(ORMIngestCheckpoint).delete()
+        self.session.commit()
+
 
 class QueryDB:
     '''
@@ -112,18 +390,109 @@ class QueryDB:
     def __init__(self, session: Session) -> None:
         self.session = session
 
-    def get_object_by_id(self, id: Union[int, str], table: ORMBase) -> Optional[ORMBase]:
+    def get_object_by_id(self, id: Union[int, str], table: ORMBase, eager: bool = True) -> Optional[ORMBase]:
         """Given id and table to look in will return object if one
 
         Args:
             id (Union[int, str]): object id
             table (ORMBase): table object resides in
+            eager (bool, optional): load the relationships in `EAGER_LOADS` in the same statement. Defaults to True.
 
         Returns:
             ORMBase: Object instance
         """
-        return self.session.query(table).\
-            filter(table.id == id).one_or_none()
+        query = self.session.query(table)
+        if eager:
+            query = query.options(*EAGER_LOADS.get(table, []))
+        return query.filter(table.id == id).one_or_none()
+
+    def get_objects_by_ids(self, ids: Iterable[Union[int, str]], table: ORMBase, eager: bool = True) -> Dict[Union[int, str], ORMBase]:
+        """Same as `get_object_by_id` for many ids in a single `WHERE id IN (...)` statement
+
+        Args:
+            ids (Iterable[Union[int, str]]): object ids
+            table (ORMBase): table objects reside in
+            eager (bool, optional): load the relationships in `EAGER_LOADS` in the same statement. Defaults to True.
+
+        Returns:
+            Dict[Union[int, str], ORMBase]: id -> object instance, ids without an object left out
+        """
+        query = self.session.query(table)
+        if eager:
+            query = query.options(*EAGER_LOADS.get(table, []))
+        return {obj.id: obj for obj in query.filter(table.id.in_(set(ids)))}
+
+    def get_game_player_years(self, game_ids: Iterable[str]) -> Tuple[Set[int], Set[int]]:
+        """Players and tournament years of games already stored, i.e. whose stats change if those games are updated
+
+        Args:
+            game_ids (Iterable[str]): game ids
+
+        Returns:
+            Tuple[Set[int], Set[int]]: player ids and years
+        """
+        players, years = set(), set()
+        game_ids = list(set(game_ids))
+        for i in range(0, len(game_ids), DB_CONFIG['db_chunk_size']):
+            chunk = game_ids[i:i + DB_CONFIG['db_chunk_size']]
+            rows = self.session.execute(
+                select(ORMPerformance.player_id, ORMTournament.start_date).
+                join(ORMGame, ORMPerformance.game_id == ORMGame.id).
+                join(ORMTournament, ORMGame.tournament_id == ORMTournament.id).
+                where(ORMPerformance.game_id.in_(chunk)))
+            for player_id, start_date in rows:
+                players.add(player_id)
+                if start_date is not None:
+                    years.add(start_date.year)
+        return players, years
+
+    def get_rating_games(self, unrated_only: bool = True) -> pd.DataFrame:
+        """Games with both players known, as rated by `EloRatings`
+
+        Args:
+            unrated_only (bool, optional): only games not yet applied to the ratings. Defaults to True.
+
+        Returns:
+            pd.DataFrame: games with `RATING_GAME_COLUMNS`, unordered
+        """
+        statement = select(ORMGame.id, ORMTournament.start_date, ORMGame.round, ORMTournament.surface,
+                           W_PERFORMANCE.player_id.label('winner_id'), L_PERFORMANCE.player_id.label('loser_id')).\
+            join(ORMTournament, ORMGame.tournament_id == ORMTournament.id).\
+            join(W_PERFORMANCE, ORMGame.w_performance.of_type(W_PERFORMANCE)).\
+            join(L_PERFORMANCE, ORMGame.l_performance.of_type(L_PERFORMANCE)).\
+            where(W_PERFORMANCE.player_id.isnot(None), L_PERFORMANCE.player_id.isnot(None))
+        if unrated_only:
+            statement = statement.outerjoin(ORMRatedGame, ORMRatedGame.game_id == ORMGame.id).\
+                where(ORMRatedGame.id.is_(None))
+        result = self.session.execute(statement)
+        return pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+
+    def get_ratings(self, player_ids: Iterable[int]) -> Dict[Tuple[int, str], Tuple[float, int]]:
+        """Stored ratings of players, every surface
+
+        Args:
+            player_ids (Iterable[int]): player ids
+
+        Returns:
+            Dict[Tuple[int, str], Tuple[float, int]]: (player id, surface) -> (rating, games rated)
+        """
+        ratings = {}
+        player_ids = list(set(player_ids))
+        for i in range(0, len(player_ids), DB_CONFIG['db_chunk_size']):
+            rows = self.session.execute(
+                select(ORMPlayerRating.player_id, ORMPlayerRating.surface, ORMPlayerRating.rating, ORMPlayerRating.games).
+                where(ORMPlayerRating.player_id.in_(player_ids[i:i + DB_CONFIG['db_chunk_size']])))
+            ratings.update({(player_id, surface): (rating, games) for player_id, surface, rating, games in rows})
+        return ratings
+
+    def is_empty(self, table: ORMBase) -> bool:
+        return self.session.query(table.id).first() is None
+
+    def get_checkpoints(self) -> List[ORMIngestCheckpoint]:
+        """First run ingest partitions started (or done) so far, oldest first
+        """
+        return self.session.query(ORMIngestCheckpoint).\
+            order_by(ORMIngestCheckpoint.id).all()
 
     def get_last_ingested_sha(self) -> Optional[str]:
         try:
@@ -131,3 +500,36 @@ class QueryDB:
                 order_by(ORMGithub.date.desc()).first().sha
         except AttributeError:
             return None
+
+
+def _player_stats_select(year_from: int, year_to: int, player_ids: Optional[List[int]]):
+    """Per (player, year, surface) totals of winning and losing performances, columns as in `player_stats`
+    """
+    performances = select(ORMPerformance.player_id, ORMPerformance.won,
+                          *[getattr(ORMPerformance, stat) for stat in PERFORMANCE_STATS],
+                          extract('year', ORMTournament.start_date).label('year'), ORMTournament.surface).\
+        join(ORMGame, ORMPerformance.game_id == ORMGame.id).\
+        join(ORMTournament, ORMGame.tournament_id == ORMTournament.id).\
+        where(ORMTournament.start_date >= datetime(year_from, 1, 1), ORMTournament.start_date < datetime(year_to + 1, 1, 1))
+    if player_ids is not None:
+        performances = performances.where(ORMPerformance.player_id.in_(player_ids))
+    performances = performances.subquery()
+
+    return select(performances.c.player_id, performances.c.year, performances.c.surface,
+                  func.count().label('games'),
+                  func.sum(case((performances.c.won, 1), else_=0)).label('wins'),
+                  # walkovers and older games have no serve stats
+                  func.count(performances.c.serve_points).label('stat_games'),
+                  *[func.coalesce(func.sum(performances.c[stat]), literal(0.0)).label(stat) for stat in PERFORMANCE_STATS]).\
+        group_by(performances.c.player_id, performances.c.year, performances.c.surface)
+
+
+def _head_to_head_select():
+    """(game, lower player id, higher player id) of games with both performances, columns as in `head_to_head`
+    """
+    winner, loser = W_PERFORMANCE.player_id, L_PERFORMANCE.player_id
+    return select(W_PERFORMANCE.game_id,
+                  case((winner < loser, winner), else_=loser).label('player_a_id'),
+                  case((winner < loser, loser), else_=winner).label('player_b_id')).\
+        join(L_PERFORMANCE, (L_PERFORMANCE.game_id == W_PERFORMANCE.game_id) & L_PERFORMANCE.won.is_(False)).\
+        where(W_PERFORMANCE.won.is_(True), winner.isnot(None), loser.isnot(None))
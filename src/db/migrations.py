@@ -0,0 +1,130 @@
+"""Brings an existing db in line with the ORM models, run by `DBClient.generate_schema` on every ingest
+
+Tables and indexes missing from the db are created by `generate_schema` itself, this handles columns whose type
+changed since their table was created (i.e. FLOAT performance stats now SMALLINT). MySQL columns are altered in
+place, other dialects can't alter a column's type so the change is only logged (sqlite dbs are rebuilt instead).
+It also moves the rows of tables since replaced (the wperformance / lperformance split now a single performance table).
+
+usage (ahead of the worker, i.e. to migrate in a maintenance window):
+    python -m src.db.migrations
+"""
+from typing import List, NamedTuple
+import logging
+import re
+
+from sqlalchemy import inspect, select, literal, func, Column, Table, MetaData
+from sqlalchemy.engine import Engine, Dialect
+from sqlalchemy.types import TypeEngine
+
+from .models.orm.base import Base as ORMBase
+from .models.orm.performance import Performance as ORMPerformance
+
+
+logger = logging.getLogger(__name__)
+
+# types the db reports differently than the model declares them
+SAME_TYPES = {'BOOL': 'TINYINT', 'BOOLEAN': 'TINYINT', 'INT': 'INTEGER'}
+
+# tables performances were split across by outcome before the performance table -> won
+SPLIT_PERFORMANCE_TABLES = {'wperformance': True, 'lperformance': False}
+
+
+class ColumnChange(NamedTuple):
+    table: Table
+    column: Column
+    # type in the db, the model's type is `column.type`
+    db_type: str
+
+
+def type_sql(type_: TypeEngine, dialect: Dialect) -> str:
+    """Type as the dialect declares it, without the parts that don't change what's stored (i.e. INTEGER(11))
+    """
+    sql = type_.compile(dialect=dialect).upper()
+    sql = re.sub(r' (CHARACTER SET|COLLATE) \S+', '', sql)
+    sql = re.sub(r'^(\w*INT\w*)\(\d+\)', r'\1', sql)
+    return SAME_TYPES.get(sql, sql)
+
+
+def column_changes(engine: Engine) -> List[ColumnChange]:
+    """Columns of existing tables whose type differs from the model
+
+    Args:
+        engine (Engine): db to compare against
+
+    Returns:
+        List[ColumnChange]: columns to migrate, in table dependency order
+    """
+    inspector = inspect(engine)
+    changes = []
+    for table in ORMBase.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        db_types = {column['name']: column['type'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in db_types:
+                continue
+            db_type = type_sql(db_types[column.name], engine.dialect)
+            if db_type != type_sql(column.type, engine.dialect):
+                changes.append(ColumnChange(table, column, db_type))
+    return changes
+
+
+def migrate_columns(engine: Engine) -> List[ColumnChange]:
+    """Alters every column in `column_changes` to its model type (mysql only)
+
+    Args:
+        engine (Engine): db to migrate
+
+    Returns:
+        List[ColumnChange]: columns altered, or needing a rebuild on other dialects
+    """
+    changes = column_changes(engine)
+    preparer = engine.dialect.identifier_preparer
+    for table, column, db_type in changes:
+        model_type = column.type.compile(dialect=engine.dialect)
+        if engine.dialect.name != 'mysql':
+            logger.warning('%s.%s is %s in the db but %s in the model, rebuild the db to migrate it',
+                           table.name, column.name, db_type, model_type)
+            continue
+        logger.info('migrating %s.%s from %s to %s', table.name, column.name, db_type, model_type)
+        with engine.begin() as conn:
+            conn.exec_driver_sql(f'ALTER TABLE {preparer.format_table(table)} MODIFY COLUMN '
+                                 f'{preparer.format_column(column)} {model_type} {"NULL" if column.nullable else "NOT NULL"}')
+    return changes
+
+
+def migrate_performance_tables(engine: Engine) -> int:
+    """Copies the rows of the split performance tables into the performance table then drops them
+
+    Args:
+        engine (Engine): db to migrate, the performance table must exist (i.e. after `create_all`)
+
+    Returns:
+        int: performances copied
+    """
+    copied = 0
+    for name, won in SPLIT_PERFORMANCE_TABLES.items():
+        if not inspect(engine).has_table(name):
+            continue
+        split = Table(name, MetaData(), autoload_with=engine)
+        columns = [column.name for column in ORMPerformance.__table__.columns
+                   if column.name not in ('id', 'won') and column.name in split.c]
+        # updating a game used to insert its performances again, only the latest write of each game is copied
+        latest = select(func.max(split.c.id).label('id')).group_by(split.c.game_id).subquery()
+        with engine.begin() as conn:
+            # outcome from the table copied, performances already in the performance table are kept
+            rows = select(*[split.c[column] for column in columns], literal(won).label('won')).\
+                select_from(split.join(latest, split.c.id == latest.c.id)).\
+                where(split.c.game_id.notin_(select(ORMPerformance.game_id).where(ORMPerformance.won.is_(won))))
+            moved = conn.execute(ORMPerformance.__table__.insert().from_select([*columns, 'won'], rows)).rowcount
+            split.drop(conn)
+        logger.info('moved %d rows of %s into performance', moved, name)
+        copied += moved
+    return copied
+
+
+if __name__ == '__main__':
+    from .db import DBClient
+
+    logging.basicConfig(level=logging.INFO)
+    DBClient().generate_schema()
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, String, Integer, Boolean, DateTime, UniqueConstraint
+from datetime import datetime
+
+from .base import Base
+
+
+class IngestCheckpoint(Base):
+    """SQL alchemy table structure for first run ingest progress, one row per (year, circuit) partition
+    """
+    __tablename__ = 'ingest_checkpoint'
+    __table_args__ = (UniqueConstraint('year', 'circuit'),)
+
+    year = Column(Integer, nullable=False)
+    circuit = Column(String(10), nullable=False)
+    # github sha when partition was first started
+    sha = Column(String(50))
+    # false while loading, partition may be partially loaded if left false
+    done = Column(Boolean, nullable=False, default=False)
+    games = Column(Integer, nullable=False, default=0)
+    date = Column(DateTime, default=datetime.now, onupdate=datetime.now)
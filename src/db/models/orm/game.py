@@ -2,7 +2,7 @@ from sqlalchemy import Column, ForeignKey, String
 from sqlalchemy.orm import relationship
 
 from .base import Base
-from .performance import WPerformance, LPerformance
+from .performance import Performance
 
 
 class Game(Base):
@@ -12,12 +12,18 @@ class Game(Base):
 
     id = Column(String(50), primary_key=True)
 
-    tournament_id = Column(String(50), ForeignKey('tournament.id'))
+    # indexed for listing a tournament's games
+    tournament_id = Column(String(50), ForeignKey('tournament.id'), index=True)
     tournament = relationship("Tournament", uselist=False, foreign_keys=[tournament_id])
 
-    w_performance = relationship("WPerformance", uselist=False)
-    l_performance = relationship("LPerformance", uselist=False)
+    # the game's rows of the performance table, one per outcome
+    w_performance = relationship(Performance, uselist=False, overlaps='l_performance',
+                                 primaryjoin=lambda: (Game.id == Performance.game_id) & Performance.won.is_(True))
+    l_performance = relationship(Performance, uselist=False, overlaps='w_performance',
+                                 primaryjoin=lambda: (Game.id == Performance.game_id) & Performance.won.is_(False))
 
-    round = Column(String(50))
+    # i.e. R128, QF, F
+    round = Column(String(10))
     score = Column(String(50))
-    circuit = Column(String(50))
+    # WTA_IDENTIFIER or ITF_IDENTIFIER
+    circuit = Column(String(10))
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, String, Integer, ForeignKey, Index
+
+from .base import Base
+
+
+class HeadToHead(Base):
+    """SQL alchemy table structure for the head to head index, one row per game keyed on the unordered player pair
+    maintained by the worker as games are ingested
+    """
+    __tablename__ = 'head_to_head'
+    # a pair's games without touching either performance table
+    __table_args__ = (Index('ix_head_to_head_players', 'player_a_id', 'player_b_id'),)
+
+    game_id = Column(String(50), ForeignKey('game.id'), unique=True, nullable=False)
+    # lower and higher player id of the pair, whoever won
+    player_a_id = Column(Integer, ForeignKey('player.id'), nullable=False)
+    player_b_id = Column(Integer, ForeignKey('player.id'), nullable=False)
@@ -1,56 +1,42 @@
-from sqlalchemy import Column, Integer, ForeignKey, Boolean, String, Float
+from sqlalchemy import Column, Integer, SmallInteger, ForeignKey, Boolean, String, UniqueConstraint
 from sqlalchemy.orm import relationship
-from sqlalchemy.ext.declarative import declared_attr
 
 from .base import Base
+from .player import Player
 
 
-class PerformanceMixin:
-    """Mixin to declare shared attributes between winning and losing performance
+class Performance(Base):
+    """SQL alchemy table structure for performance, winning and losing performances share the table
+    told apart by `won` (see `Game.w_performance` / `Game.l_performance`)
     """
-    @declared_attr
-    def __tablename__(cls):
-        return cls.__name__.lower()
-
-    # player game stats
-    aces = Column(Float)
-    double_faults = Column(Float)
-    serve_points = Column(Float)
-    first_serve_in = Column(Float)
-    first_serve_won = Column(Float)
-    second_serve_won = Column(Float)
-    serve_games = Column(Float)
-    break_points_faced = Column(Float)
-    break_points_saved = Column(Float)
+    __tablename__ = 'performance'
+    # one performance per outcome of a game, leading game_id also serves joins from games
+    __table_args__ = (UniqueConstraint('game_id', 'won'),)
 
-    # outcome
-    won = Column(Boolean, nullable=False)
-
-    @declared_attr
-    def player_id(cls):
-        # player who's performance it relates to
-        return Column(Integer, ForeignKey("player.id"))
-
-    @declared_attr
-    def player(cls):
-        return relationship("Player", uselist=False)
+    id = Column(Integer, primary_key=True)
 
+    # player game stats, counts so 2 byte integers
+    aces = Column(SmallInteger)
+    double_faults = Column(SmallInteger)
+    serve_points = Column(SmallInteger)
+    first_serve_in = Column(SmallInteger)
+    first_serve_won = Column(SmallInteger)
+    second_serve_won = Column(SmallInteger)
+    serve_games = Column(SmallInteger)
+    break_points_faced = Column(SmallInteger)
+    break_points_saved = Column(SmallInteger)
 
-class WPerformance(PerformanceMixin, Base):
-    """SQL alchemy table structure for winning performance 
-    """
-    id = Column(Integer, primary_key=True)
+    # outcome
+    won = Column(Boolean, nullable=False)
 
-    # game winning performance relates to
-    game_id = Column(String(50), ForeignKey('game.id'))
-    game = relationship("Game", back_populates="w_performance", uselist=False)
+    # game performance relates to
+    game_id = Column(String(50), ForeignKey('game.id'), nullable=False)
 
+    # player who's performance it relates to, indexed for listing a player's games (won or lost) in a single lookup
+    player_id = Column(Integer, ForeignKey("player.id"), index=True)
+    player = relationship(Player, uselist=False)
 
-class LPerformance(PerformanceMixin, Base):
-    """SQL alchemy table structure for losing performance 
-    """
-    id = Column(Integer, primary_key=True)
 
-    # game losing performance relates to
-    game_id = Column(String(50), ForeignKey('game.id'))
-    game = relationship("Game", back_populates="l_performance", uselist=False)
+# player game stat columns
+PERFORMANCE_STATS = [column.name for column in Performance.__table__.columns
+                     if isinstance(column.type, SmallInteger)]
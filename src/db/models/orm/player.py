@@ -1,6 +1,7 @@
-from sqlalchemy import Column, String, DateTime
+from sqlalchemy import Column, String
 
 from .base import Base
+from .types import DateTimeDate
 
 
 class Player(Base):
@@ -10,6 +11,8 @@ class Player(Base):
 
     first_name = Column(String(50))
     last_name = Column(String(50))
-    nationality = Column(String(50))
-    dob = Column(DateTime)
-    hand = Column(String(50), default='U')
+    # ioc country code
+    nationality = Column(String(10))
+    dob = Column(DateTimeDate)
+    # R, L, A (ambidextrous) or U (unknown)
+    hand = Column(String(10), default='U')
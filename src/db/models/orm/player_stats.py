@@ -0,0 +1,33 @@
+from sqlalchemy import Column, String, Integer, Float, ForeignKey, UniqueConstraint
+
+from .base import Base
+
+
+class PlayerStats(Base):
+    """SQL alchemy table structure for player stat totals, one row per (player, year, surface)
+    maintained by the worker as games are ingested
+    """
+    __tablename__ = 'player_stats'
+    # leading player_id also serves lookups by player
+    __table_args__ = (UniqueConstraint('player_id', 'year', 'surface'),)
+
+    player_id = Column(Integer, ForeignKey('player.id'), nullable=False)
+    # tournament start date year
+    year = Column(Integer, nullable=False)
+    surface = Column(String(10))
+
+    games = Column(Integer, nullable=False, default=0)
+    wins = Column(Integer, nullable=False, default=0)
+    # games with serve stats recorded (i.e. not walkovers), denominator for per game stats
+    stat_games = Column(Integer, nullable=False, default=0)
+
+    # totals of performance stats
+    aces = Column(Float, nullable=False, default=0)
+    double_faults = Column(Float, nullable=False, default=0)
+    serve_points = Column(Float, nullable=False, default=0)
+    first_serve_in = Column(Float, nullable=False, default=0)
+    first_serve_won = Column(Float, nullable=False, default=0)
+    second_serve_won = Column(Float, nullable=False, default=0)
+    serve_games = Column(Float, nullable=False, default=0)
+    break_points_faced = Column(Float, nullable=False, default=0)
+    break_points_saved = Column(Float, nullable=False, default=0)
@@ -0,0 +1,26 @@
+from sqlalchemy import Column, String, Integer, Float, ForeignKey, UniqueConstraint
+
+from .base import Base
+
+
+class PlayerRating(Base):
+    """SQL alchemy table structure for a player's Elo rating on a surface (or across all of them, see ELO_OVERALL)
+    maintained by the worker as games are ingested
+    """
+    __tablename__ = 'player_rating'
+    # leading player_id also serves lookups by player
+    __table_args__ = (UniqueConstraint('player_id', 'surface'),)
+
+    player_id = Column(Integer, ForeignKey('player.id'), nullable=False)
+    surface = Column(String(10), nullable=False)
+    rating = Column(Float, nullable=False)
+    # games rated
+    games = Column(Integer, nullable=False, default=0)
+
+
+class RatedGame(Base):
+    """SQL alchemy table structure for games already applied to the ratings, anything else is applied by the next ingest
+    """
+    __tablename__ = 'rated_game'
+
+    game_id = Column(String(50), ForeignKey('game.id'), unique=True, nullable=False)
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, String, Integer, DateTime
+from sqlalchemy import Column, String, SmallInteger
 
 from .base import Base
+from .types import DateTimeDate
 
 
 class Tournament(Base):
@@ -10,7 +11,10 @@ class Tournament(Base):
 
     id = Column(String(50), primary_key=True)
     name = Column(String(100))
-    surface = Column(String(50))
-    draw_size = Column(Integer)
-    level = Column(String(50))
-    start_date = Column(DateTime)
+    # i.e. Hard, Clay, Grass, Carpet
+    surface = Column(String(10))
+    draw_size = Column(SmallInteger)
+    # i.e. G, P, I, W100
+    level = Column(String(10))
+    # indexed for year ranges and date ordering (exports, listings, player stats)
+    start_date = Column(DateTimeDate, index=True)
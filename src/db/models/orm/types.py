@@ -0,0 +1,17 @@
+from datetime import date, datetime
+
+from sqlalchemy.types import TypeDecorator, Date
+
+
+class DateTimeDate(TypeDecorator):
+    """Stored as a DATE (3 bytes against DATETIME's 5+) but read and written as a datetime at midnight, so the
+    response models and cursors keep their datetime fields
+    """
+    impl = Date
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return value.date() if isinstance(value, datetime) else value
+
+    def process_result_value(self, value, dialect):
+        return datetime(value.year, value.month, value.day) if isinstance(value, date) else value
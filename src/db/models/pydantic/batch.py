@@ -0,0 +1,46 @@
+from typing import List
+from pydantic import BaseModel, conlist
+
+from ....constants import API_BATCH_MAX_IDS
+from .player import Player
+from .tournament import Tournament
+from .game import Game
+
+
+class PlayerBatchRequest(BaseModel):
+    """Pydantic request schema for a batch of players
+    """
+    ids: conlist(int, min_items=1, max_items=API_BATCH_MAX_IDS)
+
+
+class PlayerBatch(BaseModel):
+    """Pydantic schema for a batch of players, in request order
+    """
+    results: List[Player]
+    missing: List[int]
+
+
+class TournamentBatchRequest(BaseModel):
+    """Pydantic request schema for a batch of tournaments
+    """
+    ids: conlist(str, min_items=1, max_items=API_BATCH_MAX_IDS)
+
+
+class TournamentBatch(BaseModel):
+    """Pydantic schema for a batch of tournaments, in request order
+    """
+    results: List[Tournament]
+    missing: List[str]
+
+
+class GameBatchRequest(BaseModel):
+    """Pydantic request schema for a batch of games
+    """
+    ids: conlist(str, min_items=1, max_items=API_BATCH_MAX_IDS)
+
+
+class GameBatch(BaseModel):
+    """Pydantic schema for a batch of games, in request order
+    """
+    results: List[Game]
+    missing: List[str]
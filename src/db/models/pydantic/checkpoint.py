@@ -0,0 +1,26 @@
+from typing import Optional
+from datetime import datetime
+
+from .base import BaseModel
+
+
+class IngestCheckpointBase(BaseModel):
+    """Pydantic base schema for ingest checkpoints
+    """
+    year: int
+    circuit: str
+    sha: str
+
+
+class IngestCheckpointCreate(IngestCheckpointBase):
+    """Pydantic create schema for ingest checkpoints
+    """
+    pass
+
+
+class IngestCheckpoint(IngestCheckpointBase):
+    """Pydantic object schema for ingest checkpoints
+    """
+    done: bool
+    games: int
+    date: Optional[datetime] = None
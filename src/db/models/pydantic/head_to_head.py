@@ -0,0 +1,16 @@
+from typing import List
+from pydantic import BaseModel
+
+from .game import Game
+from .player_stats import PlayerStats
+
+
+class HeadToHead(BaseModel):
+    """Pydantic schema for every game between two players, ordered by tournament start date then game id, with each
+    player's stat totals over those games
+    """
+    player_a_id: int
+    player_b_id: int
+    player_a_stats: PlayerStats
+    player_b_stats: PlayerStats
+    games: List[Game]
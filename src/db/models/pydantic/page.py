@@ -0,0 +1,12 @@
+from typing import List, Optional
+from pydantic import BaseModel
+
+from .game import Game
+
+
+class GamePage(BaseModel):
+    """Pydantic schema for a page of games, ordered by tournament start date then game id
+    """
+    results: List[Game]
+    # pass as `cursor` for the next page, None on the last page
+    next_cursor: Optional[str] = None
@@ -23,7 +23,7 @@ class PerformanceCreate(PerformanceBase, CreateModel):
     """
     game_id: str
     player_id: int
-    # used in db.py add_performance() to determine which table to insert to
+    # with game_id identifies the performance
     won: bool
 
     # override CreateModel comprison
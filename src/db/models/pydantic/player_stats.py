@@ -0,0 +1,33 @@
+from typing import List, Optional
+from pydantic import BaseModel
+
+
+class PlayerStats(BaseModel):
+    """Pydantic object schema for a player's stat totals, over a year and surface or a whole career
+    """
+    year: Optional[int] = None
+    surface: Optional[str] = None
+    games: int
+    wins: int
+    # games with serve stats recorded, i.e. aces per game = aces / stat_games
+    stat_games: int
+    aces: float
+    double_faults: float
+    serve_points: float
+    first_serve_in: float
+    first_serve_won: float
+    second_serve_won: float
+    serve_games: float
+    break_points_faced: float
+    break_points_saved: float
+
+    class Config:
+        orm_mode = True
+
+
+class PlayerStatsSummary(BaseModel):
+    """Pydantic schema for a player's stats, totals plus the (year, surface) breakdown they're summed from
+    """
+    player_id: int
+    total: PlayerStats
+    breakdown: List[PlayerStats]
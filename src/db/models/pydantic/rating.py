@@ -0,0 +1,21 @@
+from typing import List
+from pydantic import BaseModel
+
+
+class Rating(BaseModel):
+    """Pydantic object schema for an Elo rating on a surface, or across all of them
+    """
+    surface: str
+    rating: float
+    games: int
+
+    class Config:
+        orm_mode = True
+
+
+class PlayerRatings(BaseModel):
+    """Pydantic schema for a player's ratings, overall plus one per surface played on
+    """
+    player_id: int
+    overall: Rating
+    surfaces: List[Rating]
@@ -0,0 +1,10 @@
+from typing import List
+from pydantic import BaseModel
+
+from .player import Player
+
+
+class PlayerSearchResults(BaseModel):
+    """Pydantic schema for players matching a name search, best match first
+    """
+    results: List[Player]
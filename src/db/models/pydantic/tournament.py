@@ -1,3 +1,4 @@
+from typing import Optional
 from datetime import datetime
 
 from .base import BaseModel, CreateModel
@@ -11,7 +12,8 @@ class TournamentBase(BaseModel):
     surface: str
     draw_size: int
     level: str
-    start_date: datetime
+    # None if the source data has no tourney_date
+    start_date: Optional[datetime]
 
 
 class TournamentCreate(TournamentBase, CreateModel):
@@ -0,0 +1,84 @@
+from typing import Any, Dict
+import threading
+import time
+
+from sqlalchemy.pool import Pool, QueuePool, AsyncAdaptedQueuePool
+
+from ..settings.db import DB_CONFIG
+
+
+class TimedPoolMixin:
+    """Records how long checkouts wait for a connection, including opening a new one or pre pinging it
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_seconds = 0.
+        self.max_wait_seconds = 0.
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            waited = time.perf_counter() - start
+            with self._lock:
+                self.checkouts += 1
+                self.wait_seconds += waited
+                self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+
+class TimedQueuePool(TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_options(connection_str: str, is_async: bool = False) -> Dict[str, Any]:
+    """create_engine pool arguments from the db settings
+
+    Args:
+        connection_str (str): database url the engine is created with
+        is_async (bool, optional): engine is an async one. Defaults to False.
+
+    Returns:
+        Dict[str, Any]: keyword arguments for create_engine, empty for sqlite which keeps its own default pool
+    """
+    if connection_str.startswith('sqlite'):
+        return {}
+    return {
+        'poolclass': TimedAsyncAdaptedQueuePool if is_async else TimedQueuePool,
+        'pool_size': DB_CONFIG['db_pool_size'],
+        'max_overflow': DB_CONFIG['db_max_overflow'],
+        'pool_timeout': DB_CONFIG['db_pool_timeout'],
+        'pool_recycle': DB_CONFIG['db_pool_recycle'],
+        'pool_pre_ping': DB_CONFIG['db_pool_pre_ping'],
+    }
+
+
+def pool_metrics(pool: Pool) -> Dict[str, Any]:
+    """Current state of a connection pool
+
+    Args:
+        pool (Pool): engine.pool (or engine.sync_engine.pool for an async engine)
+
+    Returns:
+        Dict[str, Any]: pool class, plus connections checked in / out and overflow in use for queue pools
+            and checkout wait times for timed pools
+    """
+    metrics: Dict[str, Any] = {'pool': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        # sqlalchemy reports unopened capacity as negative overflow
+        metrics.update(size=pool.size(), checked_in=pool.checkedin(),
+                       checked_out=pool.checkedout(), overflow=max(pool.overflow(), 0))
+    if isinstance(pool, TimedPoolMixin):
+        with pool._lock:
+            metrics.update(checkouts=pool.checkouts,
+                           wait_seconds=pool.wait_seconds,
+                           mean_wait_seconds=pool.wait_seconds / pool.checkouts if pool.checkouts else 0.,
+                           max_wait_seconds=pool.max_wait_seconds)
+    return metrics
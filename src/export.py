@@ -0,0 +1,58 @@
+from typing import AsyncIterator, List, Sequence
+from datetime import datetime
+from enum import Enum
+import csv
+import io
+import json
+
+from sqlalchemy.engine import Row
+
+
+class ExportFormat(str, Enum):
+    ndjson = 'ndjson'
+    csv = 'csv'
+
+
+MEDIA_TYPES = {ExportFormat.ndjson: 'application/x-ndjson', ExportFormat.csv: 'text/csv'}
+
+
+def _value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def ndjson_chunk(rows: List[Row], columns: Sequence[str]) -> bytes:
+    """One json object per row, newline separated
+    """
+    return ''.join(json.dumps(dict(zip(columns, map(_value, row)))) + '\n' for row in rows).encode()
+
+
+def csv_chunk(rows: List[Row], columns: Sequence[str]) -> bytes:
+    """Rows as csv lines, NULL as an empty field
+    """
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows([_value(value) for value in row] for row in rows)
+    return buffer.getvalue().encode()
+
+
+def csv_header(columns: Sequence[str]) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(columns)
+    return buffer.getvalue().encode()
+
+
+async def stream_export(chunks: AsyncIterator[List[Row]], columns: Sequence[str], format: ExportFormat) -> AsyncIterator[bytes]:
+    """Encodes chunks of rows as they're read, nothing beyond the current chunk is held
+
+    Args:
+        chunks (AsyncIterator[List[Row]]): i.e. `AsyncQueryDB.stream_games`
+        columns (Sequence[str]): row column names
+        format (ExportFormat): ndjson or csv
+
+    Yields:
+        AsyncIterator[bytes]: response body
+    """
+    if format == ExportFormat.csv:
+        yield csv_header(columns)
+    encode = csv_chunk if format == ExportFormat.csv else ndjson_chunk
+    async for rows in chunks:
+        yield encode(rows, columns)
@@ -1,46 +1,397 @@
-from typing import Generator
-from fastapi import FastAPI, Depends, HTTPException
+from typing import Any, AsyncGenerator, Dict, Iterable, List, Optional, Type, Union
+from functools import lru_cache
+import asyncio
+import logging
+from arq.connections import create_pool
+from fastapi import FastAPI, Depends, HTTPException, Request, Query
+from fastapi.responses import StreamingResponse, PlainTextResponse
 
-from .db.db import DBClient, QueryDB
+from .cache import ResponseCache, RedisResponseCache, subscribe_versions
+from .serialization import Serializer
+from .search import PlayerIndex, PlayerSearch
+from .metrics import Metrics, MetricsMiddleware, render_gauges
+from .db.async_db import AsyncDBClient, AsyncQueryDB, export_columns
+from .db.models.orm.base import Base as ORMBase
+from .db.models.pydantic.base import BaseModel
 from .db.models.orm.player import Player as ORMPlayer
 from .db.models.pydantic.player import Player
 from .db.models.orm.tournament import Tournament as ORMTournament
 from .db.models.pydantic.tournament import Tournament
 from .db.models.orm.game import Game as ORMGame
 from .db.models.pydantic.game import Game
+from .db.models.pydantic.page import GamePage
+from .db.models.orm.player_stats import PlayerStats as ORMPlayerStats
+from .db.models.pydantic.player_stats import PlayerStats, PlayerStatsSummary
+from .db.models.pydantic.head_to_head import HeadToHead
+from .db.models.pydantic.rating import Rating, PlayerRatings
+from .db.models.pydantic.search import PlayerSearchResults
+from .db.models.orm.performance import PERFORMANCE_STATS
+from .db.models.pydantic.batch import PlayerBatchRequest, PlayerBatch, TournamentBatchRequest, TournamentBatch, \
+    GameBatchRequest, GameBatch
+from .pagination import Cursor, encode_cursor, decode_cursor
+from .export import ExportFormat, MEDIA_TYPES, stream_export
+from .constants import API_PAGE_LIMIT, API_PAGE_MAX_LIMIT, ELO_OVERALL, ELO_INITIAL_RATING, API_SEARCH_LIMIT, \
+    API_SEARCH_MAX_LIMIT
+from .settings.api import API_CACHE_CONFIG
+from .settings.redis import REDIS_SETTINGS
 
 
+logger = logging.getLogger(__name__)
+
 app = FastAPI()
 
 
-# dependency
-def get_query_db() -> Generator[QueryDB, None, None]:
-    db = DBClient()
+# dependencies
+@lru_cache()
+def get_metrics() -> Metrics:
+    # one registry per process, written by the middleware and read by /metrics
+    return Metrics()
+
+
+@lru_cache()
+def get_db_client() -> AsyncDBClient:
+    # engine (and its connection pool) shared by every request
+    return AsyncDBClient()
+
+
+async def get_query_db(db: AsyncDBClient = Depends(get_db_client)) -> AsyncGenerator[AsyncQueryDB, None]:
+    session = db.Session()
     try:
-        yield QueryDB(db.session)
+        yield AsyncQueryDB(session)
     finally:
-        db.session.close()
+        await session.close()
+
+
+@lru_cache()
+def get_response_cache() -> ResponseCache:
+    return ResponseCache()
+
+
+@lru_cache()
+def get_serializer() -> Serializer:
+    return Serializer()
+
+
+@lru_cache()
+def get_player_search() -> PlayerSearch:
+    return PlayerSearch()
+
+
+def get_redis_cache(request: Request) -> Optional[RedisResponseCache]:
+    # only set when API_REDIS_CACHE is enabled
+    return getattr(request.app.state, 'redis_cache', None)
+
+
+async def check_version(db: AsyncQueryDB, cache: ResponseCache) -> Optional[str]:
+    """Current data version, looked up again once the cache's check expires
+
+    Returns:
+        Optional[str]: last ingested sha
+    """
+    if cache.version_expired():
+        cache.set_version(await db.get_last_ingested_sha())
+    return cache.version
+
+
+async def player_index(db: AsyncQueryDB, cache: ResponseCache, search: PlayerSearch) -> PlayerIndex:
+    """Name index of every player, rebuilt when the data version moves on
+    """
+    async def load():
+        return [(player.first_name, player.last_name, player) for player in await db.get_players()]
+    return await search.get(await check_version(db, cache), load)
+
+
+async def read_objects(ids: Iterable[Union[int, str]], table: ORMBase, response_model: Type[BaseModel], db: AsyncQueryDB,
+                       serializer: Serializer, cache: ResponseCache,
+                       redis_cache: Optional[RedisResponseCache] = None) -> Dict[Union[int, str], Any]:
+    """Read through the response cache then the shared redis one, only the ids both miss are looked up in the db
+    (with a single statement), the version is also checked once it expires
+
+    Args:
+        ids (Iterable[Union[int, str]]): object ids
+        table (ORMBase): table objects reside in
+        response_model (Type[BaseModel]): schema the route responds with
+        db (AsyncQueryDB): read side
+        serializer (Serializer): builds responses from orm objects
+        cache (ResponseCache): responses cached so far by this process
+        redis_cache (Optional[RedisResponseCache], optional): responses cached by any replica. Defaults to None.
+
+    Returns:
+        Dict[Union[int, str], Any]: id -> response, ids without an object left out
+    """
+    await check_version(db, cache)
+
+    responses, missed = {}, []
+    for id in dict.fromkeys(ids):
+        response = cache.get((table.__tablename__, id))
+        if response is None:
+            missed.append(id)
+        else:
+            responses[id] = response
+
+    if missed and redis_cache:
+        payloads = await redis_cache.get_many(cache.version, [(table.__tablename__, id) for id in missed])
+        for id, payload in zip(missed, payloads):
+            if payload is not None:
+                responses[id] = serializer.loads(payload, response_model)
+                cache.set((table.__tablename__, id), responses[id])
+        missed = [id for id in missed if id not in responses]
+
+    if missed:
+        found = {id: serializer.from_orm(obj, response_model) for id, obj in (await db.get_objects_by_ids(missed, table)).items()}
+        for id, response in found.items():
+            cache.set((table.__tablename__, id), response)
+        if redis_cache and found:
+            await redis_cache.set_many(cache.version, {(table.__tablename__, id): serializer.dumps(response) for id, response in found.items()})
+        responses.update(found)
+    return responses
+
+
+async def read_object(id: Union[int, str], table: ORMBase, response_model: Type[BaseModel], db: AsyncQueryDB,
+                      serializer: Serializer, cache: ResponseCache,
+                      redis_cache: Optional[RedisResponseCache] = None) -> Optional[Any]:
+    """`read_objects` for a single id, None if no object with that id
+    """
+    return (await read_objects([id], table, response_model, db, serializer, cache, redis_cache)).get(id)
+
+
+async def read_batch(ids: List[Union[int, str]], table: ORMBase, response_model: Type[BaseModel], db: AsyncQueryDB,
+                     serializer: Serializer, cache: ResponseCache, redis_cache: Optional[RedisResponseCache] = None) -> Any:
+    """`read_objects` as a batch response, results and missing ids both in request order
+    """
+    responses = await read_objects(ids, table, response_model, db, serializer, cache, redis_cache)
+    return serializer.respond({'results': [responses[id] for id in ids if id in responses],
+                               'missing': [id for id in ids if id not in responses]})
+
+
+def parse_cursor(cursor: Optional[str]) -> Optional[Cursor]:
+    try:
+        return decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail='Invalid cursor')
+
+
+def game_page(games: List[ORMGame], limit: int, serializer: Serializer) -> Any:
+    """Page response from `limit` + 1 games, the extra game only tells there's a next page
+    """
+    next_cursor = None
+    if len(games) > limit:
+        games = games[:limit]
+        next_cursor = encode_cursor(games[-1].tournament.start_date, games[-1].id)
+    return serializer.respond({'results': [serializer.from_orm(game, Game) for game in games], 'next_cursor': next_cursor})
+
+
+def player_stats_summary(player_id: int, rows: List[ORMPlayerStats], serializer: Serializer) -> Any:
+    """Stats response, the total summed over every (year, surface) row
+    """
+    total = {field: None if field in ('year', 'surface') else sum(getattr(row, field) for row in rows)
+             for field in PlayerStats.__fields__}
+    return serializer.respond({'player_id': player_id, 'total': total,
+                               'breakdown': [serializer.from_orm(row, PlayerStats) for row in rows]})
+
+
+def head_to_head_stats(player_id: int, games: List[ORMGame]) -> Dict[str, Any]:
+    """A player's stat totals over games, shaped as `PlayerStats`
+    """
+    performances = [game.w_performance if game.w_performance.player_id == player_id else game.l_performance
+                    for game in games]
+    return {'year': None, 'surface': None, 'games': len(performances),
+            'wins': sum(performance.won for performance in performances),
+            'stat_games': sum(performance.serve_points is not None for performance in performances),
+            **{stat: float(sum(getattr(performance, stat) or 0 for performance in performances)) for stat in PERFORMANCE_STATS}}
+
+
+app.add_middleware(MetricsMiddleware, metrics=get_metrics())
+
+
+@app.on_event('startup')
+async def connect_redis_cache():
+    if API_CACHE_CONFIG['redis']:
+        redis = await create_pool(REDIS_SETTINGS)
+        app.state.redis_cache = RedisResponseCache(redis)
+        # worker publishes each ingested sha, drops this replica's stale responses straight away
+        app.state.version_subscriber = asyncio.ensure_future(subscribe_versions(redis, get_response_cache()))
+
+
+@app.on_event('startup')
+async def build_player_index():
+    # first search answered straight from memory, best effort as the db may not be reachable yet
+    def dependency(func):
+        return app.dependency_overrides.get(func, func)()
+
+    session = dependency(get_db_client).Session()
+    try:
+        await player_index(AsyncQueryDB(session), dependency(get_response_cache), dependency(get_player_search))
+    except Exception as e:
+        logger.warning('player index not built at startup: %r', e)
+    finally:
+        await session.close()
+
+
+@app.on_event('shutdown')
+async def close_redis_cache():
+    redis_cache = getattr(app.state, 'redis_cache', None)
+    if redis_cache is not None:
+        app.state.version_subscriber.cancel()
+        redis_cache.redis.close()
+        await redis_cache.redis.wait_closed()
+
+
+@app.on_event('shutdown')
+async def dispose_db_client():
+    if get_db_client.cache_info().currsize:
+        await get_db_client().dispose()
+
+
+@app.get('/metrics', response_class=PlainTextResponse)
+async def read_metrics(metrics: Metrics = Depends(get_metrics), db: AsyncDBClient = Depends(get_db_client),
+                       cache: ResponseCache = Depends(get_response_cache)) -> PlainTextResponse:
+    # prometheus text format, pool and cache numbers alongside the per route ones
+    content = metrics.render() + render_gauges('db_pool', db.pool_metrics(), 'Connection pool, see /metrics/pool') + \
+        render_gauges('api_cache', cache.stats(), 'Response cache, see /metrics/cache')
+    return PlainTextResponse(content, media_type='text/plain; version=0.0.4')
+
+
+@app.get('/metrics/pool')
+async def read_pool_metrics(db: AsyncDBClient = Depends(get_db_client)) -> dict:
+    return db.pool_metrics()
+
+
+@app.get('/metrics/cache')
+async def read_cache_metrics(cache: ResponseCache = Depends(get_response_cache)) -> dict:
+    return cache.stats()
+
+
+@app.get('/players/search', response_model=PlayerSearchResults)
+async def search_players(q: str = Query(..., min_length=1), limit: int = Query(API_SEARCH_LIMIT, ge=1, le=API_SEARCH_MAX_LIMIT),
+                         db: AsyncQueryDB = Depends(get_query_db), cache: ResponseCache = Depends(get_response_cache),
+                         search: PlayerSearch = Depends(get_player_search),
+                         serializer: Serializer = Depends(get_serializer)) -> PlayerSearchResults:
+    index = await player_index(db, cache, search)
+    return serializer.respond({'results': [serializer.from_orm(player, Player) for player in index.search(q, limit)]})
 
 
 @app.get('/player/{player_id}', response_model=Player)
-def read_player_by_id(player_id: int, db: QueryDB = Depends(get_query_db)) -> Player:
-    player = db.get_object_by_id(player_id, ORMPlayer)
+async def read_player_by_id(player_id: int, db: AsyncQueryDB = Depends(get_query_db),
+                            cache: ResponseCache = Depends(get_response_cache),
+                            redis_cache: Optional[RedisResponseCache] = Depends(get_redis_cache),
+                            serializer: Serializer = Depends(get_serializer)) -> Player:
+    player = await read_object(player_id, ORMPlayer, Player, db, serializer, cache, redis_cache)
     if player is None:
         raise HTTPException(status_code=404, detail='Player not found')
-    return player
+    return serializer.respond(player)
 
 
 @app.get('/tournament/{tourney_id}', response_model=Tournament)
-def read_tournament_by_id(tourney_id: str, db: QueryDB = Depends(get_query_db)) -> Tournament:
-    tournament = db.get_object_by_id(tourney_id, ORMTournament)
+async def read_tournament_by_id(tourney_id: str, db: AsyncQueryDB = Depends(get_query_db),
+                                cache: ResponseCache = Depends(get_response_cache),
+                                redis_cache: Optional[RedisResponseCache] = Depends(get_redis_cache),
+                                serializer: Serializer = Depends(get_serializer)) -> Tournament:
+    tournament = await read_object(tourney_id, ORMTournament, Tournament, db, serializer, cache, redis_cache)
     if tournament is None:
         raise HTTPException(status_code=404, detail='Tournament not found')
-    return tournament
+    return serializer.respond(tournament)
 
 
 @app.get('/game/{game_id}', response_model=Game)
-def read_game_by_id(game_id: str, db: QueryDB = Depends(get_query_db)) -> Game:
-    game = db.get_object_by_id(game_id, ORMGame)
+async def read_game_by_id(game_id: str, db: AsyncQueryDB = Depends(get_query_db),
+                          cache: ResponseCache = Depends(get_response_cache),
+                          redis_cache: Optional[RedisResponseCache] = Depends(get_redis_cache),
+                          serializer: Serializer = Depends(get_serializer)) -> Game:
+    game = await read_object(game_id, ORMGame, Game, db, serializer, cache, redis_cache)
     if game is None:
         raise HTTPException(status_code=404, detail='Game not found')
-    return game
+    return serializer.respond(game)
+
+
+@app.post('/players:batch', response_model=PlayerBatch)
+async def read_players_batch(batch: PlayerBatchRequest, db: AsyncQueryDB = Depends(get_query_db),
+                             cache: ResponseCache = Depends(get_response_cache),
+                             redis_cache: Optional[RedisResponseCache] = Depends(get_redis_cache),
+                             serializer: Serializer = Depends(get_serializer)) -> PlayerBatch:
+    return await read_batch(batch.ids, ORMPlayer, Player, db, serializer, cache, redis_cache)
+
+
+@app.post('/tournaments:batch', response_model=TournamentBatch)
+async def read_tournaments_batch(batch: TournamentBatchRequest, db: AsyncQueryDB = Depends(get_query_db),
+                                 cache: ResponseCache = Depends(get_response_cache),
+                                 redis_cache: Optional[RedisResponseCache] = Depends(get_redis_cache),
+                                 serializer: Serializer = Depends(get_serializer)) -> TournamentBatch:
+    return await read_batch(batch.ids, ORMTournament, Tournament, db, serializer, cache, redis_cache)
+
+
+@app.post('/games:batch', response_model=GameBatch)
+async def read_games_batch(batch: GameBatchRequest, db: AsyncQueryDB = Depends(get_query_db),
+                           cache: ResponseCache = Depends(get_response_cache),
+                           redis_cache: Optional[RedisResponseCache] = Depends(get_redis_cache),
+                           serializer: Serializer = Depends(get_serializer)) -> GameBatch:
+    return await read_batch(batch.ids, ORMGame, Game, db, serializer, cache, redis_cache)
+
+
+@app.get('/player/{player_id}/games', response_model=GamePage)
+async def read_player_games(player_id: int, cursor: Optional[str] = None,
+                            limit: int = Query(API_PAGE_LIMIT, ge=1, le=API_PAGE_MAX_LIMIT),
+                            db: AsyncQueryDB = Depends(get_query_db),
+                            serializer: Serializer = Depends(get_serializer)) -> GamePage:
+    games = await db.get_player_games(player_id, parse_cursor(cursor), limit + 1)
+    if not games and cursor is None and await db.get_object_by_id(player_id, ORMPlayer) is None:
+        raise HTTPException(status_code=404, detail='Player not found')
+    return game_page(games, limit, serializer)
+
+
+@app.get('/player/{player_id}/stats', response_model=PlayerStatsSummary)
+async def read_player_stats(player_id: int, year: Optional[int] = None, surface: Optional[str] = None,
+                            db: AsyncQueryDB = Depends(get_query_db),
+                            serializer: Serializer = Depends(get_serializer)) -> PlayerStatsSummary:
+    rows = await db.get_player_stats(player_id, year=year, surface=surface)
+    if not rows and await db.get_object_by_id(player_id, ORMPlayer) is None:
+        raise HTTPException(status_code=404, detail='Player not found')
+    return player_stats_summary(player_id, rows, serializer)
+
+
+@app.get('/player/{player_id}/rating', response_model=PlayerRatings)
+async def read_player_rating(player_id: int, db: AsyncQueryDB = Depends(get_query_db),
+                             serializer: Serializer = Depends(get_serializer)) -> PlayerRatings:
+    ratings = await db.get_player_ratings(player_id)
+    if not ratings and await db.get_object_by_id(player_id, ORMPlayer) is None:
+        raise HTTPException(status_code=404, detail='Player not found')
+    overall = next((rating for rating in ratings if rating.surface == ELO_OVERALL), None)
+    # players yet to play a rated game are on the initial rating
+    overall = serializer.from_orm(overall, Rating) if overall else {'surface': ELO_OVERALL, 'rating': ELO_INITIAL_RATING, 'games': 0}
+    return serializer.respond({'player_id': player_id, 'overall': overall,
+                               'surfaces': [serializer.from_orm(rating, Rating) for rating in ratings if rating.surface != ELO_OVERALL]})
+
+
+@app.get('/h2h/{player_a_id}/{player_b_id}', response_model=HeadToHead)
+async def read_head_to_head(player_a_id: int, player_b_id: int, db: AsyncQueryDB = Depends(get_query_db),
+                            serializer: Serializer = Depends(get_serializer)) -> HeadToHead:
+    games = await db.get_head_to_head_games(player_a_id, player_b_id)
+    if not games:
+        players = await db.get_objects_by_ids([player_a_id, player_b_id], ORMPlayer, eager=False)
+        if len(players) < len({player_a_id, player_b_id}):
+            raise HTTPException(status_code=404, detail='Player not found')
+    return serializer.respond({'player_a_id': player_a_id, 'player_b_id': player_b_id,
+                               'player_a_stats': head_to_head_stats(player_a_id, games),
+                               'player_b_stats': head_to_head_stats(player_b_id, games),
+                               'games': [serializer.from_orm(game, Game) for game in games]})
+
+
+@app.get('/tournament/{tourney_id}/games', response_model=GamePage)
+async def read_tournament_games(tourney_id: str, cursor: Optional[str] = None,
+                                limit: int = Query(API_PAGE_LIMIT, ge=1, le=API_PAGE_MAX_LIMIT),
+                                db: AsyncQueryDB = Depends(get_query_db),
+                                serializer: Serializer = Depends(get_serializer)) -> GamePage:
+    games = await db.get_tournament_games(tourney_id, parse_cursor(cursor), limit + 1)
+    if not games and cursor is None and await db.get_object_by_id(tourney_id, ORMTournament) is None:
+        raise HTTPException(status_code=404, detail='Tournament not found')
+    return game_page(games, limit, serializer)
+
+
+@app.get('/export/games')
+async def export_games(format: ExportFormat = ExportFormat.ndjson, year_from: Optional[int] = None, year_to: Optional[int] = None,
+                       circuit: Optional[str] = None, surface: Optional[str] = None,
+                       db: AsyncQueryDB = Depends(get_query_db)) -> StreamingResponse:
+    # streamed straight from a server side cursor, the session is closed once the body is sent
+    chunks = db.stream_games(year_from=year_from, year_to=year_to, circuit=circuit, surface=surface)
+    return StreamingResponse(stream_export(chunks, export_columns(), format), media_type=MEDIA_TYPES[format],
+                             headers={'Content-Disposition': f'attachment; filename="games.{format.value}"'})
@@ -0,0 +1,194 @@
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from bisect import bisect_left
+from contextvars import ContextVar
+import time
+
+from starlette.routing import Match
+
+from .constants import METRICS_LATENCY_BUCKETS, METRICS_QUERY_BUCKETS
+
+
+# (method, route template) a request is recorded under, i.e. ('GET', '/game/{game_id}')
+RouteKey = Tuple[str, str]
+
+# requests matching no route, kept as one series rather than one per path
+UNMATCHED_ROUTE = '<unmatched>'
+
+
+class RequestTimings:
+    '''
+    Statements run while serving a request and the time spent in them, filled in by `record_query`
+    '''
+    __slots__ = ('queries', 'db_seconds')
+
+    def __init__(self) -> None:
+        self.queries = 0
+        self.db_seconds = 0.
+
+
+_request_timings: ContextVar[Optional[RequestTimings]] = ContextVar('request_timings', default=None)
+
+
+def record_query(seconds: float) -> None:
+    """Adds a statement to the timings of the request running it, statements outside a request (i.e. the worker) are
+    ignored. Called from the engines' after_cursor_execute listener
+    """
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.queries += 1
+        timings.db_seconds += seconds
+
+
+class Histogram:
+    '''
+    Counts of observations per bucket upper bound, plus their sum
+    '''
+
+    def __init__(self, buckets: List[float]) -> None:
+        self.buckets = buckets
+        # last count for observations above every bound
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def cumulative(self) -> Iterable[Tuple[str, int]]:
+        """(le, observations at or below it) per bound then +Inf, as prometheus reports buckets
+        """
+        total = 0
+        for bound, count in zip([*map(_format_value, self.buckets), '+Inf'], self.counts):
+            total += count
+            yield bound, total
+
+
+class Metrics:
+    '''
+    Per route request counts, latency, db time and statements per request, rendered in the prometheus text format
+    '''
+
+    def __init__(self, latency_buckets: List[float] = METRICS_LATENCY_BUCKETS,
+                 query_buckets: List[float] = METRICS_QUERY_BUCKETS) -> None:
+        self.latency_buckets = latency_buckets
+        self.query_buckets = query_buckets
+        self.requests: Dict[Tuple[str, str, int], int] = {}
+        self.latency: Dict[RouteKey, Histogram] = {}
+        self.db_time: Dict[RouteKey, Histogram] = {}
+        self.queries: Dict[RouteKey, Histogram] = {}
+
+    def observe(self, method: str, route: str, status: int, seconds: float, timings: RequestTimings) -> None:
+        """Records a request served
+
+        Args:
+            method (str): i.e. GET
+            route (str): route template the request matched, i.e. /game/{game_id}
+            status (int): response status code
+            seconds (float): time from the request arriving to the last of the response being sent
+            timings (RequestTimings): statements run serving it
+        """
+        self.requests[method, route, status] = self.requests.get((method, route, status), 0) + 1
+        key = (method, route)
+        if key not in self.latency:
+            self.latency[key] = Histogram(self.latency_buckets)
+            self.db_time[key] = Histogram(self.latency_buckets)
+            self.queries[key] = Histogram(self.query_buckets)
+        self.latency[key].observe(seconds)
+        self.db_time[key].observe(timings.db_seconds)
+        self.queries[key].observe(timings.queries)
+
+    def render(self) -> str:
+        lines = ['# HELP api_requests_total Requests served by route and status',
+                 '# TYPE api_requests_total counter']
+        for (method, route, status), count in sorted(self.requests.items()):
+            lines.append(f'api_requests_total{_labels(method=method, route=route, status=status)} {count}')
+
+        for name, description, histograms in [
+                ('api_request_duration_seconds', 'Time to serve a request', self.latency),
+                ('api_request_db_duration_seconds', 'Time spent running statements per request', self.db_time),
+                ('api_request_db_queries', 'Statements run per request (lazy loads included)', self.queries)]:
+            lines += [f'# HELP {name} {description}', f'# TYPE {name} histogram']
+            for (method, route), histogram in sorted(histograms.items()):
+                for le, count in histogram.cumulative():
+                    lines.append(f'{name}_bucket{_labels(method=method, route=route, le=le)} {count}')
+                lines.append(f'{name}_sum{_labels(method=method, route=route)} {_format_value(histogram.sum)}')
+                lines.append(f'{name}_count{_labels(method=method, route=route)} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+
+def render_gauges(prefix: str, values: Dict[str, Any], description: str) -> str:
+    """Numeric values of a stats dict (i.e. `pool_metrics()`, `ResponseCache.stats()`) as prometheus gauges
+    """
+    lines = []
+    for name, value in values.items():
+        if isinstance(value, (int, float)):
+            lines += [f'# HELP {prefix}_{name} {description}', f'# TYPE {prefix}_{name} gauge',
+                      f'{prefix}_{name} {_format_value(value)}']
+    return '\n'.join(lines) + '\n' if lines else ''
+
+
+class MetricsMiddleware:
+    '''
+    ASGI middleware timing every http request into `Metrics` under the template of the route it matched. The
+    request's statements are counted through a context variable the db engines' listeners write to, so they are
+    attributed to the request even when served concurrently with others
+    '''
+
+    def __init__(self, app: Callable, metrics: Metrics) -> None:
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _request_timings.set(timings)
+        status = 500
+
+        async def send_status(message: dict) -> None:
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            # streamed responses (i.e. exports) are timed until their last chunk is sent
+            await self.app(scope, receive, send_status)
+        finally:
+            self.metrics.observe(scope['method'], _route(scope), status, time.perf_counter() - start, timings)
+            _request_timings.reset(token)
+
+
+def _route(scope: dict) -> str:
+    # starlette sets the app before any middleware runs, its routes are matched again as the router doesn't record
+    # the route in the scope
+    partial = None
+    for route in getattr(scope.get('app'), 'routes', []):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+        if match == Match.PARTIAL and partial is None:
+            # path matched but not the method
+            partial = route.path
+    return partial or UNMATCHED_ROUTE
+
+
+def _labels(**labels: Any) -> str:
+    return '{' + ','.join(f'{name}="{_escape(str(value))}"' for name, value in labels.items()) + '}'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, bool):
+        return str(int(value))
+    return repr(float(value)) if isinstance(value, float) else str(value)
@@ -0,0 +1,34 @@
+from typing import Optional, Tuple
+from datetime import datetime
+import base64
+import json
+
+
+# position of a game in (tournament start date, game id) order, games of undated tournaments (None) after the rest
+Cursor = Tuple[Optional[datetime], str]
+
+
+def encode_cursor(start_date: Optional[datetime], game_id: str) -> str:
+    """Opaque cursor for the page after the given game
+
+    Args:
+        start_date (Optional[datetime]): last game's tournament start date, None if undated
+        game_id (str): last game's id
+
+    Returns:
+        str: url safe cursor
+    """
+    return base64.urlsafe_b64encode(json.dumps([start_date and start_date.isoformat(), game_id]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    """Inverse of `encode_cursor`
+
+    Raises:
+        ValueError: cursor wasn't made by `encode_cursor`
+    """
+    try:
+        start_date, game_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return None if start_date is None else datetime.fromisoformat(start_date), str(game_id)
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f'invalid cursor: {cursor}') from e
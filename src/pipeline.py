@@ -0,0 +1,156 @@
+from typing import Any, Callable, Deque, Iterable, Iterator, Optional, Tuple, Dict
+from collections import defaultdict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+import logging
+import queue
+import threading
+import time
+import pandas as pd
+
+from .constants import INGEST_PREFETCH_YEARS, INGEST_FETCH_WORKERS
+
+
+logger = logging.getLogger(__name__)
+
+# returns a year of raw game data, None if no games that year
+FetchYear = Callable[[int], Optional[pd.DataFrame]]
+
+
+class PipelineStats:
+    '''
+    Seconds spent per stage and rows through the pipeline
+    '''
+
+    def __init__(self) -> None:
+        self.seconds: Dict[str, float] = defaultdict(float)
+        self.years = 0
+        self.games = 0
+        # fetches are timed from several threads
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def time(self, stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.seconds[stage] += time.perf_counter() - start
+
+    def __repr__(self) -> str:
+        stages = ', '.join(f'{stage}={seconds:.2f}s' for stage, seconds in self.seconds.items())
+        return f'PipelineStats(years={self.years}, games={self.games}, {stages})'
+
+
+def stream_years(years: Iterable[int], fetch_year: FetchYear, stats: PipelineStats,
+                 prefetch: int = INGEST_PREFETCH_YEARS,
+                 fetch_workers: int = INGEST_FETCH_WORKERS) -> Iterator[Tuple[int, Optional[pd.DataFrame]]]:
+    """Fetches years in background threads, `fetch_workers` years at once and handed over in year order. At most
+    `prefetch` fetched years wait for the consumer (backpressure), so no more than `prefetch` + `fetch_workers` + 1
+    years are held at a time
+
+    Args:
+        years (Iterable[int]): years to fetch, in order
+        fetch_year (FetchYear): fetch stage i.e. `get_raw_games` for a single year
+        stats (PipelineStats): fetch time recorded as `fetch` (summed over workers), time spent waiting on a fetch as `wait`
+        prefetch (int, optional): years fetched ahead of the consumer. Defaults to INGEST_PREFETCH_YEARS.
+        fetch_workers (int, optional): years fetched concurrently. Defaults to INGEST_FETCH_WORKERS.
+
+    Raises:
+        Exception: any error raised fetching, once the years before it have been consumed
+
+    Yields:
+        Iterator[Tuple[int, Optional[pd.DataFrame]]]: (year, raw game data), data None for years without games
+    """
+    fetched: queue.Queue = queue.Queue(maxsize=max(prefetch, 1))
+    done = object()
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        # blocks while the consumer is `prefetch` years behind, gives up once the consumer has stopped
+        while not stop.is_set():
+            try:
+                fetched.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def fetch(year: int) -> Tuple[int, Optional[pd.DataFrame]]:
+        with stats.time('fetch'):
+            return year, fetch_year(year)
+
+    def producer():
+        executor = ThreadPoolExecutor(max_workers=max(fetch_workers, 1))
+        pending: Deque[Future] = deque()
+        try:
+            for year in years:
+                pending.append(executor.submit(fetch, year))
+                # oldest year handed over once the window is full, later years keep downloading meanwhile
+                if len(pending) >= fetch_workers and not put(pending.popleft().result()):
+                    return
+            while pending:
+                if not put(pending.popleft().result()):
+                    return
+            put(done)
+        except Exception as e:
+            put(e)
+        finally:
+            # consumer gone or a fetch failed, years not started yet are dropped
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    thread = threading.Thread(target=producer, daemon=True)
+    thread.start()
+    try:
+        while True:
+            with stats.time('wait'):
+                item = fetched.get()
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # consumer stopped early (i.e. load failed), let the producer exit
+        stop.set()
+        thread.join()
+
+
+def run_pipeline(years: Iterable[int], fetch_year: FetchYear, format_stage: Callable[[pd.DataFrame], Any],
+                 load_stage: Callable[[int, Any], Any], prefetch: int = INGEST_PREFETCH_YEARS,
+                 fetch_workers: int = INGEST_FETCH_WORKERS) -> PipelineStats:
+    """Streams data a year at a time: fetch -> format -> load -> release. Peak memory is bound by the largest
+    `prefetch` + `fetch_workers` + 1 years rather than the whole history
+
+    Args:
+        years (Iterable[int]): years to ingest, in order
+        fetch_year (FetchYear): fetch stage i.e. `get_raw_games` for a single year
+        format_stage (Callable[[pd.DataFrame], Any]): formats a year of raw data
+        load_stage (Callable[[int, Any], Any]): loads a year of formatted data i.e. into the db, given (year, None)
+            for years without data
+        prefetch (int, optional): years fetched ahead of loading. Defaults to INGEST_PREFETCH_YEARS.
+        fetch_workers (int, optional): years fetched concurrently. Defaults to INGEST_FETCH_WORKERS.
+
+    Returns:
+        PipelineStats: time spent per stage
+    """
+    stats = PipelineStats()
+    for year, raw_data in stream_years(years, fetch_year, stats, prefetch=prefetch, fetch_workers=fetch_workers):
+        if raw_data is None:
+            load_stage(year, None)
+            continue
+
+        with stats.time('format'):
+            formatted = format_stage(raw_data)
+        with stats.time('load'):
+            load_stage(year, formatted)
+
+        stats.years += 1
+        stats.games += len(raw_data)
+        logger.info('ingested %d: %d games, %r', year, len(raw_data), stats)
+        # release before the next year is taken off the queue
+        del raw_data, formatted
+    return stats
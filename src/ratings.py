@@ -0,0 +1,141 @@
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+from .constants import ELO_INITIAL_RATING, ELO_K, ELO_OVERALL, ROUND_ORDER
+
+
+# (player id, surface) a rating is kept for, ELO_OVERALL for the rating across all surfaces
+RatingKey = Tuple[int, str]
+
+# columns of the games rated
+RATING_GAME_COLUMNS = ['id', 'start_date', 'round', 'surface', 'winner_id', 'loser_id']
+
+
+def order_games(games: pd.DataFrame) -> pd.DataFrame:
+    """Games in the order they were played, tournament start date then round then match number (game id suffix)
+
+    Args:
+        games (pd.DataFrame): games with `RATING_GAME_COLUMNS`
+
+    Returns:
+        pd.DataFrame: games reordered
+    """
+    rounds = games['round'].map({round: i for i, round in enumerate(ROUND_ORDER)}).fillna(-1)
+    match_nums = pd.to_numeric(games['id'].str.rsplit('_', n=1).str[-1], errors='coerce').fillna(0)
+    order = np.lexsort((games['id'].to_numpy(), match_nums.to_numpy(), rounds.to_numpy(),
+                        pd.to_datetime(games['start_date']).to_numpy()))
+    return games.iloc[order].reset_index(drop=True)
+
+
+def layer_games(winners: np.ndarray, losers: np.ndarray) -> np.ndarray:
+    """Splits ordered games into layers no player appears in twice, a game's layer being one after the last layer
+    either player was in. An Elo update only reads the two players' ratings, so rating a whole layer at once, layer
+    by layer, gives exactly the ratings of rating one game at a time
+
+    Args:
+        winners (np.ndarray): winner id per game
+        losers (np.ndarray): loser id per game
+
+    Returns:
+        np.ndarray: layer per game
+    """
+    # dense player codes so the last layer per player is a list rather than a dict
+    codes, players = pd.factorize(np.concatenate([winners, losers]))
+    last = [-1] * len(players)
+    layers = [0] * len(winners)
+    for i, (winner, loser) in enumerate(zip(codes[:len(winners)].tolist(), codes[len(winners):].tolist())):
+        layer = last[winner] if last[winner] > last[loser] else last[loser]
+        last[winner] = last[loser] = layers[i] = layer + 1
+    return np.array(layers, dtype=np.int64)
+
+
+class EloRatings:
+    '''
+    Elo ratings per player and surface plus across all surfaces, games applied a layer at a time with numpy
+    '''
+
+    def __init__(self, ratings: Optional[Dict[RatingKey, Tuple[float, int]]] = None,
+                 k: float = ELO_K, initial: float = ELO_INITIAL_RATING) -> None:
+        """
+        Args:
+            ratings (Optional[Dict[RatingKey, Tuple[float, int]]], optional): (rating, games) to carry on from,
+                i.e. those stored by the last ingest. Defaults to None.
+            k (float, optional): most a single game moves a rating. Defaults to ELO_K.
+            initial (float, optional): rating of a player's first game. Defaults to ELO_INITIAL_RATING.
+        """
+        self.k = k
+        self.initial = initial
+
+        ratings = ratings or {}
+        # surface -> code, keys are held as player id << 8 | surface code so lookups are on a single int64 column
+        self._surfaces: Dict[str, int] = {ELO_OVERALL: 0}
+        self._index = pd.Index(self._key_codes(np.array([player_id for player_id, _ in ratings], dtype=np.int64),
+                                               np.array([surface for _, surface in ratings], dtype=object)))
+        self.ratings = np.array([rating for rating, _ in ratings.values()], dtype=np.float64)
+        self.games = np.array([games for _, games in ratings.values()], dtype=np.int64)
+
+    def __getitem__(self, key: RatingKey) -> float:
+        player_id, surface = key
+        if surface not in self._surfaces:
+            return self.initial
+        code = player_id << 8 | self._surfaces[surface]
+        return self.ratings[self._index.get_loc(code)] if code in self._index else self.initial
+
+    def _key_codes(self, players: np.ndarray, surfaces: np.ndarray) -> np.ndarray:
+        surface_codes = [self._surfaces.setdefault(surface, len(self._surfaces)) for surface in pd.unique(surfaces)]
+        codes = pd.Series(surfaces, dtype=object).map(dict(zip(pd.unique(surfaces), surface_codes))).to_numpy(dtype=np.int64)
+        return players << 8 | codes
+
+    def _indices(self, players: np.ndarray, surfaces: np.ndarray) -> np.ndarray:
+        # keys seen for the first time start at the initial rating
+        codes = self._key_codes(players, surfaces)
+        indices = self._index.get_indexer(codes)
+        missing = indices < 0
+        if missing.any():
+            new = pd.unique(codes[missing])
+            self._index = self._index.append(pd.Index(new))
+            self.ratings = np.concatenate([self.ratings, np.full(len(new), self.initial)])
+            self.games = np.concatenate([self.games, np.zeros(len(new), dtype=np.int64)])
+            indices[missing] = self._index.get_indexer(codes[missing])
+        return indices
+
+    def rate(self, games: pd.DataFrame) -> None:
+        """Applies games to the overall and surface ratings of both players
+
+        Args:
+            games (pd.DataFrame): games with `RATING_GAME_COLUMNS` ordered by `order_games`
+        """
+        if games.empty:
+            return
+        winners, losers = games['winner_id'].to_numpy(dtype=np.int64), games['loser_id'].to_numpy(dtype=np.int64)
+        surfaces = games['surface'].to_numpy(dtype=object)
+        layers = layer_games(winners, losers)
+
+        overall = np.full(len(games), ELO_OVERALL, dtype=object)
+        overall = (self._indices(winners, overall), self._indices(losers, overall))
+        # games without a surface only count overall
+        on_surface = pd.notna(surfaces)
+        surface = (self._indices(winners[on_surface], surfaces[on_surface]),
+                   self._indices(losers[on_surface], surfaces[on_surface]))
+
+        for (winner_idx, loser_idx), game_layers in [(overall, layers), (surface, layers[on_surface])]:
+            order = np.argsort(game_layers, kind='stable')
+            for layer in np.split(order, np.flatnonzero(np.diff(game_layers[order])) + 1):
+                self._update(winner_idx[layer], loser_idx[layer])
+
+    def _update(self, winners: np.ndarray, losers: np.ndarray) -> None:
+        # no index repeats within a layer so plain fancy indexing is safe
+        expected = 1 / (1 + 10 ** ((self.ratings[losers] - self.ratings[winners]) / 400))
+        delta = self.k * (1 - expected)
+        self.ratings[winners] += delta
+        self.ratings[losers] -= delta
+        self.games[winners] += 1
+        self.games[losers] += 1
+
+    def to_rows(self) -> List[dict]:
+        """Every rating as `player_rating` rows
+        """
+        surfaces = {code: surface for surface, code in self._surfaces.items()}
+        return [{'player_id': code >> 8, 'surface': surfaces[code & 0xff], 'rating': rating, 'games': games}
+                for code, rating, games in zip(self._index.tolist(), self.ratings.tolist(), self.games.tolist())]
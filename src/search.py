@@ -0,0 +1,173 @@
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from bisect import bisect_left
+import asyncio
+import heapq
+import unicodedata
+
+from .constants import API_SEARCH_LIMIT
+
+
+# (first name, last name, value returned when the player matches)
+SearchEntry = Tuple[Optional[str], Optional[str], Any]
+
+# match ranks, best first
+EXACT, WHOLE_WORDS, PREFIX, SUBSTRING = range(4)
+
+# queries up to this long are answered from lists ranked when the index is built
+SHORT_PREFIX = 2
+
+
+def normalize(text: Optional[str]) -> str:
+    """Lower case, accents stripped (i.e. 'Šafářová' -> 'safarova') and anything but letters and digits as single spaces
+    """
+    if not text:
+        return ''
+    text = ''.join(char for char in unicodedata.normalize('NFKD', text) if not unicodedata.combining(char))
+    return ' '.join(''.join(char if char.isalnum() else ' ' for char in text.casefold()).split())
+
+
+def trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class PlayerIndex:
+    '''
+    In memory player name index, word prefixes through a sorted word list and substrings through trigram posting sets.
+    Queries of a word of `SHORT_PREFIX` characters or less, which prefix too many names to rank per query, are answered
+    from lists ranked up front
+    '''
+
+    def __init__(self, entries: List[SearchEntry]) -> None:
+        """
+        Args:
+            entries (List[SearchEntry]): every player, i.e. id or response per player as the value
+        """
+        self._names: List[str] = []
+        self._name_words: List[Tuple[str, ...]] = []
+        self._values: List[Any] = []
+        # (word, player position) sorted, a prefix is a contiguous range
+        words: List[Tuple[str, int]] = []
+        self._trigrams: Dict[str, Set[int]] = {}
+        short_prefixes: Dict[str, Set[int]] = {}
+
+        for position, (first_name, last_name, value) in enumerate(entries):
+            name = normalize(f'{first_name or ""} {last_name or ""}')
+            self._names.append(name)
+            self._name_words.append(tuple(name.split()))
+            self._values.append(value)
+            for word in set(self._name_words[-1]):
+                words.append((word, position))
+                for length in range(1, min(len(word), SHORT_PREFIX) + 1):
+                    short_prefixes.setdefault(word[:length], set()).add(position)
+            for trigram in trigrams(name):
+                self._trigrams.setdefault(trigram, set()).add(position)
+
+        words.sort()
+        self._words = [word for word, _ in words]
+        self._word_positions = [position for _, position in words]
+        self._short_prefix_sets = short_prefixes
+        self._short_prefixes = {prefix: sorted(positions, key=lambda position: (len(self._names[position]), position))
+                                for prefix, positions in short_prefixes.items()}
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def _prefixed(self, prefix: str) -> Set[int]:
+        if len(prefix) <= SHORT_PREFIX:
+            return self._short_prefix_sets.get(prefix, set())
+        # words from the prefix up to the prefix followed by the last possible character
+        start, end = bisect_left(self._words, prefix), bisect_left(self._words, prefix + '\U0010ffff')
+        return set(self._word_positions[start:end])
+
+    def _contains(self, query: str) -> Set[int]:
+        postings = sorted((self._trigrams.get(trigram, set()) for trigram in trigrams(query)), key=len)
+        if not postings or not postings[0]:
+            return set()
+        candidates = postings[0].intersection(*postings[1:])
+        # trigrams can all appear without being contiguous
+        return {position for position in candidates if query in self._names[position]}
+
+    def _rank(self, position: int, query: str, words: List[str], match: int) -> Tuple[int, int, int]:
+        name = self._names[position]
+        if match == PREFIX:
+            if name == query:
+                match = EXACT
+            elif set(words) <= set(self._name_words[position]):
+                match = WHOLE_WORDS
+        return match, len(name), position
+
+    def search(self, query: str, limit: int = API_SEARCH_LIMIT) -> List[Any]:
+        """Players whose name words start with every word of the query (in any order), then for queries of 3+
+        characters players whose name contains it anywhere. Exact names first, then names with every query word whole,
+        then prefixes, then substrings, shortest name first within each
+
+        Args:
+            query (str): i.e. 'serena', 'williams s', 'safarova'
+            limit (int, optional): most results. Defaults to API_SEARCH_LIMIT.
+
+        Returns:
+            List[Any]: values of the players matched, best first
+        """
+        query = normalize(query)
+        if not query:
+            return []
+        words = query.split()
+        if len(query) <= SHORT_PREFIX:
+            return [self._values[position] for position in self._search_short(query, limit)]
+
+        # smallest first, so the intersection only shrinks from there
+        prefixed = sorted((self._prefixed(word) for word in words), key=len)
+        matched = {position: PREFIX for position in prefixed[0].intersection(*prefixed[1:])}
+        if len(matched) < limit:
+            for position in self._contains(query):
+                matched.setdefault(position, SUBSTRING)
+
+        ranked = heapq.nsmallest(limit, (self._rank(position, query, words, match) for position, match in matched.items()))
+        return [self._values[position] for *_, position in ranked]
+
+    def _search_short(self, query: str, limit: int) -> List[int]:
+        # names with the query as a whole word rank above the rest, already ordered by name length
+        start, end = bisect_left(self._words, query), bisect_left(self._words, query + '\x00')
+        whole = sorted(self._rank(position, query, [query], PREFIX) for position in self._word_positions[start:end])
+        results = [position for *_, position in whole[:limit]]
+        seen = set(results)
+        for position in self._short_prefixes.get(query, []):
+            if len(results) >= limit:
+                break
+            if position not in seen:
+                results.append(position)
+        return results
+
+
+class PlayerSearch:
+    '''
+    `PlayerIndex` of the current data version, rebuilt once the version moves on (i.e. a new ingest)
+    '''
+
+    def __init__(self) -> None:
+        self.index: Optional[PlayerIndex] = None
+        self.version: Optional[str] = None
+        self._lock = asyncio.Lock()
+
+    async def get(self, version: Optional[str], load: Callable[[], Awaitable[List[SearchEntry]]]) -> PlayerIndex:
+        """Index for `version`, built from `load` if not built yet or built for another version. Concurrent
+        requests share a single rebuild, served from the previous version's index until it finishes
+
+        Args:
+            version (Optional[str]): last ingested sha
+            load (Callable[[], Awaitable[List[SearchEntry]]]): reads every player
+
+        Returns:
+            PlayerIndex: index of `version`, or of the previous version while it is being built
+        """
+        if self.index is None or self.version != version:
+            if self.index is not None and self._lock.locked():
+                # rebuild in flight, stale results rather than waiting on it
+                return self.index
+            async with self._lock:
+                if self.index is None or self.version != version:
+                    entries = await load()
+                    # built off the event loop so the stale index keeps being served meanwhile
+                    index = await asyncio.get_event_loop().run_in_executor(None, PlayerIndex, entries)
+                    self.index, self.version = index, version
+        return self.index
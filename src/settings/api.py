@@ -0,0 +1,27 @@
+from typing_extensions import TypedDict
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+ApiCacheConfig = TypedDict('ApiCacheConfig',
+                           {'max_entries': int, 'ttl': float, 'version_ttl': float, 'redis': bool, 'redis_ttl': int})
+
+
+API_CACHE_CONFIG: ApiCacheConfig = {
+    # least recently used responses evicted beyond this many, 0 disables the cache
+    'max_entries': int(os.getenv("API_CACHE_MAX_ENTRIES", 10000)),
+    # seconds a cached response is served for at most
+    'ttl': float(os.getenv("API_CACHE_TTL", 3600)),
+    # seconds between checks of the last ingested sha, a new sha drops every cached response
+    'version_ttl': float(os.getenv("API_CACHE_VERSION_TTL", 30)),
+    # second tier shared by every api replica, in the redis used by the worker
+    'redis': os.getenv("API_REDIS_CACHE", 'false').lower() == 'true',
+    # seconds responses are kept in redis, entries of old versions are never read again so just expire
+    'redis_ttl': int(os.getenv("API_REDIS_CACHE_TTL", 24 * 60 * 60))
+}
+
+
+# responses encoded straight from db rows with orjson, skipping pydantic validation (requires `poetry install -E fast`)
+API_FAST_SERIALIZER: bool = os.getenv("API_FAST_SERIALIZER", 'false').lower() == 'true'
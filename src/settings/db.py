@@ -6,7 +6,8 @@ load_dotenv()
 
 
 DBConfig = TypedDict('DBConfig',
-                     {'db_host': str, 'db_port': str, 'db_user': str, 'db_pwd': str, 'db_name': str, })
+                     {'db_host': str, 'db_port': str, 'db_user': str, 'db_pwd': str, 'db_name': str, 'db_echo': bool, 'db_chunk_size': int,
+                      'db_pool_size': int, 'db_max_overflow': int, 'db_pool_timeout': float, 'db_pool_recycle': int, 'db_pool_pre_ping': bool})
 
 
 DB_CONFIG: DBConfig = {
@@ -14,5 +15,18 @@ DB_CONFIG: DBConfig = {
     'db_port': os.getenv("DB_PORT", '3306'),
     'db_user': os.getenv("MYSQL_USER", 'root'),
     'db_pwd': os.getenv("MYSQL_PASSWORD", 'root_password'),
-    'db_name': os.getenv("MYSQL_DATABASE", 'test_db')
+    'db_name': os.getenv("MYSQL_DATABASE", 'test_db'),
+    # log every statement sent to the db
+    'db_echo': os.getenv("DB_ECHO", 'false').lower() == 'true',
+    # rows per multi row INSERT (and commit) when bulk loading
+    'db_chunk_size': int(os.getenv("DB_CHUNK_SIZE", 10000)),
+    # connections kept open per process, and extra ones allowed under load on top
+    'db_pool_size': int(os.getenv("DB_POOL_SIZE", 10)),
+    'db_max_overflow': int(os.getenv("DB_MAX_OVERFLOW", 20)),
+    # seconds a request waits for a free connection before erroring
+    'db_pool_timeout': float(os.getenv("DB_POOL_TIMEOUT", 30)),
+    # seconds before a connection is replaced, must be below mysql's wait_timeout
+    'db_pool_recycle': int(os.getenv("DB_POOL_RECYCLE", 3600)),
+    # check connections are alive on checkout (i.e. after a db restart)
+    'db_pool_pre_ping': os.getenv("DB_POOL_PRE_PING", 'true').lower() == 'true'
 }
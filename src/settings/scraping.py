@@ -0,0 +1,23 @@
+from typing_extensions import TypedDict
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+ScrapingCacheConfig = TypedDict('ScrapingCacheConfig',
+                                {'cache_dir': str, 'max_bytes': int, 'frozen_years': int})
+
+
+SCRAPING_CACHE_CONFIG: ScrapingCacheConfig = {
+    # empty string disables the cache, every file downloaded in full
+    'cache_dir': os.getenv("SCRAPING_CACHE_DIR", os.path.join(os.path.expanduser('~'), '.cache', 'tennis_sql')),
+    # least recently used files evicted beyond this size
+    'max_bytes': int(os.getenv("SCRAPING_CACHE_MAX_MB", 512)) * 1024 * 1024,
+    # yearly files older than this many years are served from disk without revalidating
+    'frozen_years': int(os.getenv("SCRAPING_CACHE_FROZEN_YEARS", 2))
+}
+
+
+# parquet snapshot of scraped data used to rebuild the db without scraping, empty string disables
+SNAPSHOT_DIR: str = os.getenv("SNAPSHOT_DIR", '')
@@ -1,42 +1,146 @@
-from typing import Optional, Tuple
+from typing import Optional, Tuple, List
+import logging
 import pandas as pd
-import numpy as np
 from datetime import datetime
 
 from arq import cron
 
 from .data.data_scraping import get_last_commit_sha, get_file_changes, get_raw_players, get_raw_games
 from .data.data_cleaning import clean_file_changes
-from .data.data_formatting import format_player, raw_game_to_objects
+from .data.data_snapshot import SnapshotWriter, load_snapshot_players, load_snapshot_games, is_snapshot_current
+from .data.data_formatting import format_player_batch, format_game_batches, dedup_batch, batch_to_records, PERFORMANCE_KEYS
 
 from .db.db import QueryDB, CommandDB, DBClient
 
 from .db.models.orm.player import Player
 from .db.models.orm.tournament import Tournament
 from .db.models.orm.game import Game
-from .db.models.orm.performance import WPerformance, LPerformance
+from .db.models.orm.performance import Performance
+from .db.models.orm.checkpoint import IngestCheckpoint
+from .db.models.orm.player_stats import PlayerStats
+from .db.models.orm.head_to_head import HeadToHead
 
-from .constants import INGEST_YEAR_FROM, INGEST_YEAR_TO
+from .pipeline import run_pipeline, PipelineStats
+from .ratings import EloRatings, order_games
+from .cache import publish_version
+
+from .constants import INGEST_YEAR_FROM, INGEST_YEAR_TO, CIRCUITS, SOURCE_COL, WTA_URL, ITF_URL, WTA_IDENTIFIER, ITF_IDENTIFIER
 from .settings.redis import REDIS_SETTINGS
+from .settings.scraping import SNAPSHOT_DIR
 
 
 def add_player_data(command_db: CommandDB, player_data: pd.DataFrame, bulk: bool = False) -> None:
-    player_data = player_data.apply(lambda player_row: format_player(player_row), axis=1).values
-    command_db.ingest_objects(np.unique(player_data), Player, bulk=bulk)
+    players = dedup_batch(format_player_batch(player_data))
+    command_db.ingest_rows(batch_to_records(players), Player, bulk=bulk)
 
 
 def add_game_data(command_db: CommandDB, game_data: pd.DataFrame, bulk: bool = False) -> None:
+    load_game_batches(command_db, format_game_data(game_data), bulk=bulk)
+
+
+def format_game_data(game_data: pd.DataFrame) -> List[pd.DataFrame]:
+    """Raw game data to deduped tournament, game, winning and losing performance batches
+    """
     game_data = game_data.rename(columns={'winner_id': 'w_id', 'loser_id': 'l_id'})
 
-    formatted_game_data = game_data.apply(
-        lambda game_row: raw_game_to_objects(game_row), axis=1, result_type='expand').values
+    tournaments, games, w_performances, l_performances = format_game_batches(game_data)
 
-    tournaments, games, w_performances, l_performances = np.hsplit(formatted_game_data, 4)
+    # many games share a tournament, only the first row per key is kept
+    return [dedup_batch(tournaments), dedup_batch(games),
+            dedup_batch(w_performances, keys=PERFORMANCE_KEYS), dedup_batch(l_performances, keys=PERFORMANCE_KEYS)]
 
-    command_db.ingest_objects(np.unique(tournaments), Tournament, bulk=bulk)
-    command_db.ingest_objects(np.unique(games), Game, bulk=bulk)
-    command_db.ingest_objects(np.unique(w_performances), WPerformance, bulk=bulk)
-    command_db.ingest_objects(np.unique(l_performances), LPerformance, bulk=bulk)
+
+def load_game_batches(command_db: CommandDB, batches: List[pd.DataFrame], bulk: bool = False) -> None:
+    """Ingests batches from `format_game_data`, in order so foreign keys exist before being referenced, then refreshes
+    the `player_stats` of the players and years the games touched and the games' `head_to_head` rows
+    """
+    tournaments, games, w_performances, l_performances = batches
+    years = set(pd.to_datetime(tournaments['start_date']).dropna().dt.year.tolist())
+
+    if bulk:
+        # whole years loaded into an empty db, cheaper to aggregate every player in them
+        players = None
+    else:
+        # updated games may have moved players or years, their old rows are recomputed too
+        players, previous_years = QueryDB(command_db.session).get_game_player_years(games['id'].tolist())
+        players.update(w_performances['player_id'].tolist(), l_performances['player_id'].tolist())
+        years.update(previous_years)
+
+    for batch, table in zip(batches, [Tournament, Game, Performance, Performance]):
+        command_db.ingest_rows(batch_to_records(batch), table, bulk=bulk)
+
+    command_db.refresh_player_stats(years, player_ids=players)
+    command_db.refresh_head_to_head(games['id'].tolist())
+
+
+def bootstrap_data(command_db: CommandDB, github_sha: str, year_from: int, year_to: int, checkpoints: List[IngestCheckpoint] = (),
+                   snapshot_dir: str = SNAPSHOT_DIR) -> PipelineStats:
+    """First run ingest, games streamed into the db a year at a time. From the parquet snapshot if one was taken at
+    `github_sha` otherwise scraped (and snapshot if enabled). Each (year, circuit) partition is checkpointed once loaded,
+    partitions already done in `checkpoints` (i.e. an interrupted previous run) are skipped
+    """
+    started = {(checkpoint.year, checkpoint.circuit) for checkpoint in checkpoints}
+    done = {(checkpoint.year, checkpoint.circuit) for checkpoint in checkpoints if checkpoint.done}
+    todo = {year: [circuit for circuit in CIRCUITS if (year, circuit) not in done] for year in range(year_from, year_to + 1)}
+    years = [year for year, circuits in todo.items() if circuits]
+
+    def scrape_year(year):
+        return get_raw_games(year, year, wta_url=WTA_URL if WTA_IDENTIFIER in todo[year] else None,
+                             itf_url=ITF_URL if ITF_IDENTIFIER in todo[year] else None)
+
+    def snapshot_year(year):
+        game_data = load_snapshot_games(snapshot_dir, year, year)
+        return None if game_data is None else game_data[game_data[SOURCE_COL].isin(todo[year])]
+
+    def load_stage(year, batches):
+        command_db.start_checkpoints(year, todo[year], github_sha)
+        if batches is not None:
+            # year partially loaded by a previous run, rows already there are upserted over
+            bulk = not any((year, circuit) in started for circuit in CIRCUITS)
+            load_game_batches(command_db, batches, bulk=bulk)
+
+        games = batches[1]['circuit'].value_counts() if batches is not None else {}
+        command_db.complete_checkpoints(year, {circuit: int(games.get(circuit, 0)) for circuit in todo[year]})
+
+    if snapshot_dir and is_snapshot_current(snapshot_dir, github_sha, year_from, year_to):
+        add_player_data(command_db, load_snapshot_players(snapshot_dir), bulk=not checkpoints)
+        return run_pipeline(years, snapshot_year, format_game_data, load_stage)
+
+    # a snapshot of a resumed run would be missing the years already done
+    if not snapshot_dir or checkpoints:
+        add_player_data(command_db, get_raw_players(), bulk=not checkpoints)
+        return run_pipeline(years, scrape_year, format_game_data, load_stage)
+
+    # raw data snapshot as it streams through, written as each year is formatted rather than on the fetch threads as
+    # a year's games can land in the partition of the year before (i.e. a tournament starting in late december)
+    with SnapshotWriter(snapshot_dir, github_sha, year_from, year_to) as writer:
+        add_player_data(command_db, writer.write_players(get_raw_players()), bulk=True)
+        return run_pipeline(years, scrape_year, lambda game_data: format_game_data(writer.write_games(game_data)),
+                            load_stage)
+
+
+def backfill_game_indexes(command_db: CommandDB, query_db: QueryDB, year_from: int, year_to: int) -> None:
+    """Builds the tables derived from games (`player_stats`, `head_to_head`) for a db loaded before they existed,
+    after that `load_game_batches` keeps them up to date
+    """
+    if query_db.is_empty(Game):
+        return
+    if query_db.is_empty(PlayerStats):
+        command_db.refresh_player_stats(range(year_from, year_to + 1))
+    if query_db.is_empty(HeadToHead):
+        command_db.refresh_head_to_head()
+
+
+def update_ratings(command_db: CommandDB, query_db: QueryDB) -> None:
+    """Applies games not yet rated (every game on a first run) to the Elo ratings in the order they were played,
+    carrying on from the ratings stored so only new games are ever replayed
+    """
+    games = query_db.get_rating_games(unrated_only=True)
+    if games.empty:
+        return
+    ratings = EloRatings(query_db.get_ratings(set(games['winner_id'].tolist()) | set(games['loser_id'].tolist())))
+    ratings.rate(order_games(games))
+    command_db.save_ratings(ratings.to_rows(), games['id'].tolist())
 
 
 async def ingest_data(ctx, year_from: int = INGEST_YEAR_FROM, year_to: int = INGEST_YEAR_TO):
@@ -48,17 +152,22 @@ async def ingest_data(ctx, year_from: int = INGEST_YEAR_FROM, year_to: int = ING
 
     # nothing ingested yet (i.e. first run)
     if last_ingested_sha is None:
-        # clear before bulk adding to avoid any conflicts
-        db_client.clear_db()
+        # partitions done by a previous interrupted first run
+        checkpoints = query_db.get_checkpoints()
+        if not checkpoints:
+            # clear before bulk adding to avoid any conflicts
+            db_client.clear_db()
 
-        player_data = get_raw_players()
-        add_player_data(command_db, player_data, bulk=True)
+        bootstrap_data(command_db, github_sha, year_from, year_to, checkpoints=checkpoints)
 
-        game_data = get_raw_games(year_from, year_to)
-        add_game_data(command_db, game_data, bulk=True)
+        if checkpoints:
+            # github changes since the interrupted run started are picked up by the next diff
+            github_sha = checkpoints[0].sha
 
     # github updated
     elif last_ingested_sha and (last_ingested_sha != github_sha):
+        backfill_game_indexes(command_db, query_db, year_from, year_to)
+
         # getting columns
         player_cols = get_raw_players(n_players=1).columns
         game_cols = get_raw_games(n_games=1, year_from=2020, year_to=2020).columns
@@ -75,11 +184,21 @@ async def ingest_data(ctx, year_from: int = INGEST_YEAR_FROM, year_to: int = ING
     else:
         return
 
+    update_ratings(command_db, query_db)
     command_db.add_last_ingested_sha(github_sha)
+    command_db.clear_checkpoints()
+    # api replicas drop their cached responses
+    await publish_version(ctx['redis'], github_sha)
+
+
+async def startup(ctx):
+    # arq only configures its own loggers, this surfaces ingest progress (i.e. bulk load rows/s)
+    logging.basicConfig(level=logging.INFO)
 
 
 class WorkerSettings:
     redis_settings = REDIS_SETTINGS
+    on_startup = startup
     cron_jobs = [
         # will run once daily
         cron(ingest_data, hour=0, minute=0, second=0,  run_at_startup=True)
@@ -1,8 +1,19 @@
+import os
+import threading
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
 import pytest
+import pandas as pd
+from sqlalchemy import event
 
 from src.db.db import DBClient
 from src.db.models.orm.base import Base
 from src.data.data_scraping import get_raw_players, get_raw_games
+from src.constants import SOURCE_COL, WTA_IDENTIFIER, ITF_IDENTIFIER
+
+
+# local copies of Jeff Sackmans csv files, for tests that shouldn't rely on github
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
 
 
 @pytest.fixture(scope='session')
@@ -18,6 +29,81 @@ def db_client():
         Base.metadata.drop_all(conn, checkfirst=False)
 
 
+class FixtureRequestHandler(SimpleHTTPRequestHandler):
+    """Serves fixture files, paths in `server.failures` respond 503 the given number of times first
+    """
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        if self.server.failures.get(self.path, 0) > 0:
+            self.server.failures[self.path] -= 1
+            self.send_error(503)
+            return
+        super().do_GET()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def local_server(monkeypatch):
+    # local http stand-in for github serving the fixture csv files
+    # tests count requests made so skip the on disk cache unless one is passed explicitly
+    monkeypatch.setattr('src.data.data_scraping.get_cache', lambda: None)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), partial(FixtureRequestHandler, directory=FIXTURES_DIR))
+    server.requests, server.failures = [], {}
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+    thread.start()
+    server.url = f'http://127.0.0.1:{server.server_port}'
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def sqlite_client(tmp_path):
+    # local stand-in for the mysql db, fresh per test
+    db_client = DBClient(db_url=f"sqlite:///{tmp_path / 'test.db'}")
+    db_client.generate_schema()
+    yield db_client
+    db_client.session.close()
+    db_client.engine.dispose()
+
+
+class StatementCounter:
+    """Records every statement an engine sends to the db
+    """
+
+    def __init__(self, engine) -> None:
+        self.engine = engine
+        self.statements = []
+        event.listen(engine, 'before_cursor_execute', self._record)
+
+    def _record(self, conn, cursor, statement, *args):
+        self.statements.append(statement)
+
+    def __len__(self) -> int:
+        return len(self.statements)
+
+    def remove(self) -> None:
+        if event.contains(self.engine, 'before_cursor_execute', self._record):
+            event.remove(self.engine, 'before_cursor_execute', self._record)
+
+
+@pytest.fixture
+def count_statements():
+    # count_statements(engine) starts counting, sync engines only (async_engine.sync_engine for an async one)
+    counters = []
+
+    def count(engine) -> StatementCounter:
+        counters.append(StatementCounter(engine))
+        return counters[-1]
+
+    yield count
+    for counter in counters:
+        counter.remove()
+
+
 @pytest.fixture(scope='session')
 def sample_players():
     return get_raw_players(n_players=5)
@@ -26,3 +112,18 @@ def sample_players():
 @pytest.fixture(scope='session')
 def sample_games():
     return get_raw_games(2020, 2020).head()
+
+
+@pytest.fixture(scope='session')
+def local_players():
+    return pd.read_csv(os.path.join(FIXTURES_DIR, 'wta_players.csv'), mangle_dupe_cols=True, encoding="ISO-8859-1")
+
+
+@pytest.fixture(scope='session')
+def local_games():
+    games = []
+    for file_name, identifier in [('wta_matches_2020.csv', WTA_IDENTIFIER), ('wta_matches_qual_itf_2020.csv', ITF_IDENTIFIER)]:
+        new_games = pd.read_csv(os.path.join(FIXTURES_DIR, file_name))
+        new_games[SOURCE_COL] = identifier
+        games.append(new_games)
+    return pd.concat(games, ignore_index=True)
@@ -0,0 +1,90 @@
+import pytest
+import os
+import requests
+from requests.exceptions import HTTPError
+
+from src.data.data_cache import CsvCache
+from src.data.data_scraping import get_raw_players, get_raw_games
+from tests.conftest import FIXTURES_DIR
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return CsvCache(str(tmp_path / 'cache'))
+
+
+def test_cache_revalidates(local_server, cache):
+    url = local_server.url + '/wta_players.csv'
+    with requests.Session() as session:
+        content = cache.get(session, url)
+        # unchanged since, server answers 304
+        assert cache.get(session, url) == content
+    assert len(local_server.requests) == 2
+
+    with open(os.path.join(FIXTURES_DIR, 'wta_players.csv'), 'rb') as f:
+        assert content == f.read()
+
+
+def test_cache_frozen(local_server, cache):
+    url = local_server.url + '/wta_players.csv'
+    with requests.Session() as session:
+        content = cache.get(session, url, frozen=True)
+        assert cache.get(session, url, frozen=True) == content
+        # years never played are remembered too
+        assert cache.get(session, local_server.url + '/missing.csv', frozen=True) is None
+        assert cache.get(session, local_server.url + '/missing.csv', frozen=True) is None
+    assert len(local_server.requests) == 2
+
+
+def test_cache_persists(local_server, cache):
+    url = local_server.url + '/wta_players.csv'
+    with requests.Session() as session:
+        content = cache.get(session, url, frozen=True)
+        # new instance (i.e. next worker run) reads same directory
+        assert CsvCache(cache.cache_dir).get(session, url, frozen=True) == content
+    assert len(local_server.requests) == 1
+
+
+def test_cache_content_addressed(local_server, cache):
+    with requests.Session() as session:
+        cache.get(session, local_server.url + '/wta_players.csv')
+        size = cache.size
+        # same content under another url stored once
+        cache.get(session, local_server.url + '/./wta_players.csv')
+    assert cache.size == size
+
+
+def test_cache_eviction(local_server, tmp_path):
+    players_size = os.path.getsize(os.path.join(FIXTURES_DIR, 'wta_players.csv'))
+    cache = CsvCache(str(tmp_path / 'cache'), max_bytes=players_size)
+
+    with requests.Session() as session:
+        cache.get(session, local_server.url + '/wta_players.csv', frozen=True)
+        # least recently used players file evicted to make room
+        cache.get(session, local_server.url + '/wta_matches_qual_itf_2020.csv', frozen=True)
+        assert cache.size <= players_size
+        cache.get(session, local_server.url + '/wta_players.csv', frozen=True)
+    assert local_server.requests.count('/wta_players.csv') == 2
+    assert sum(len(files) for _, _, files in os.walk(os.path.join(cache.cache_dir, 'objects'))) == 1
+
+
+def test_cache_http_error(local_server, cache):
+    local_server.failures['/wta_players.csv'] = 1
+    with requests.Session() as session, pytest.raises(HTTPError):
+        cache.get(session, local_server.url + '/wta_players.csv')
+
+
+def test_get_raw_players_cached(local_server, cache, local_players):
+    players = get_raw_players(player_url=local_server.url + '/wta_players.csv', cache=cache)
+    assert players.equals(local_players)
+    assert len(get_raw_players(n_players=2, player_url=local_server.url + '/wta_players.csv', cache=cache)) == 2
+
+
+def test_get_raw_games_cached(local_server, cache):
+    urls = dict(wta_url=local_server.url + '/wta_matches_{}.csv', itf_url=local_server.url + '/wta_matches_qual_itf_{}.csv')
+
+    games = get_raw_games(2019, 2020, cache=cache, **urls)
+    requests_made = len(local_server.requests)
+    # both years frozen, served from disk entirely
+    assert get_raw_games(2019, 2020, cache=cache, **urls).equals(games)
+    assert len(local_server.requests) == requests_made
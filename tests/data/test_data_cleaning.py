@@ -11,6 +11,9 @@ from src.constants import SOURCE_COL, WTA_IDENTIFIER
 def test_get_game_id():
     t_id, m_num = 'Test_T', 1
     assert get_game_id(t_id, m_num) == f'{t_id}_{m_num}'
+    # ensure handles series
+    pd.testing.assert_series_equal(get_game_id(pd.Series([t_id, t_id]), pd.Series([m_num, 2])),
+                                   pd.Series([f'{t_id}_{m_num}', f'{t_id}_2']))
 
 
 def test_to_datetime():
@@ -25,6 +28,8 @@ def test_to_datetime():
     # ensure handles None and nans
     assert to_datetime(None) is None
     assert to_datetime(np.nan) is None
+    # ensure series nans and invalid dates are NaT, same as scalar path returning None
+    assert to_datetime(pd.Series([20000101, np.nan, 19000000])).isnull().tolist() == [False, True, True]
 
 
 def test_raw_changes_to_df():
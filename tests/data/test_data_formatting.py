@@ -1,7 +1,9 @@
 import pytest
+import pandas as pd
 from datetime import datetime
 
-from src.data.data_formatting import format_player, _format_tournament, _format_game, _format_performances, raw_game_to_objects
+from src.data.data_formatting import format_player, _format_tournament, _format_game, _format_performances, raw_game_to_objects, \
+    format_player_batch, format_game_batches, dedup_batch, batch_to_objects, batch_to_records, PERFORMANCE_KEYS
 
 from src.db.models.pydantic.player import PlayerCreate
 from src.db.models.pydantic.game import GameCreate
@@ -92,3 +94,76 @@ def test_format_performances(sample_games):
     assert l_perf.second_serve_won == game['l_2ndWon']
     assert l_perf.break_points_faced == game['l_bpFaced']
     assert l_perf.break_points_saved == game['l_bpSaved']
+
+
+def test_format_game_batches(local_games):
+    game_data = local_games.rename(columns={'winner_id': 'w_id', 'loser_id': 'l_id'})
+
+    row_objects = game_data.apply(raw_game_to_objects, axis=1, result_type='expand').values
+    batches = format_game_batches(game_data)
+
+    assert len(batches) == 4
+    # columnar path must produce exactly what the row by row pydantic path does
+    for batch, objects in zip(batches, row_objects.T):
+        records = batch_to_records(batch)
+        assert len(records) == len(objects)
+        for record, obj in zip(records, objects):
+            expected = obj.dict()
+            # performance id is assigned by the db
+            assert set(expected) - set(record) <= {'id'}
+            assert record == {field: expected[field] for field in record}
+
+
+def test_format_game_batches_nan_to_none(local_games):
+    game_data = local_games.rename(columns={'winner_id': 'w_id', 'loser_id': 'l_id'})
+    _, games, w_performances, l_performances = format_game_batches(game_data)
+
+    # walkover row has no stats and a game row is missing its score
+    assert games['score'].isnull().any()
+    assert None in games['score'].values
+    assert None in w_performances['aces'].values
+    assert None in l_performances['aces'].values
+
+
+def test_batch_to_objects(local_games):
+    game_data = local_games.rename(columns={'winner_id': 'w_id', 'loser_id': 'l_id'})
+    tournaments, games, w_performances, _ = format_game_batches(game_data)
+
+    objects = batch_to_objects(games, GameCreate)
+    assert objects.shape == (len(games),)
+    assert all(isinstance(obj, GameCreate) for obj in objects)
+    assert objects[0].id == games.loc[0, 'id']
+
+    assert all(isinstance(obj, PerformanceCreate) for obj in batch_to_objects(w_performances, PerformanceCreate))
+    assert all(isinstance(obj, TournamentCreate) for obj in batch_to_objects(tournaments, TournamentCreate))
+
+
+def test_format_player_batch(local_players):
+    players = format_player_batch(local_players)
+    expected = local_players.apply(format_player, axis=1).values
+
+    # columnar path must produce exactly what the row by row pydantic path does
+    assert batch_to_records(players) == [player.dict() for player in expected]
+    # missing dob
+    assert players['dob'].isnull().any()
+
+
+def test_dedup_batch(local_games):
+    game_data = local_games.rename(columns={'winner_id': 'w_id', 'loser_id': 'l_id'})
+    tournaments, games, w_performances, _ = format_game_batches(game_data)
+
+    tournaments = dedup_batch(tournaments)
+    assert tournaments['id'].is_unique
+    assert len(tournaments) == local_games['tourney_id'].nunique()
+
+    # duplicate game rows, first occurrence wins
+    duplicated = pd.concat([games, games.assign(round='Other')], ignore_index=True)
+    deduped = dedup_batch(duplicated)
+    assert deduped.equals(games)
+
+    duplicated = pd.concat([w_performances, w_performances.assign(aces=-1.0)], ignore_index=True)
+    deduped = dedup_batch(duplicated, keys=PERFORMANCE_KEYS)
+    assert deduped.equals(w_performances)
+    # winning and losing performances of the same game are different rows
+    both = pd.concat([w_performances, w_performances.assign(won=False)], ignore_index=True)
+    assert len(dedup_batch(both, keys=PERFORMANCE_KEYS)) == 2 * len(w_performances)
@@ -1,10 +1,12 @@
 import pytest
 import pandas as pd
+from requests.exceptions import HTTPError
 import numpy as np
 from datetime import datetime
 
 from src.data.data_scraping import get_raw_players, get_raw_games, get_last_commit_sha, get_file_changes
 from src.data.data_cleaning import to_datetime
+from src.constants import SOURCE_COL, WTA_IDENTIFIER, ITF_IDENTIFIER
 
 
 @pytest.mark.slow
@@ -22,6 +24,46 @@ def test_get_raw_games(sample_games):
     assert all(to_datetime(sample_games['tourney_date']).dt.year == 2020)
 
 
+def test_get_raw_games_local(local_server):
+    games = get_raw_games(2018, 2021,
+                          wta_url=local_server.url + '/wta_matches_{}.csv',
+                          itf_url=local_server.url + '/wta_matches_qual_itf_{}.csv')
+
+    # only 2020 files exist, rest 404 and are skipped
+    assert len(local_server.requests) == 8
+    assert isinstance(games, pd.DataFrame)
+    # WTA games before ITF games of the same year
+    assert games[SOURCE_COL].tolist() == [WTA_IDENTIFIER] * 5 + [ITF_IDENTIFIER] * 2
+    assert games.index.is_unique
+    assert all(to_datetime(games['tourney_date']).dt.year == 2020)
+
+
+def test_get_raw_games_local_skip_itf(local_server):
+    games = get_raw_games(2020, 2020, wta_url=local_server.url + '/wta_matches_{}.csv', itf_url=None)
+
+    assert len(local_server.requests) == 1
+    assert all(games[SOURCE_COL] == WTA_IDENTIFIER)
+
+
+def test_get_raw_games_local_retry(local_server):
+    local_server.failures['/wta_matches_2020.csv'] = 2
+    games = get_raw_games(2020, 2020, wta_url=local_server.url + '/wta_matches_{}.csv', itf_url=None,
+                          retries=2, backoff=0)
+
+    # fails twice then served
+    assert local_server.requests.count('/wta_matches_2020.csv') == 3
+    assert len(games) == 5
+
+    local_server.failures['/wta_matches_2020.csv'] = 2
+    with pytest.raises(HTTPError):
+        get_raw_games(2020, 2020, wta_url=local_server.url + '/wta_matches_{}.csv', itf_url=None,
+                      retries=1, backoff=0)
+
+
+def test_get_raw_games_local_none_found(local_server):
+    assert get_raw_games(1900, 1901, wta_url=local_server.url + '/wta_matches_{}.csv', itf_url=None) is None
+
+
 @pytest.mark.slow
 def test_get_last_commit_sha():
     assert isinstance(get_last_commit_sha(), str)
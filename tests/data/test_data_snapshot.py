@@ -0,0 +1,60 @@
+import pytest
+import os
+
+from src.data.data_snapshot import write_snapshot, load_snapshot, is_snapshot_current
+from src.data.data_formatting import format_player_batch, format_game_batches, batch_to_records
+from src.constants import SOURCE_COL, WTA_IDENTIFIER, ITF_IDENTIFIER
+
+pytest.importorskip('pyarrow')
+
+
+@pytest.fixture
+def snapshot_dir(tmp_path, local_players, local_games):
+    snapshot_dir = str(tmp_path / 'snapshot')
+    write_snapshot(snapshot_dir, local_players, local_games, sha='TESTSHA')
+    return snapshot_dir
+
+
+def test_write_snapshot_partitions(snapshot_dir):
+    for circuit in [WTA_IDENTIFIER, ITF_IDENTIFIER]:
+        assert os.path.exists(os.path.join(snapshot_dir, 'games', 'year=2020', f'{SOURCE_COL}={circuit}', 'part.parquet'))
+
+
+def test_load_snapshot(snapshot_dir, local_players, local_games):
+    player_data, game_data = load_snapshot(snapshot_dir)
+
+    assert len(player_data) == len(local_players)
+    assert len(game_data) == len(local_games)
+    # wta before itf as scraped
+    assert game_data[SOURCE_COL].tolist() == local_games[SOURCE_COL].tolist()
+
+    # formatted data identical to formatting the raw csv data
+    assert batch_to_records(format_player_batch(player_data)) == batch_to_records(format_player_batch(local_players))
+    rename = {'winner_id': 'w_id', 'loser_id': 'l_id'}
+    for batch, expected in zip(format_game_batches(game_data.rename(columns=rename)),
+                               format_game_batches(local_games.rename(columns=rename))):
+        assert batch_to_records(batch) == batch_to_records(expected)
+
+
+def test_load_snapshot_years(snapshot_dir):
+    _, game_data = load_snapshot(snapshot_dir, year_from=2020, year_to=2020)
+    assert len(game_data) > 0
+    _, game_data = load_snapshot(snapshot_dir, year_from=2021)
+    assert game_data is None
+
+
+def test_load_snapshot_dtypes(tmp_path, local_players, local_games):
+    # year where an id column was read as float, loads back the same as any other year
+    games = local_games.astype({'match_num': float, 'winner_id': float})
+    write_snapshot(str(tmp_path), local_players, games)
+    _, game_data = load_snapshot(str(tmp_path))
+    assert str(game_data['match_num'].dtype) == 'Int64'
+    assert str(game_data['winner_id'].dtype) == 'Int64'
+
+
+def test_is_snapshot_current(snapshot_dir, tmp_path):
+    assert is_snapshot_current(snapshot_dir, 'TESTSHA', 2020, 2020)
+    assert not is_snapshot_current(snapshot_dir, 'OTHERSHA', 2020, 2020)
+    # snapshot doesn't cover 2019
+    assert not is_snapshot_current(snapshot_dir, 'TESTSHA', 2019, 2020)
+    assert not is_snapshot_current(str(tmp_path / 'missing'), 'TESTSHA', 2020, 2020)
@@ -3,22 +3,33 @@ import datetime
 import os
 import time
 import numpy as np
-from sqlalchemy import inspect
+from sqlalchemy import inspect, create_engine, MetaData, Float, Boolean, Integer, String
+from sqlalchemy.dialects import mysql
+from sqlalchemy.exc import IntegrityError
 
 from src.db.db import CommandDB, DBClient, QueryDB
+from src.db.pool import TimedQueuePool, TimedAsyncAdaptedQueuePool, pool_options, pool_metrics
+from src.db.migrations import column_changes, migrate_columns, type_sql
 
+from src.db.models.orm.base import Base as ORMBase
 from src.db.models.orm.player import Player as ORMPlayer
 from src.db.models.orm.game import Game as ORMGame
-from src.db.models.orm.performance import WPerformance as ORMWPerformance, LPerformance as ORMLPerformance
+from src.db.models.orm.performance import Performance as ORMPerformance
 from src.db.models.orm.tournament import Tournament as ORMTournament
 from src.db.models.orm.github import Github as ORMGithub
+from src.db.models.orm.checkpoint import IngestCheckpoint as ORMIngestCheckpoint
+from src.db.models.orm.player_stats import PlayerStats as ORMPlayerStats
+from src.db.models.orm.head_to_head import HeadToHead as ORMHeadToHead
+from src.db.models.orm.rating import PlayerRating as ORMPlayerRating, RatedGame as ORMRatedGame
 
 from src.db.models.pydantic.player import Player, PlayerCreate
+from src.db.models.pydantic.performance import PerformanceCreate
 
 
 # tables to check for in TestDBClient test_schema
-TABLE_CLASSES = [ORMPlayer, ORMGame, ORMWPerformance,
-                 ORMLPerformance, ORMTournament, ORMGithub]
+TABLE_CLASSES = [ORMPlayer, ORMGame, ORMPerformance,
+                 ORMTournament, ORMGithub, ORMIngestCheckpoint, ORMPlayerStats, ORMHeadToHead,
+                 ORMPlayerRating, ORMRatedGame]
 
 
 @pytest.fixture(scope='module')
@@ -102,6 +113,232 @@ class TestCommandDB:
         assert github_sha.date.year == date.year
 
 
+class TestBulkInsert:
+    '''
+    Runs against a local sqlite db
+    '''
+
+    def test_ingest_rows_bulk(self, sqlite_client):
+        command_db = CommandDB(sqlite_client.session)
+        rows = [PlayerCreate(id=i, first_name='Test', last_name=str(i), nationality='IRE', hand='R').dict()
+                for i in range(1, 26)]
+
+        # chunk size not a factor of rows to ensure remainder inserted
+        assert command_db.ingest_rows(rows, ORMPlayer, bulk=True, chunk_size=10) == (len(rows), 0)
+        assert sqlite_client.session.query(ORMPlayer).count() == len(rows)
+        assert sqlite_client.session.query(ORMPlayer).filter(ORMPlayer.id == 25).one().last_name == '25'
+
+    def test_ingest_rows_bulk_commits_per_chunk(self, sqlite_client):
+        command_db = CommandDB(sqlite_client.session)
+        rows = [PlayerCreate(id=i, first_name='Test', last_name=str(i), nationality='IRE', hand='R').dict()
+                for i in [1, 2, 3, 1]]
+
+        # duplicate id in the second chunk, first chunk already committed
+        with pytest.raises(IntegrityError):
+            command_db.ingest_rows(rows, ORMPlayer, bulk=True, chunk_size=2)
+        sqlite_client.session.rollback()
+        assert sqlite_client.session.query(ORMPlayer).count() == 2
+
+    def test_ingest_rows_bulk_bypasses_identity_map(self, sqlite_client):
+        command_db = CommandDB(sqlite_client.session)
+        command_db.ingest_objects([PlayerCreate(id=1, first_name='Test', last_name='Player', nationality='IRE', hand='R')],
+                                  ORMPlayer, bulk=True)
+        assert len(sqlite_client.session.identity_map) == 0
+
+
+class TestUpsert:
+    '''
+    Runs against a local sqlite db
+    '''
+
+    def test_ingest_rows_upsert(self, sqlite_client):
+        command_db = CommandDB(sqlite_client.session)
+        rows = [PlayerCreate(id=i, first_name='Test', last_name=str(i), nationality='IRE', hand='R').dict()
+                for i in range(1, 6)]
+
+        assert command_db.ingest_rows(rows[:3], ORMPlayer, chunk_size=2) == (3, 0)
+
+        # first 3 exist and will be updated, last 2 are new
+        for row in rows:
+            row['first_name'] = 'Updated'
+        counts = command_db.ingest_rows(rows, ORMPlayer, chunk_size=2)
+        assert counts.inserted == 2
+        assert counts.updated == 3
+
+        players = sqlite_client.session.query(ORMPlayer).all()
+        assert len(players) == 5
+        assert all(player.first_name == 'Updated' for player in players)
+
+    def test_ingest_objects_upsert_performance(self, sqlite_client):
+        command_db = CommandDB(sqlite_client.session)
+        performance = PerformanceCreate(game_id='game', player_id=1, won=True, aces=1)
+
+        command_db.ingest_objects([performance], ORMPerformance)
+        performance.aces = 5
+        counts = command_db.ingest_rows([performance.dict(exclude={'id'}),
+                                         {**performance.dict(exclude={'id'}), 'won': False, 'player_id': 2}], ORMPerformance)
+        assert counts == (1, 1)
+
+        # performances have no id until inserted, game_id and won identify them
+        queried = sqlite_client.session.query(ORMPerformance).order_by(ORMPerformance.won).all()
+        assert [(p.game_id, p.won, p.player_id, p.aces) for p in queried] == [('game', False, 2, 5), ('game', True, 1, 5)]
+
+    def test_ingest_rows_merge_fallback(self, sqlite_client, monkeypatch):
+        command_db = CommandDB(sqlite_client.session)
+        # a dialect without an upsert statement
+        monkeypatch.setattr(sqlite_client.session.get_bind().dialect, 'name', 'mssql')
+        rows = [PlayerCreate(id=i, first_name='Test', last_name=str(i), nationality='IRE', hand='R').dict()
+                for i in range(1, 4)]
+        assert command_db.ingest_rows(rows[:2], ORMPlayer) == (2, 0)
+
+        for row in rows:
+            row['first_name'] = 'Updated'
+        assert command_db.ingest_rows(rows, ORMPlayer, chunk_size=2) == (1, 2)
+        assert [player.first_name for player in sqlite_client.session.query(ORMPlayer).all()] == ['Updated'] * 3
+
+        performance = PerformanceCreate(game_id='game', player_id=1, won=True, aces=1).dict(exclude={'id'})
+        assert command_db.ingest_rows([performance, {**performance, 'aces': 5}], ORMPerformance) == (1, 1)
+        assert [p.aces for p in sqlite_client.session.query(ORMPerformance).all()] == [5]
+
+    def test_ingest_rows_upsert_empty(self, sqlite_client):
+        assert CommandDB(sqlite_client.session).ingest_rows([], ORMPlayer) == (0, 0)
+
+
+class TestCheckpoints:
+    '''
+    Runs against a local sqlite db
+    '''
+
+    def test_checkpoints(self, sqlite_client):
+        command_db, query_db = CommandDB(sqlite_client.session), QueryDB(sqlite_client.session)
+        assert query_db.get_checkpoints() == []
+
+        command_db.start_checkpoints(2020, ['WAT', 'ITF'], 'SHA1')
+        command_db.complete_checkpoints(2020, {'WAT': 10})
+        # started again (i.e. resumed) keeps original sha
+        command_db.start_checkpoints(2020, ['ITF'], 'SHA2')
+
+        checkpoints = query_db.get_checkpoints()
+        assert [(c.year, c.circuit, c.done, c.games, c.sha) for c in checkpoints] == \
+            [(2020, 'WAT', True, 10, 'SHA1'), (2020, 'ITF', False, 0, 'SHA1')]
+
+        command_db.clear_checkpoints()
+        assert query_db.get_checkpoints() == []
+
+
+class TestSchema:
+    '''
+    Runs against a local sqlite db
+    '''
+
+    def test_generate_schema_adds_indexes(self, sqlite_client):
+        # db created before the listing indexes existed
+        index = next(iter(ORMGame.__table__.indexes))
+        index.drop(sqlite_client.engine)
+        assert inspect(sqlite_client.engine).get_indexes('game') == []
+
+        sqlite_client.generate_schema()
+        assert [i['column_names'] for i in inspect(sqlite_client.engine).get_indexes('game')] == [['tournament_id']]
+        assert [i['column_names'] for i in inspect(sqlite_client.engine).get_indexes('performance')] == [['player_id']]
+        assert [i['column_names'] for i in inspect(sqlite_client.engine).get_indexes('tournament')] == [['start_date']]
+
+    def test_column_changes(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+        # performance table as first created, stats as floats
+        metadata = MetaData()
+        for table in ORMBase.metadata.sorted_tables:
+            table.to_metadata(metadata)
+        metadata.tables['performance'].c.aces.type = Float()
+        metadata.create_all(engine)
+
+        changes = column_changes(engine)
+        assert [(change.table.name, change.column.name, change.db_type) for change in changes] == [('performance', 'aces', 'FLOAT')]
+        # sqlite can't alter a column type, only reported
+        assert migrate_columns(engine) == changes
+        assert len(column_changes(engine)) == 1
+
+        engine.dispose()
+
+    def test_migrate_performance_tables(self, sqlite_client):
+        # performances as stored before the single performance table
+        for name, player_id in [('wperformance', 1), ('lperformance', 2)]:
+            sqlite_client.engine.execute(f'CREATE TABLE {name} (id INTEGER PRIMARY KEY, game_id VARCHAR(50) UNIQUE, '
+                                         f'player_id INTEGER, won BOOLEAN NOT NULL, aces FLOAT)')
+            sqlite_client.engine.execute(f"INSERT INTO {name} (game_id, player_id, won, aces) VALUES ('T_1', {player_id}, 1, 3)")
+
+        sqlite_client.generate_schema()
+
+        assert not {'wperformance', 'lperformance'} & set(inspect(sqlite_client.engine).get_table_names())
+        performances = sqlite_client.session.query(ORMPerformance).order_by(ORMPerformance.won).all()
+        # outcome from the table rather than the won column
+        assert [(p.game_id, p.player_id, p.won, p.aces) for p in performances] == [('T_1', 2, False, 3), ('T_1', 1, True, 3)]
+
+    def test_migrate_performance_tables_duplicates(self, sqlite_client):
+        # updating a game inserted its performances again, so a game can have several rows per table
+        for name in ['wperformance', 'lperformance']:
+            sqlite_client.engine.execute(f'CREATE TABLE {name} (id INTEGER PRIMARY KEY, game_id VARCHAR(50), '
+                                         f'player_id INTEGER, aces FLOAT)')
+            for game_id, aces in [('T_1', 1), ('T_2', 7), ('T_1', 3)]:
+                sqlite_client.engine.execute(f"INSERT INTO {name} (game_id, player_id, aces) VALUES ('{game_id}', 1, {aces})")
+
+        sqlite_client.generate_schema()
+
+        performances = sqlite_client.session.query(ORMPerformance).\
+            order_by(ORMPerformance.game_id, ORMPerformance.won).all()
+        # latest write (highest id) of each game kept
+        assert [(p.game_id, p.won, p.aces) for p in performances] == \
+            [('T_1', False, 3), ('T_1', True, 3), ('T_2', False, 7), ('T_2', True, 7)]
+
+    def test_column_changes_up_to_date(self, sqlite_client):
+        assert column_changes(sqlite_client.engine) == []
+
+    def test_type_sql(self):
+        dialect = mysql.dialect()
+        # as reflected by mysql against as declared by the models
+        assert type_sql(mysql.TINYINT(display_width=1), dialect) == type_sql(Boolean(), dialect)
+        assert type_sql(mysql.INTEGER(display_width=11), dialect) == type_sql(Integer(), dialect)
+        assert type_sql(mysql.VARCHAR(length=10, collation='utf8mb4_0900_ai_ci'), dialect) == type_sql(String(10), dialect)
+        assert type_sql(mysql.VARCHAR(length=50), dialect) != type_sql(String(10), dialect)
+
+    def test_date_columns(self, sqlite_client):
+        # stored as a DATE, read back as a datetime
+        sqlite_client.session.add(ORMTournament(id='2020-1', name='Test', surface='Hard', draw_size=32, level='P',
+                                                start_date=datetime.datetime(2020, 1, 6)))
+        sqlite_client.session.commit()
+        sqlite_client.session.expire_all()
+        tournament = sqlite_client.session.query(ORMTournament).\
+            filter(ORMTournament.start_date >= datetime.datetime(2020, 1, 6)).one()
+        assert tournament.start_date == datetime.datetime(2020, 1, 6)
+
+
+class TestPool:
+
+    def test_pool_options(self):
+        assert pool_options('sqlite:///test.db') == {}
+        assert pool_options('mysql+pymysql://user@host/db')['poolclass'] is TimedQueuePool
+        assert pool_options('mysql+aiomysql://user@host/db', is_async=True)['poolclass'] is TimedAsyncAdaptedQueuePool
+
+    def test_pool_metrics(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", poolclass=TimedQueuePool, pool_size=1, max_overflow=1)
+        assert pool_metrics(engine.pool)['checkouts'] == 0
+
+        first, second = engine.connect(), engine.connect()
+        metrics = pool_metrics(engine.pool)
+        assert metrics['pool'] == 'TimedQueuePool'
+        assert metrics['checked_out'] == 2
+        # second connection is beyond pool_size
+        assert metrics['overflow'] == 1
+        assert metrics['checkouts'] == 2
+        assert metrics['max_wait_seconds'] >= metrics['mean_wait_seconds'] > 0
+
+        first.close()
+        second.close()
+        assert pool_metrics(engine.pool)['checked_out'] == 0
+
+    def test_sqlite_pool_metrics(self, sqlite_client):
+        assert sqlite_client.pool_metrics() == {'pool': 'NullPool'}
+
+
 class TestQueryDB:
 
     @pytest.fixture(scope='class')
@@ -125,3 +362,33 @@ class TestQueryDB:
         queried_sha = query_db.get_last_ingested_sha()
 
         assert queried_sha == sha
+
+    def test_get_game_by_id_eager(self, sqlite_client, count_statements):
+        sqlite_client.session.add_all([
+            ORMTournament(id='T', name='Test'),
+            ORMPlayer(id=1, first_name='Winning'), ORMPlayer(id=2, first_name='Losing'),
+            ORMGame(id='T_1', tournament_id='T', round='F'),
+            ORMPerformance(game_id='T_1', player_id=1, won=True), ORMPerformance(game_id='T_1', player_id=2, won=False)])
+        sqlite_client.session.commit()
+
+        def serialize(game):
+            return (game.tournament.name, game.w_performance.player.first_name, game.l_performance.player.first_name)
+
+        for eager, n_statements in [(True, 1), (False, 6)]:
+            # fresh session each time so nothing comes from the identity map
+            session = sqlite_client._Session()
+            counter = count_statements(sqlite_client.engine)
+            game = QueryDB(session).get_object_by_id('T_1', ORMGame, eager=eager)
+            assert serialize(game) == ('Test', 'Winning', 'Losing')
+            assert len(counter) == n_statements
+            counter.remove()
+            session.close()
+
+    def test_get_objects_by_ids(self, sqlite_client, count_statements):
+        sqlite_client.session.add_all([ORMPlayer(id=i, first_name=str(i)) for i in range(1, 4)])
+        sqlite_client.session.commit()
+
+        counter = count_statements(sqlite_client.engine)
+        players = QueryDB(sqlite_client.session).get_objects_by_ids([3, 1, 3, 5], ORMPlayer)
+        assert {id: player.first_name for id, player in players.items()} == {1: '1', 3: '3'}
+        assert len(counter) == 1
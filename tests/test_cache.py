@@ -0,0 +1,129 @@
+import asyncio
+from fakeredis.aioredis import create_redis_pool
+
+from src.cache import ResponseCache, RedisResponseCache, publish_version, subscribe_versions
+
+
+class Clock:
+
+    def __init__(self) -> None:
+        self.now = 0.
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_lru_eviction():
+    cache = ResponseCache(max_entries=2, ttl=60, version_ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    # a now most recently used, b evicted first
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert cache.stats() == {'version': None, 'entries': 2, 'max_entries': 2,
+                             'hits': 3, 'misses': 1, 'evictions': 1, 'invalidations': 0}
+
+
+def test_ttl():
+    clock = Clock()
+    cache = ResponseCache(max_entries=10, ttl=5, version_ttl=60, clock=clock)
+    cache.set('a', 1)
+
+    clock.now = 4.9
+    assert cache.get('a') == 1
+    clock.now = 5
+    assert cache.get('a') is None
+    assert len(cache) == 0
+
+
+def test_version():
+    clock = Clock()
+    cache = ResponseCache(max_entries=10, ttl=60, version_ttl=30, clock=clock)
+    assert cache.version_expired()
+
+    cache.set_version('SHA1')
+    cache.set('a', 1)
+    assert not cache.version_expired()
+
+    # same version keeps entries
+    clock.now = 30
+    assert cache.version_expired()
+    cache.set_version('SHA1')
+    assert cache.get('a') == 1
+
+    # new ingest drops them
+    cache.set_version('SHA2')
+    assert cache.get('a') is None
+    assert cache.version == 'SHA2'
+    assert cache.invalidations == 1
+
+
+def test_disabled():
+    cache = ResponseCache(max_entries=0)
+    cache.set('a', 1)
+    assert cache.get('a') is None
+    assert len(cache) == 0
+
+
+def test_redis_cache():
+    async def run():
+        redis_cache = RedisResponseCache(await create_redis_pool(), ttl=60)
+        await redis_cache.set('SHA1', ('player', 1), '{"id": 1}')
+
+        assert await redis_cache.get('SHA1', ('player', 1)) == b'{"id": 1}'
+        # keyed by version, a new ingest never reads old responses
+        assert await redis_cache.get('SHA2', ('player', 1)) is None
+        assert await redis_cache.redis.ttl('tennis_sql:SHA1:player:1') == 60
+
+    asyncio.run(run())
+
+
+def test_redis_cache_many():
+    async def run():
+        redis_cache = RedisResponseCache(await create_redis_pool(), ttl=60)
+        await redis_cache.set_many('SHA1', {('player', 1): '{"id": 1}', ('player', 2): '{"id": 2}'})
+
+        assert await redis_cache.get_many('SHA1', [('player', 2), ('player', 3), ('player', 1)]) == \
+            [b'{"id": 2}', None, b'{"id": 1}']
+        assert await redis_cache.redis.ttl('tennis_sql:SHA1:player:2') == 60
+
+    asyncio.run(run())
+
+
+def test_redis_cache_unavailable():
+    async def run():
+        redis = await create_redis_pool()
+        redis.close()
+        await redis.wait_closed()
+
+        # falls back to the db rather than erroring
+        redis_cache = RedisResponseCache(redis)
+        await redis_cache.set('SHA1', ('player', 1), '{"id": 1}')
+        assert await redis_cache.get('SHA1', ('player', 1)) is None
+        await redis_cache.set_many('SHA1', {('player', 1): '{"id": 1}'})
+        assert await redis_cache.get_many('SHA1', [('player', 1)]) == [None]
+
+    asyncio.run(run())
+
+
+def test_version_published():
+    async def run():
+        redis = await create_redis_pool()
+        cache = ResponseCache(max_entries=10, version_ttl=60)
+        cache.set_version('SHA1')
+        cache.set('a', 1)
+
+        subscriber = asyncio.ensure_future(subscribe_versions(redis, cache))
+        # published again until the subscriber has subscribed and picked it up
+        while cache.version != 'SHA2':
+            await publish_version(redis, 'SHA2')
+            await asyncio.sleep(0.01)
+
+        subscriber.cancel()
+        assert cache.get('a') is None
+
+    asyncio.run(asyncio.wait_for(run(), timeout=5))
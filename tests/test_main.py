@@ -1,8 +1,21 @@
 import pytest
+import sys
+import asyncio
+import io
+import json
+import pandas as pd
+from fakeredis.aioredis import create_redis_pool
 from fastapi.testclient import TestClient
 from datetime import datetime
 
-from src.main import app as app
+from src.main import app as app, get_db_client, get_response_cache, get_redis_cache, get_serializer, get_player_search, get_metrics
+from src.cache import ResponseCache, RedisResponseCache
+from src.export import ExportFormat, stream_export
+from src.serialization import Serializer
+from src.search import PlayerSearch
+from src.db.async_db import AsyncDBClient, AsyncQueryDB, export_columns
+from src.db.db import CommandDB, QueryDB
+from src.workers import update_ratings
 
 from src.db.models.orm.player import Player as ORMPlayer
 from src.db.models.pydantic.player import Player
@@ -13,7 +26,10 @@ from src.db.models.pydantic.tournament import Tournament
 from src.db.models.orm.game import Game as ORMGame
 from src.db.models.pydantic.game import Game
 
-from src.constants import WTA_IDENTIFIER
+from src.db.models.orm.github import Github as ORMGithub
+from src.db.models.orm.performance import Performance as ORMPerformance
+
+from src.constants import WTA_IDENTIFIER, API_BATCH_MAX_IDS, API_PAGE_MAX_LIMIT
 
 '''
 DB begins empty, so tests first assert no API response then adds data and asserts response 
@@ -78,3 +94,379 @@ def test_read_game_by_id(client, db_client):
 
     assert response.json()['tournament']['id'] == tournament_id
     assert response.json()['round'] == game.round
+
+
+'''
+Same routes against a local sqlite db through the async driver, doesn't need the mysql instance
+'''
+
+
+@pytest.fixture
+def local_client(sqlite_client, tmp_path):
+    tournament = ORMTournament(id='2020-1', name='Local', surface='Hard', draw_size=32,
+                               level='wta', start_date=datetime(2020, 1, 6))
+    players = [ORMPlayer(id=1, first_name='Winning', last_name='Player', nationality='USA', hand='R'),
+               ORMPlayer(id=2, first_name='Losing', last_name='Player', nationality='IRL', hand='L')]
+    game = ORMGame(id='2020-1_1', tournament_id='2020-1', round='F', score='6-0 6-0', circuit=WTA_IDENTIFIER)
+    performances = [ORMPerformance(game_id='2020-1_1', player_id=1, won=True, aces=5),
+                    ORMPerformance(game_id='2020-1_1', player_id=2, won=False, aces=1)]
+    sqlite_client.session.add_all([tournament, *players, game, *performances])
+    sqlite_client.session.commit()
+    CommandDB(sqlite_client.session).refresh_player_stats([2020])
+    CommandDB(sqlite_client.session).refresh_head_to_head()
+    update_ratings(CommandDB(sqlite_client.session), QueryDB(sqlite_client.session))
+
+    # test client runs the app on the current event loop, fresh one in case an earlier test closed it
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    db = AsyncDBClient(db_url=f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    # version checked every request so tests see ingests straight away
+    cache = ResponseCache(max_entries=2, version_ttl=0)
+    app.dependency_overrides[get_db_client] = lambda: db
+    app.dependency_overrides[get_response_cache] = lambda: cache
+    search = PlayerSearch()
+    app.dependency_overrides[get_player_search] = lambda: search
+    with TestClient(app) as client:
+        yield client
+    app.dependency_overrides.clear()
+    loop.close()
+
+
+def test_local_read_player_by_id(local_client):
+    assert local_client.get('/player/3').status_code == 404
+
+    response = local_client.get('/player/1')
+    assert response.status_code == 200
+    assert Player(**response.json()).first_name == 'Winning'
+
+
+def test_local_read_tournament_by_id(local_client):
+    assert local_client.get('/tournament/2020-2').status_code == 404
+
+    response = local_client.get('/tournament/2020-1')
+    assert response.status_code == 200
+    assert Tournament(**response.json()).name == 'Local'
+
+
+def test_local_read_game_by_id(local_client):
+    assert local_client.get('/game/2020-1_2').status_code == 404
+
+    response = local_client.get('/game/2020-1_1')
+    assert response.status_code == 200
+    game = Game(**response.json())
+    # nested relationships loaded up front by the async session
+    assert game.tournament.id == '2020-1'
+    assert game.w_performance.player.first_name == 'Winning'
+    assert game.l_performance.player.first_name == 'Losing'
+    assert game.w_performance.aces == 5
+
+
+def test_local_read_player_stats(local_client):
+    assert local_client.get('/player/3/stats').status_code == 404
+
+    response = local_client.get('/player/1/stats')
+    assert response.status_code == 200
+    stats = response.json()
+    assert [(row['year'], row['surface'], row['games'], row['wins']) for row in stats['breakdown']] == [(2020, 'Hard', 1, 1)]
+    assert stats['total']['aces'] == 5
+    assert stats['total']['year'] is None
+
+    assert local_client.get('/player/2/stats').json()['total']['wins'] == 0
+    # player exists, just no games that year
+    response = local_client.get('/player/1/stats', params={'year': 2019})
+    assert response.status_code == 200
+    assert response.json()['breakdown'] == []
+    assert response.json()['total']['games'] == 0
+
+
+def test_local_read_head_to_head(local_client):
+    assert local_client.get('/h2h/1/3').status_code == 404
+
+    response = local_client.get('/h2h/2/1')
+    assert response.status_code == 200
+    h2h = response.json()
+    assert [game['id'] for game in h2h['games']] == ['2020-1_1']
+    assert (h2h['player_a_id'], h2h['player_a_stats']['wins'], h2h['player_a_stats']['aces']) == (2, 0, 1)
+    assert (h2h['player_b_id'], h2h['player_b_stats']['wins'], h2h['player_b_stats']['aces']) == (1, 1, 5)
+    # either order, same games
+    assert local_client.get('/h2h/1/2').json()['games'] == h2h['games']
+
+    # players who never met
+    assert local_client.get('/h2h/1/1').json()['games'] == []
+
+
+def test_local_read_player_rating(local_client, sqlite_client):
+    assert local_client.get('/player/3/rating').status_code == 404
+
+    winner, loser = local_client.get('/player/1/rating').json(), local_client.get('/player/2/rating').json()
+    assert winner['overall'] == {'surface': 'All', 'rating': 1516, 'games': 1}
+    assert winner['surfaces'] == [{'surface': 'Hard', 'rating': 1516, 'games': 1}]
+    assert loser['overall']['rating'] == 1484
+
+    # yet to play
+    sqlite_client.session.add(ORMPlayer(id=3, first_name='New', last_name='Player', nationality='USA', hand='R'))
+    sqlite_client.session.commit()
+    assert local_client.get('/player/3/rating').json() == {'player_id': 3, 'overall': {'surface': 'All', 'rating': 1500, 'games': 0},
+                                                           'surfaces': []}
+
+
+def test_local_search_players(local_client, sqlite_client):
+    # built at startup
+    assert len(app.dependency_overrides[get_player_search]().index) == 2
+    assert local_client.get('/players/search', params={'q': ''}).status_code == 422
+
+    response = local_client.get('/players/search', params={'q': 'win'})
+    assert response.status_code == 200
+    assert [player['first_name'] for player in response.json()['results']] == ['Winning']
+    # shortest name first
+    assert [player['id'] for player in local_client.get('/players/search', params={'q': 'PLAYER'}).json()['results']] == [2, 1]
+    assert [player['id'] for player in local_client.get('/players/search', params={'q': 'player', 'limit': 1}).json()['results']] == [2]
+
+    # picked up once a new version is ingested, accents ignored both ways
+    sqlite_client.session.add(ORMPlayer(id=3, first_name='Lucie', last_name='Šafářová', nationality='CZE', hand='L'))
+    sqlite_client.session.commit()
+    assert local_client.get('/players/search', params={'q': 'safarova'}).json()['results'] == []
+    sqlite_client.session.add(ORMGithub(sha='SHA1', date=datetime(2020, 1, 7)))
+    sqlite_client.session.commit()
+    assert [player['id'] for player in local_client.get('/players/search', params={'q': 'safarova'}).json()['results']] == [3]
+    assert [player['id'] for player in local_client.get('/players/search', params={'q': 'Šafář'}).json()['results']] == [3]
+
+
+def test_local_read_pool_metrics(local_client):
+    local_client.get('/player/1')
+    # sqlite keeps its own (unsized) pool, mysql reports checkouts and waits too
+    assert local_client.get('/metrics/pool').json() == {'pool': 'NullPool'}
+
+
+def test_local_read_metrics(local_client):
+    metrics = get_metrics()
+    queries = metrics.queries.get(('GET', '/game/{game_id}'))
+    before = (queries.count, queries.sum) if queries else (0, 0)
+
+    assert local_client.get('/game/2020-1_1').status_code == 200
+    assert local_client.get('/game/2020-1_2').status_code == 404
+
+    # data version check and the game's single eager loading select, for each request
+    queries = metrics.queries['GET', '/game/{game_id}']
+    assert (queries.count - before[0], queries.sum - before[1]) == (2, 4)
+
+    response = local_client.get('/metrics')
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/plain')
+    lines = response.text.splitlines()
+    assert any(line.startswith('api_requests_total{method="GET",route="/game/{game_id}",status="404"}') for line in lines)
+    assert any(line.startswith('api_request_db_duration_seconds_sum{method="GET",route="/game/{game_id}"}') for line in lines)
+    assert any(line.startswith('api_cache_misses ') for line in lines)
+
+
+def test_local_response_cache(local_client, sqlite_client):
+    assert local_client.get('/game/2020-1_1').json()['round'] == 'F'
+    assert local_client.get('/game/2020-1_1').json()['round'] == 'F'
+    assert local_client.get('/player/1').status_code == 200
+    # 404s aren't cached
+    assert local_client.get('/player/3').status_code == 404
+    assert local_client.get('/player/3').status_code == 404
+
+    stats = local_client.get('/metrics/cache').json()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 4, 2)
+
+    # still served from the cache until a new sha is ingested
+    sqlite_client.session.query(ORMGame).update({'round': 'SF'})
+    sqlite_client.session.commit()
+    assert local_client.get('/game/2020-1_1').json()['round'] == 'F'
+
+    sqlite_client.session.add(ORMGithub(sha='SHA1', date=datetime(2020, 1, 7)))
+    sqlite_client.session.commit()
+    assert local_client.get('/game/2020-1_1').json()['round'] == 'SF'
+    stats = local_client.get('/metrics/cache').json()
+    assert stats['version'] == 'SHA1'
+    assert stats['invalidations'] == 1
+
+
+def test_local_redis_cache(local_client, sqlite_client):
+    loop = asyncio.get_event_loop()
+    redis_cache = RedisResponseCache(loop.run_until_complete(create_redis_pool()))
+    app.dependency_overrides[get_redis_cache] = lambda: redis_cache
+    assert local_client.get('/player/1').json()['first_name'] == 'Winning'
+
+    sqlite_client.session.query(ORMPlayer).filter(ORMPlayer.id == 1).update({'first_name': 'Changed'})
+    sqlite_client.session.commit()
+
+    # another replica, nothing cached in its own process yet but shares the redis warmed by the first
+    replica = ResponseCache(version_ttl=0)
+    app.dependency_overrides[get_response_cache] = lambda: replica
+    assert local_client.get('/player/1').json()['first_name'] == 'Winning'
+    assert replica.misses == 1
+
+    redis_cache.redis.close()
+    loop.run_until_complete(redis_cache.redis.wait_closed())
+
+
+def test_local_statements_per_endpoint(local_client, count_statements):
+    # first request checks the ingested version, then a single statement per object including everything it nests
+    db = app.dependency_overrides[get_db_client]()
+    for path in ['/player/1', '/tournament/2020-1', '/game/2020-1_1']:
+        counter = count_statements(db.engine.sync_engine)
+        assert local_client.get(path).status_code == 200
+        assert len(counter) == 2, counter.statements
+        counter.remove()
+
+
+def test_local_read_batch(local_client, count_statements):
+    db = app.dependency_overrides[get_db_client]()
+    counter = count_statements(db.engine.sync_engine)
+    response = local_client.post('/players:batch', json={'ids': [2, 3, 1]})
+    assert response.status_code == 200
+    # request order kept, version check plus one statement for both players
+    assert [player['first_name'] for player in response.json()['results']] == ['Losing', 'Winning']
+    assert response.json()['missing'] == [3]
+    assert len(counter) == 2
+
+    response = local_client.post('/games:batch', json={'ids': ['2020-1_1']})
+    assert response.json()['results'][0]['w_performance']['player']['id'] == 1
+    assert local_client.post('/tournaments:batch', json={'ids': ['2020-2']}).json() == {'results': [], 'missing': ['2020-2']}
+
+    # cached by the batch, single lookup served from memory
+    assert local_client.get('/player/2').json()['first_name'] == 'Losing'
+    assert local_client.get('/metrics/cache').json()['hits'] == 1
+
+
+def test_local_read_batch_limits(local_client):
+    assert local_client.post('/players:batch', json={'ids': []}).status_code == 422
+    assert local_client.post('/players:batch', json={'ids': list(range(API_BATCH_MAX_IDS + 1))}).status_code == 422
+
+
+def test_local_read_games_pages(local_client, sqlite_client):
+    # player 1 won 2020-1_1 (fixture), plays 2 of 3 in a later tournament and 1 in an earlier one
+    sqlite_client.session.add_all([
+        *[ORMTournament(id=id, name='Test', surface='Hard', draw_size=32, level='wta', start_date=start_date)
+          for id, start_date in [('2020-2', datetime(2020, 2, 3)), ('2019-1', datetime(2019, 12, 30))]],
+        *[ORMGame(id=f'2020-2_{i}', tournament_id='2020-2', round='R32', circuit=WTA_IDENTIFIER) for i in range(3)],
+        ORMGame(id='2019-1_1', tournament_id='2019-1', round='R32', circuit=WTA_IDENTIFIER),
+        ORMPerformance(game_id='2020-2_0', player_id=1, won=True), ORMPerformance(game_id='2020-2_0', player_id=2, won=False),
+        ORMPerformance(game_id='2020-2_1', player_id=2, won=True), ORMPerformance(game_id='2020-2_1', player_id=1, won=False),
+        # player 1 not in this one
+        ORMPerformance(game_id='2020-2_2', player_id=2, won=True),
+        ORMPerformance(game_id='2019-1_1', player_id=1, won=True)])
+    sqlite_client.session.commit()
+
+    game_ids, cursor = [], None
+    while True:
+        params = {'limit': 2, **({'cursor': cursor} if cursor else {})}
+        page = local_client.get('/player/1/games', params=params).json()
+        game_ids += [game['id'] for game in page['results']]
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    # by start date then id
+    assert game_ids == ['2019-1_1', '2020-1_1', '2020-2_0', '2020-2_1']
+
+    page = local_client.get('/tournament/2020-2/games').json()
+    assert [game['id'] for game in page['results']] == ['2020-2_0', '2020-2_1', '2020-2_2']
+    assert page['results'][0]['w_performance']['player']['first_name'] == 'Winning'
+    assert page['next_cursor'] is None
+
+
+def test_local_read_games_pages_undated(local_client, sqlite_client):
+    # tournaments without a start date, paged after every dated one
+    sqlite_client.session.add_all([
+        *[ORMTournament(id=id, name='Test', surface='Hard', draw_size=32, level='wta', start_date=None)
+          for id in ['2020-8', '2020-9']],
+        *[ORMGame(id=f'{id}_{i}', tournament_id=id, round='R32', circuit=WTA_IDENTIFIER)
+          for id in ['2020-8', '2020-9'] for i in range(2)],
+        *[ORMPerformance(game_id=f'{id}_{i}', player_id=1, won=True) for id in ['2020-8', '2020-9'] for i in range(2)]])
+    sqlite_client.session.commit()
+
+    game_ids, cursor = [], None
+    while True:
+        params = {'limit': 2, **({'cursor': cursor} if cursor else {})}
+        response = local_client.get('/player/1/games', params=params)
+        assert response.status_code == 200
+        game_ids += [game['id'] for game in response.json()['results']]
+        cursor = response.json()['next_cursor']
+        if cursor is None:
+            break
+    assert game_ids == ['2020-1_1', '2020-8_0', '2020-8_1', '2020-9_0', '2020-9_1']
+
+
+def test_local_read_games_pages_errors(local_client):
+    assert local_client.get('/player/3/games').status_code == 404
+    assert local_client.get('/tournament/2020-9/games').status_code == 404
+    assert local_client.get('/player/1/games', params={'cursor': 'not a cursor'}).status_code == 400
+    assert local_client.get('/player/1/games', params={'limit': API_PAGE_MAX_LIMIT + 1}).status_code == 422
+
+
+# starlette 0.13 (pinned by fastapi 0.61) passes bare coroutines to asyncio.wait, which python 3.11 rejects
+streaming_supported = pytest.mark.skipif(sys.version_info >= (3, 11), reason='StreamingResponse needs python < 3.11')
+
+
+@streaming_supported
+def test_local_export_games(local_client):
+    response = local_client.get('/export/games')
+    assert response.headers['content-type'] == 'application/x-ndjson'
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert len(rows) == 1
+    assert rows[0]['game_id'] == '2020-1_1'
+    assert rows[0]['start_date'] == '2020-01-06T00:00:00'
+    assert (rows[0]['winner_id'], rows[0]['loser_id'], rows[0]['w_aces'], rows[0]['l_aces']) == (1, 2, 5, 1)
+
+    response = local_client.get('/export/games', params={'format': 'csv', 'circuit': WTA_IDENTIFIER, 'surface': 'Hard',
+                                                         'year_from': 2020, 'year_to': 2020})
+    assert response.headers['content-type'].startswith('text/csv')
+    games = pd.read_csv(io.StringIO(response.text))
+    assert list(games.columns) == export_columns()
+    assert games['game_id'].tolist() == ['2020-1_1']
+    # w/o stats exported as empty fields
+    assert games['w_serve_points'].isna().all()
+
+    for params in [{'year_from': 2021}, {'year_to': 2019}, {'circuit': 'ITF'}, {'surface': 'Clay'}]:
+        assert local_client.get('/export/games', params=params).text == ''
+    assert local_client.get('/export/games', params={'format': 'xml'}).status_code == 422
+
+
+def test_local_stream_games_chunks(local_client, sqlite_client):
+    sqlite_client.session.add_all([ORMGame(id=f'2020-1_{i}', tournament_id='2020-1', round='R32') for i in range(2, 6)])
+    sqlite_client.session.commit()
+
+    async def chunk_sizes():
+        db = app.dependency_overrides[get_db_client]()
+        async with db.Session() as session:
+            return [len(rows) async for rows in AsyncQueryDB(session).stream_games(chunk_size=2)]
+
+    # server side cursor read 2 rows at a time
+    assert asyncio.get_event_loop().run_until_complete(chunk_sizes()) == [2, 2, 1]
+
+
+def test_local_stream_export(local_client):
+    async def body(format):
+        db = app.dependency_overrides[get_db_client]()
+        async with db.Session() as session:
+            chunks = AsyncQueryDB(session).stream_games(year_from=2020, circuit=WTA_IDENTIFIER)
+            return b''.join([chunk async for chunk in stream_export(chunks, export_columns(), format)]).decode()
+
+    loop = asyncio.get_event_loop()
+    rows = [json.loads(line) for line in loop.run_until_complete(body(ExportFormat.ndjson)).splitlines()]
+    assert [(row['game_id'], row['start_date'], row['winner_id'], row['w_aces']) for row in rows] == \
+        [('2020-1_1', '2020-01-06T00:00:00', 1, 5)]
+
+    games = pd.read_csv(io.StringIO(loop.run_until_complete(body(ExportFormat.csv))))
+    assert list(games.columns) == export_columns()
+    assert games['game_id'].tolist() == ['2020-1_1']
+    assert games['w_serve_points'].isna().all()
+
+
+def test_local_fast_serializer(local_client):
+    paths = ['/player/1', '/tournament/2020-1', '/game/2020-1_1', '/tournament/2020-1/games', '/player/1/stats',
+             '/h2h/2/1', '/player/1/rating', '/players/search?q=player']
+    validated = [local_client.get(path).json() for path in paths]
+    validated.append(local_client.post('/games:batch', json={'ids': ['2020-1_1', 'missing']}).json())
+
+    app.dependency_overrides[get_serializer] = lambda: Serializer(fast=True)
+    # cached responses are specific to the serializer (a process only ever uses one)
+    cache = ResponseCache(version_ttl=0)
+    app.dependency_overrides[get_response_cache] = lambda: cache
+    for _ in range(2):
+        fast = [local_client.get(path).json() for path in paths]
+        fast.append(local_client.post('/games:batch', json={'ids': ['2020-1_1', 'missing']}).json())
+        assert fast == validated
@@ -0,0 +1,85 @@
+import pytest
+import asyncio
+from fastapi import FastAPI
+from starlette.testclient import TestClient
+
+from src.metrics import Histogram, Metrics, MetricsMiddleware, RequestTimings, record_query, render_gauges, \
+    UNMATCHED_ROUTE, _request_timings
+
+
+def test_histogram():
+    histogram = Histogram([.1, 1.])
+    for value in [.05, .1, .5, 2.]:
+        histogram.observe(value)
+
+    # bounds are inclusive, as prometheus' le
+    assert list(histogram.cumulative()) == [('0.1', 2), ('1.0', 3), ('+Inf', 4)]
+    assert histogram.count == 4
+    assert histogram.sum == pytest.approx(2.65)
+
+
+def test_record_query():
+    # outside a request nothing is recorded
+    record_query(.5)
+
+    timings = RequestTimings()
+    token = _request_timings.set(timings)
+    record_query(.25)
+    record_query(.5)
+    _request_timings.reset(token)
+
+    assert (timings.queries, timings.db_seconds) == (2, .75)
+
+
+def test_metrics_render():
+    metrics = Metrics(latency_buckets=[.1], query_buckets=[1])
+    timings = RequestTimings()
+    timings.queries, timings.db_seconds = 2, .05
+    metrics.observe('GET', '/game/{game_id}', 200, .5, timings)
+
+    lines = metrics.render().splitlines()
+    assert 'api_requests_total{method="GET",route="/game/{game_id}",status="200"} 1' in lines
+    assert 'api_request_duration_seconds_bucket{method="GET",route="/game/{game_id}",le="0.1"} 0' in lines
+    assert 'api_request_duration_seconds_bucket{method="GET",route="/game/{game_id}",le="+Inf"} 1' in lines
+    assert 'api_request_duration_seconds_sum{method="GET",route="/game/{game_id}"} 0.5' in lines
+    assert 'api_request_db_duration_seconds_bucket{method="GET",route="/game/{game_id}",le="0.1"} 1' in lines
+    assert 'api_request_db_queries_bucket{method="GET",route="/game/{game_id}",le="1"} 0' in lines
+    assert 'api_request_db_queries_count{method="GET",route="/game/{game_id}"} 1' in lines
+
+
+def test_render_gauges():
+    assert render_gauges('db_pool', {'pool': 'QueuePool', 'checked_out': 2}, 'Pool').splitlines() == \
+        ['# HELP db_pool_checked_out Pool', '# TYPE db_pool_checked_out gauge', 'db_pool_checked_out 2']
+    assert render_gauges('db_pool', {'pool': 'NullPool'}, 'Pool') == ''
+
+
+def test_metrics_middleware():
+    metrics = Metrics()
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware, metrics=metrics)
+
+    @app.get('/item/{item_id}')
+    async def read_item(item_id: int):
+        # as the engine listeners would for each statement
+        record_query(.01)
+        record_query(.02)
+        return {'id': item_id}
+
+    # test client runs the app on the current event loop, fresh one in case an earlier test closed it
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    client = TestClient(app)
+    assert client.get('/item/1').status_code == 200
+    assert client.get('/item/2').status_code == 200
+    assert client.get('/item/x').status_code == 422
+    assert client.post('/item/1').status_code == 405
+    assert client.get('/missing').status_code == 404
+
+    # recorded under the route template rather than the path
+    assert metrics.requests == {('GET', '/item/{item_id}', 200): 2, ('GET', '/item/{item_id}', 422): 1,
+                                ('POST', '/item/{item_id}', 405): 1, ('GET', UNMATCHED_ROUTE, 404): 1}
+    queries = metrics.queries['GET', '/item/{item_id}']
+    # validation fails before the route runs
+    assert (queries.count, queries.sum) == (3, 4)
+    assert metrics.db_time['GET', '/item/{item_id}'].sum == pytest.approx(.06)
+    loop.close()
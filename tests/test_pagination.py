@@ -0,0 +1,16 @@
+import pytest
+from datetime import datetime
+
+from src.pagination import encode_cursor, decode_cursor
+
+
+def test_cursor():
+    assert decode_cursor(encode_cursor(datetime(2020, 1, 6), '2020-1_300')) == (datetime(2020, 1, 6), '2020-1_300')
+    # undated tournament
+    assert decode_cursor(encode_cursor(None, '2020-1_300')) == (None, '2020-1_300')
+
+
+@pytest.mark.parametrize('cursor', ['', 'not a cursor', encode_cursor(datetime(2020, 1, 6), 'id')[:-4]])
+def test_invalid_cursor(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
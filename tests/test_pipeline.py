@@ -0,0 +1,106 @@
+import pytest
+import threading
+import time
+
+from src.pipeline import stream_years, run_pipeline, PipelineStats
+
+
+def test_stream_years():
+    stats = PipelineStats()
+    streamed = list(stream_years(range(2000, 2005), lambda year: [year] if year % 2 == 0 else None, stats))
+
+    # order kept, years without data still streamed
+    assert streamed == [(2000, [2000]), (2001, None), (2002, [2002]), (2003, None), (2004, [2004])]
+    assert stats.seconds['fetch'] > 0
+
+
+def test_stream_years_backpressure():
+    fetched = []
+
+    def fetch_year(year):
+        fetched.append(year)
+        return [year]
+
+    streamed = stream_years(range(10), fetch_year, PipelineStats(), prefetch=2, fetch_workers=2)
+    next(streamed)
+    time.sleep(0.2)
+    # one consumed, two waiting on the queue, one blocked waiting to be queued and one fetched behind it
+    assert len(fetched) <= 5
+    streamed.close()
+
+
+def test_stream_years_concurrent_fetch():
+    lock = threading.Lock()
+    in_flight, most_in_flight = 0, 0
+
+    def fetch_year(year):
+        nonlocal in_flight, most_in_flight
+        with lock:
+            in_flight += 1
+            most_in_flight = max(most_in_flight, in_flight)
+        # later years finish first
+        time.sleep(0.05 * (4 - year))
+        with lock:
+            in_flight -= 1
+        return [year]
+
+    stats = PipelineStats()
+    assert list(stream_years(range(4), fetch_year, stats, prefetch=1, fetch_workers=4)) == \
+        [(year, [year]) for year in range(4)]
+    assert most_in_flight == 4
+
+
+def test_stream_years_fetch_error():
+    def fetch_year(year):
+        if year == 2:
+            raise ValueError('fetch failed')
+        return [year]
+
+    streamed = stream_years(range(5), fetch_year, PipelineStats())
+    assert next(streamed) == (0, [0])
+    assert next(streamed) == (1, [1])
+    with pytest.raises(ValueError):
+        next(streamed)
+
+
+def test_run_pipeline():
+    loaded = []
+    stats = run_pipeline(range(4), lambda year: [year] * (year + 1) if year < 3 else None, lambda data: sum(data),
+                         lambda year, data: loaded.append((year, data)))
+
+    assert loaded == [(0, 0), (1, 2), (2, 6), (3, None)]
+    assert stats.years == 3
+    assert stats.games == 6
+    assert {'fetch', 'wait', 'format', 'load'} == set(stats.seconds)
+
+
+def test_run_pipeline_load_error():
+    def load(year, data):
+        raise ValueError('load failed')
+
+    threads = threading.active_count()
+    with pytest.raises(ValueError):
+        run_pipeline(range(100), lambda year: [year], lambda data: data, load)
+    # producer thread exits rather than blocking forever on a full queue
+    assert threading.active_count() == threads
+
+
+def test_run_pipeline_load_error_queue_full():
+    def load(year, data):
+        # every year fetched by now, the producer is left with the end of stream and a full queue
+        time.sleep(0.3)
+        raise ValueError('load failed')
+
+    errors = []
+
+    def run():
+        try:
+            run_pipeline(range(3), lambda year: [year], lambda data: data, load, prefetch=2)
+        except ValueError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+    assert len(errors) == 1
@@ -0,0 +1,75 @@
+import pytest
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+from src.ratings import EloRatings, order_games, layer_games
+from src.constants import ELO_OVERALL, ELO_INITIAL_RATING, ELO_K
+
+
+def games_frame(rows):
+    return pd.DataFrame(rows, columns=['id', 'start_date', 'round', 'surface', 'winner_id', 'loser_id'])
+
+
+def sequential_elo(games: pd.DataFrame) -> dict:
+    # one game at a time, the definition the vectorized engine has to match
+    ratings = {}
+    for game in games.itertuples():
+        for surface in [ELO_OVERALL, game.surface]:
+            winner, loser = (game.winner_id, surface), (game.loser_id, surface)
+            expected = 1 / (1 + 10 ** ((ratings.get(loser, ELO_INITIAL_RATING) - ratings.get(winner, ELO_INITIAL_RATING)) / 400))
+            delta = ELO_K * (1 - expected)
+            ratings[winner] = ratings.get(winner, ELO_INITIAL_RATING) + delta
+            ratings[loser] = ratings.get(loser, ELO_INITIAL_RATING) - delta
+    return ratings
+
+
+def test_order_games():
+    games = games_frame([('2020-2_300', datetime(2020, 1, 13), 'F', 'Hard', 1, 2),
+                         ('2020-1_300', datetime(2020, 1, 6), 'F', 'Hard', 1, 2),
+                         ('2020-1_299', datetime(2020, 1, 6), 'SF', 'Hard', 1, 3),
+                         ('2020-1_10', datetime(2020, 1, 6), 'R32', 'Hard', 1, 4),
+                         ('2020-1_9', datetime(2020, 1, 6), 'R32', 'Hard', 2, 5)])
+    assert order_games(games)['id'].tolist() == ['2020-1_9', '2020-1_10', '2020-1_299', '2020-1_300', '2020-2_300']
+
+
+def test_layer_games():
+    # 1 v 2 and 3 v 4 at once, then their winners
+    layers = layer_games(np.array([1, 3, 1, 5]), np.array([2, 4, 3, 6]))
+    assert layers.tolist() == [0, 0, 1, 0]
+
+
+def test_elo_single_game():
+    ratings = EloRatings()
+    ratings.rate(games_frame([('2020-1_1', datetime(2020, 1, 6), 'F', 'Clay', 1, 2)]))
+    assert ratings[1, ELO_OVERALL] == ratings[1, 'Clay'] == ELO_INITIAL_RATING + ELO_K / 2
+    assert ratings[2, ELO_OVERALL] == ELO_INITIAL_RATING - ELO_K / 2
+    assert ratings[1, 'Hard'] == ELO_INITIAL_RATING
+    assert {(row['player_id'], row['surface']): row['games'] for row in ratings.to_rows()} == \
+        {(1, ELO_OVERALL): 1, (2, ELO_OVERALL): 1, (1, 'Clay'): 1, (2, 'Clay'): 1}
+
+
+def test_elo_matches_sequential():
+    rng = np.random.default_rng(0)
+    n = 2000
+    players = rng.integers(0, 50, size=(n, 2))
+    players[players[:, 0] == players[:, 1], 1] += 50
+    games = order_games(games_frame({
+        'id': [f'{i // 31}_{i % 31}' for i in range(n)],
+        'start_date': [datetime(2000 + i // 400, 1, 1) for i in range(n)],
+        'round': rng.choice(['R32', 'QF', 'SF', 'F'], size=n),
+        'surface': rng.choice(['Hard', 'Clay', 'Grass'], size=n),
+        'winner_id': players[:, 0], 'loser_id': players[:, 1]}))
+
+    expected = sequential_elo(games)
+    ratings = EloRatings()
+    ratings.rate(games)
+    assert {key: ratings[key] for key in expected} == pytest.approx(expected)
+
+    # carried on from stored ratings gives the same as rating everything at once
+    first, rest = games.iloc[:n // 2], games.iloc[n // 2:]
+    incremental = EloRatings()
+    incremental.rate(first)
+    incremental = EloRatings({(row['player_id'], row['surface']): (row['rating'], row['games']) for row in incremental.to_rows()})
+    incremental.rate(rest)
+    assert {key: incremental[key] for key in expected} == pytest.approx(expected)
@@ -0,0 +1,97 @@
+import pytest
+import asyncio
+
+from src.search import PlayerIndex, PlayerSearch, normalize
+
+
+@pytest.fixture(scope='module')
+def index():
+    return PlayerIndex([('Serena', 'Williams', 1), ('Venus', 'Williams', 2), ('Lucie', 'Šafářová', 3),
+                        ('Jo', 'Li', 4), ('Williams', 'Jones', 5), ('Anna-Lena', "O'Brien", 6), (None, 'Unknown', 7)])
+
+
+def test_normalize():
+    assert normalize('Lucie Šafářová') == 'lucie safarova'
+    assert normalize("  Anna-Lena O'Brien ") == 'anna lena o brien'
+    assert normalize(None) == ''
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('serena', [1]),
+    ('SERENA williams', [1]),
+    ('williams serena', [1]),
+    ('williams s', [1]),
+    ('šafářová', [3]),
+    ('safa', [3]),
+    ('anna lena', [6]),
+    ('obrien', []),
+    ('unknown', [7]),
+    # substring anywhere once no more word prefixes match
+    ('illia', [2, 5, 1]),
+    ('xyz', []),
+    ('', []),
+])
+def test_search(index, query, expected):
+    assert index.search(query) == expected
+
+
+def test_search_ranking(index):
+    # whole word before prefix, shorter name first
+    assert index.search('williams') == [2, 5, 1]
+    assert index.search('will') == [2, 5, 1]
+    assert index.search('li') == [4]
+    assert index.search('l') == [4, 3, 6]
+    assert index.search('jo li') == [4]
+    assert index.search('williams', limit=2) == [2, 5]
+
+
+def test_player_search_rebuilds_on_version():
+    search, loads = PlayerSearch(), []
+
+    async def load():
+        loads.append(1)
+        return [('Serena', 'Williams', len(loads))]
+
+    async def searches():
+        first = await search.get('SHA1', load)
+        same = await search.get('SHA1', load)
+        new = await search.get('SHA2', load)
+        return first.search('serena'), same.search('serena'), new.search('serena')
+
+    loop = asyncio.new_event_loop()
+    try:
+        assert loop.run_until_complete(searches()) == ([1], [1], [2])
+    finally:
+        loop.close()
+    assert len(loads) == 2
+
+
+def test_player_search_serves_stale_during_rebuild():
+    search = PlayerSearch()
+
+    async def load_first():
+        return [('Serena', 'Williams', 1)]
+
+    async def searches():
+        rebuilding = asyncio.Event()
+        release = asyncio.Event()
+
+        async def load_second():
+            rebuilding.set()
+            await release.wait()
+            return [('Serena', 'Williams', 2)]
+
+        await search.get('SHA1', load_first)
+        rebuild = asyncio.ensure_future(search.get('SHA2', load_second))
+        await rebuilding.wait()
+        # served the old index rather than waiting on the rebuild
+        stale = await asyncio.wait_for(search.get('SHA2', load_second), 1)
+        release.set()
+        new = await rebuild
+        return stale.search('serena'), new.search('serena'), (await search.get('SHA2', load_second)).search('serena')
+
+    loop = asyncio.new_event_loop()
+    try:
+        assert loop.run_until_complete(searches()) == ([1], [2], [2])
+    finally:
+        loop.close()
@@ -0,0 +1,59 @@
+import json
+import pytest
+from datetime import datetime
+
+from src.serialization import Serializer, compile_encoder
+
+from src.db.models.orm.player import Player as ORMPlayer
+from src.db.models.pydantic.player import Player
+from src.db.models.orm.tournament import Tournament as ORMTournament
+from src.db.models.pydantic.tournament import Tournament
+from src.db.models.orm.game import Game as ORMGame
+from src.db.models.pydantic.game import Game
+from src.db.models.orm.performance import Performance as ORMPerformance
+from src.constants import WTA_IDENTIFIER
+
+
+@pytest.fixture
+def orm_game():
+    tournament = ORMTournament(id='2020-1', name='Test', surface='Hard', draw_size=32, level='P', start_date=datetime(2020, 1, 6))
+    player = ORMPlayer(id=1, first_name='Test', last_name='Player', nationality='USA', dob=datetime(2000, 1, 1), hand='R')
+    performance = ORMPerformance(id=7, game_id='2020-1_1', player_id=1, player=player, won=True, aces=3, serve_points=None)
+    # no losing performance i.e. not yet added
+    return ORMGame(id='2020-1_1', tournament=tournament, w_performance=performance, l_performance=None,
+                   round='F', score='6-0 6-0', circuit=WTA_IDENTIFIER)
+
+
+@pytest.mark.parametrize('model, attr', [(Game, None), (Tournament, 'tournament'), (Player, 'w_performance.player')])
+def test_compile_encoder(orm_game, model, attr):
+    obj = orm_game
+    for name in (attr.split('.') if attr else []):
+        obj = getattr(obj, name)
+    # same content as going through the response model
+    assert compile_encoder(model)(obj) == model.from_orm(obj).dict()
+
+
+def test_compile_encoder_coercions(orm_game):
+    # performance id is Union[str, int] so pydantic outputs it as a string
+    assert compile_encoder(Game)(orm_game)['w_performance']['id'] == '7'
+    # stats are stored as integers but documented (and validated) as floats
+    assert isinstance(compile_encoder(Game)(orm_game)['w_performance']['aces'], float)
+
+
+def test_serializer_json_matches(orm_game):
+    fast, validated = Serializer(fast=True), Serializer(fast=False)
+    fast_response, validated_response = fast.from_orm(orm_game, Game), validated.from_orm(orm_game, Game)
+    assert json.loads(fast.dumps(fast_response)) == json.loads(validated.dumps(validated_response))
+
+    # payloads are interchangeable between replicas using either (i.e. through the redis cache)
+    assert validated.loads(fast.dumps(fast_response), Game) == validated_response
+    assert fast.loads(validated.dumps(validated_response), Game) == json.loads(fast.dumps(fast_response))
+
+
+def test_serializer_respond(orm_game):
+    response = Serializer(fast=True).respond({'id': 1})
+    assert response.body == b'{"id":1}'
+    assert response.media_type == 'application/json'
+
+    validated_response = Player.from_orm(orm_game.w_performance.player)
+    assert Serializer(fast=False).respond(validated_response) is validated_response
@@ -1,12 +1,24 @@
 import pytest
+import json
+import os
+import time
+import pandas as pd
 
-from src.db.db import CommandDB, QueryDB
+from src.db.db import CommandDB, QueryDB, DBClient
 from src.db.models.orm.player import Player
 from src.db.models.orm.tournament import Tournament
 from src.db.models.orm.game import Game
-from src.db.models.orm.performance import WPerformance, LPerformance
-from src.workers import add_player_data, add_game_data
+from src.db.models.orm.performance import Performance
+from src.db.models.orm.player_stats import PlayerStats
+from src.db.models.orm.head_to_head import HeadToHead
+from src.db.models.orm.rating import PlayerRating, RatedGame
+from src.workers import add_player_data, add_game_data, bootstrap_data, backfill_game_indexes, update_ratings
 from src.data.data_cleaning import get_game_id
+from src.data.data_formatting import batch_to_records
+from src.data import data_snapshot
+from src.data.data_snapshot import load_snapshot_games, MANIFEST_FILE
+from src.constants import SOURCE_COL, WTA_URL, ITF_URL, WTA_IDENTIFIER, ITF_IDENTIFIER, ELO_OVERALL, \
+    INGEST_FETCH_WORKERS
 
 
 @pytest.fixture(scope='module')
@@ -42,7 +54,306 @@ def test_add_game_data(command_db, sample_games, sample_players):
             filter(Tournament.id == game_row['tourney_id']).one()
         command_db.session.query(Game).\
             filter(Game.id == game_id).one()
-        command_db.session.query(WPerformance).\
-            filter(WPerformance.game_id == game_id).one()
-        command_db.session.query(LPerformance).\
-            filter(LPerformance.game_id == game_id).one()
+        assert command_db.session.query(Performance).\
+            filter(Performance.game_id == game_id).count() == 2
+
+
+def test_add_data_local(sqlite_client, local_players, local_games):
+    command_db = CommandDB(sqlite_client.session)
+    add_player_data(command_db, local_players, bulk=True)
+    add_game_data(command_db, local_games, bulk=True)
+
+    session = sqlite_client.session
+    assert session.query(Player).count() == local_players['200000'].nunique()
+    assert session.query(Tournament).count() == local_games['tourney_id'].nunique()
+    assert session.query(Game).count() == len(local_games)
+    assert session.query(Performance).count() == 2 * len(local_games)
+
+    # relationships resolve from the bulk loaded rows
+    game_row = local_games.iloc[0]
+    game = session.query(Game).filter(Game.id == get_game_id(game_row['tourney_id'], game_row['match_num'])).one()
+    assert game.tournament.name == game_row['tourney_name']
+    assert game.w_performance.player.id == game_row['winner_id']
+    assert game.l_performance.player.id == game_row['loser_id']
+
+
+def test_add_game_data_local_update(sqlite_client, local_players, local_games):
+    command_db = CommandDB(sqlite_client.session)
+    add_player_data(command_db, local_players, bulk=True)
+    add_game_data(command_db, local_games, bulk=True)
+
+    # nightly diff, an existing game with a corrected score
+    changed = local_games.iloc[[0]].copy()
+    changed['score'] = '6-0 6-0'
+    add_game_data(command_db, changed, bulk=False)
+
+    session = sqlite_client.session
+    game_id = get_game_id(changed['tourney_id'].iloc[0], changed['match_num'].iloc[0])
+    assert session.query(Game).filter(Game.id == game_id).one().score == '6-0 6-0'
+    assert session.query(Game).count() == len(local_games)
+    assert session.query(Performance).count() == 2 * len(local_games)
+
+
+def test_add_game_data_local_player_stats(sqlite_client, local_players, local_games):
+    command_db = CommandDB(sqlite_client.session)
+    add_player_data(command_db, local_players, bulk=True)
+    add_game_data(command_db, local_games, bulk=True)
+
+    def player_games(player_id):
+        stats = sqlite_client.session.query(PlayerStats).filter(PlayerStats.player_id == player_id).all()
+        return sum(row.games for row in stats), sum(row.wins for row in stats), sum(row.aces for row in stats)
+
+    game_row = local_games.iloc[0]
+    winner, loser = int(game_row['winner_id']), int(game_row['loser_id'])
+    played = local_games[(local_games['winner_id'] == winner) | (local_games['loser_id'] == winner)]
+    won = local_games[local_games['winner_id'] == winner]
+    expected = (len(played), len(won),
+                won['w_ace'].sum() + local_games.loc[local_games['loser_id'] == winner, 'l_ace'].sum())
+    assert player_games(winner) == pytest.approx(expected)
+    assert {row.year for row in sqlite_client.session.query(PlayerStats)} == {2020}
+
+    # replaying the diff recomputes rather than adds
+    add_game_data(command_db, local_games.iloc[[0]], bulk=False)
+    assert player_games(winner) == pytest.approx(expected)
+
+    # corrected result, both players' rows move
+    loser_before = player_games(loser)
+    swapped = local_games.iloc[[0]].copy()
+    swapped[['winner_id', 'loser_id']] = [[loser, winner]]
+    add_game_data(command_db, swapped, bulk=False)
+    assert player_games(winner)[:2] == (expected[0], expected[1] - 1)
+    assert player_games(loser)[:2] == (loser_before[0], loser_before[1] + 1)
+
+
+def test_add_game_data_local_head_to_head(sqlite_client, local_players, local_games):
+    command_db = CommandDB(sqlite_client.session)
+    add_player_data(command_db, local_players, bulk=True)
+    add_game_data(command_db, local_games, bulk=True)
+
+    session = sqlite_client.session
+    assert session.query(HeadToHead).count() == len(local_games)
+    assert session.query(HeadToHead).filter(HeadToHead.player_a_id >= HeadToHead.player_b_id).count() == 0
+
+    game_row = local_games.iloc[0]
+    game_id = get_game_id(game_row['tourney_id'], game_row['match_num'])
+    pair = sorted([int(game_row['winner_id']), int(game_row['loser_id'])])
+    met = ((local_games['winner_id'].isin(pair)) & (local_games['loser_id'].isin(pair))).sum()
+    assert session.query(HeadToHead).filter(HeadToHead.player_a_id == pair[0], HeadToHead.player_b_id == pair[1]).count() == met
+
+    # corrected result, the game keeps one row under the same pair
+    swapped = local_games.iloc[[0]].copy()
+    swapped[['winner_id', 'loser_id']] = [[game_row['loser_id'], game_row['winner_id']]]
+    add_game_data(command_db, swapped, bulk=False)
+    assert session.query(HeadToHead).count() == len(local_games)
+    h2h = session.query(HeadToHead).filter(HeadToHead.game_id == game_id).one()
+    assert [h2h.player_a_id, h2h.player_b_id] == pair
+
+
+def test_backfill_game_indexes(sqlite_client, local_players, local_games):
+    command_db, query_db = CommandDB(sqlite_client.session), QueryDB(sqlite_client.session)
+    add_player_data(command_db, local_players, bulk=True)
+    add_game_data(command_db, local_games, bulk=True)
+    stats, pairs = sqlite_client.session.query(PlayerStats).count(), sqlite_client.session.query(HeadToHead).count()
+
+    # db loaded before the tables existed
+    sqlite_client.session.query(PlayerStats).delete()
+    sqlite_client.session.query(HeadToHead).delete()
+    backfill_game_indexes(command_db, query_db, 2019, 2021)
+    assert sqlite_client.session.query(PlayerStats).count() == stats
+    assert sqlite_client.session.query(HeadToHead).count() == pairs
+
+
+def test_update_ratings_local(sqlite_client, local_players, local_games):
+    command_db, query_db = CommandDB(sqlite_client.session), QueryDB(sqlite_client.session)
+    add_player_data(command_db, local_players, bulk=True)
+    add_game_data(command_db, local_games.iloc[1:], bulk=True)
+
+    session = sqlite_client.session
+    update_ratings(command_db, query_db)
+    assert session.query(RatedGame).count() == len(local_games) - 1
+    overall = session.query(PlayerRating).filter(PlayerRating.surface == ELO_OVERALL).all()
+    assert sum(rating.games for rating in overall) == 2 * (len(local_games) - 1)
+    # elo is zero sum
+    assert sum(rating.rating for rating in overall) == pytest.approx(1500 * len(overall))
+
+    # nothing new, nothing changes
+    before = {(rating.player_id, rating.surface): rating.rating for rating in session.query(PlayerRating)}
+    update_ratings(command_db, query_db)
+    assert {(rating.player_id, rating.surface): rating.rating for rating in session.query(PlayerRating)} == before
+
+    # only the new game is applied
+    add_game_data(command_db, local_games.iloc[[0]], bulk=False)
+    update_ratings(command_db, query_db)
+    assert session.query(RatedGame).count() == len(local_games)
+    winner = int(local_games.iloc[0]['winner_id'])
+    rating = session.query(PlayerRating).filter(PlayerRating.player_id == winner, PlayerRating.surface == ELO_OVERALL).one()
+    assert rating.rating > before.get((winner, ELO_OVERALL), 1500)
+
+
+def test_bootstrap_data(sqlite_client, monkeypatch, local_players, local_games):
+    monkeypatch.setattr('src.workers.get_raw_players', lambda: local_players)
+    monkeypatch.setattr('src.workers.get_raw_games', lambda year_from, year_to, **urls: local_games if year_from == 2020 else None)
+
+    stats = bootstrap_data(CommandDB(sqlite_client.session), 'TESTSHA', 2019, 2021, snapshot_dir='')
+
+    # 2019 and 2021 have no games
+    assert stats.years == 1
+    assert stats.games == len(local_games)
+    assert {'fetch', 'format', 'load'} <= set(stats.seconds)
+    assert sqlite_client.session.query(Game).count() == len(local_games)
+    assert sqlite_client.session.query(Player).count() == local_players['200000'].nunique()
+
+
+def test_bootstrap_data_snapshot(tmp_path, monkeypatch, local_players, local_games):
+    pytest.importorskip('pyarrow')
+    snapshot_dir = str(tmp_path / 'snapshot')
+    monkeypatch.setattr('src.workers.get_raw_players', lambda: local_players)
+    monkeypatch.setattr('src.workers.get_raw_games', lambda year_from, year_to, **urls: local_games if year_from == 2020 else None)
+
+    # first run scrapes and writes the snapshot
+    first_db = DBClient(db_url=f"sqlite:///{tmp_path / 'first.db'}")
+    first_db.generate_schema()
+    bootstrap_data(CommandDB(first_db.session), 'TESTSHA', 2020, 2020, snapshot_dir=snapshot_dir)
+
+    def no_scraping(*args, **kwargs):
+        raise AssertionError('should load from snapshot')
+    monkeypatch.setattr('src.workers.get_raw_players', no_scraping)
+    monkeypatch.setattr('src.workers.get_raw_games', no_scraping)
+
+    # rebuild from the snapshot alone
+    rebuilt_db = DBClient(db_url=f"sqlite:///{tmp_path / 'rebuilt.db'}")
+    rebuilt_db.generate_schema()
+    bootstrap_data(CommandDB(rebuilt_db.session), 'TESTSHA', 2020, 2020, snapshot_dir=snapshot_dir)
+
+    for table in [Player, Tournament, Game, Performance]:
+        assert rebuilt_db.session.query(table).count() == first_db.session.query(table).count() > 0
+
+
+def test_bootstrap_data_snapshot_cross_year(tmp_path, monkeypatch, local_players, local_games):
+    pytest.importorskip('pyarrow')
+    snapshot_dir = str(tmp_path / 'snapshot')
+    scrape, scraped = games_by_year(local_games), []
+
+    def get_raw_games(year_from, year_to, **urls):
+        games = scrape(year_from, year_to, **urls)
+        # a tournament in this year's csv starting in december of the year before
+        early = games.iloc[:1].copy()
+        early['tourney_id'] = f'{year_from}-XMAS'
+        early['tourney_date'] = (year_from - 1) * 10000 + 1229
+        # written first, as the year before writes its own first partition
+        games = pd.concat([early, games], ignore_index=True)
+        scraped.append(games)
+        return games
+
+    write_parquet = data_snapshot._write_parquet
+
+    def slow_write_parquet(table, path):
+        # widens the window a partition shared by two years could be written concurrently in
+        time.sleep(0.05)
+        write_parquet(table, path)
+
+    monkeypatch.setattr('src.workers.get_raw_players', lambda: local_players)
+    monkeypatch.setattr('src.workers.get_raw_games', get_raw_games)
+    monkeypatch.setattr(data_snapshot, '_write_parquet', slow_write_parquet)
+
+    db = DBClient(db_url=f"sqlite:///{tmp_path / 'db.db'}")
+    db.generate_schema()
+    # years fetched concurrently
+    assert INGEST_FETCH_WORKERS > 1
+    bootstrap_data(CommandDB(db.session), 'TESTSHA', 2018, 2021, snapshot_dir=snapshot_dir)
+
+    raw = pd.concat(scraped, ignore_index=True)
+    expected = raw.groupby([raw['tourney_date'] // 10000, raw[SOURCE_COL]]).size().to_dict()
+    with open(os.path.join(snapshot_dir, MANIFEST_FILE)) as f:
+        partitions = json.load(f)['partitions']
+    assert {(year, circuit): count for year, circuit, count in partitions} == expected
+    assert len(partitions) == len(expected)
+    assert len(load_snapshot_games(snapshot_dir)) == len(raw)
+    # written in year order, the next year's december tournament after the year's own games
+    assert load_snapshot_games(snapshot_dir, 2018, 2018)['tourney_id'].iloc[-1] == '2019-XMAS'
+
+
+def games_by_year(local_games):
+    """Fake `get_raw_games`, the local games with ids and dates moved to the year asked for
+    """
+    def get_raw_games(year_from, year_to, wta_url=WTA_URL, itf_url=ITF_URL):
+        games = local_games.copy()
+        games['tourney_id'] = games['tourney_id'].str.replace('2020', str(year_from))
+        games['tourney_date'] = games['tourney_date'] - (2020 - year_from) * 10000
+        circuits = [circuit for url, circuit in [(wta_url, WTA_IDENTIFIER), (itf_url, ITF_IDENTIFIER)] if url is not None]
+        return games[games[SOURCE_COL].isin(circuits)].reset_index(drop=True)
+    return get_raw_games
+
+
+def test_bootstrap_data_checkpoints(sqlite_client, monkeypatch, local_players, local_games):
+    command_db, query_db = CommandDB(sqlite_client.session), QueryDB(sqlite_client.session)
+    monkeypatch.setattr('src.workers.get_raw_players', lambda: local_players)
+    monkeypatch.setattr('src.workers.get_raw_games', games_by_year(local_games))
+
+    bootstrap_data(command_db, 'TESTSHA', 2018, 2019, snapshot_dir='')
+
+    checkpoints = query_db.get_checkpoints()
+    assert {(checkpoint.year, checkpoint.circuit) for checkpoint in checkpoints} == \
+        {(year, circuit) for year in [2018, 2019] for circuit in [WTA_IDENTIFIER, ITF_IDENTIFIER]}
+    assert all(checkpoint.done and checkpoint.sha == 'TESTSHA' for checkpoint in checkpoints)
+    assert sum(checkpoint.games for checkpoint in checkpoints) == 2 * len(local_games)
+
+
+def test_bootstrap_data_resume(sqlite_client, monkeypatch, local_players, local_games):
+    command_db, query_db = CommandDB(sqlite_client.session), QueryDB(sqlite_client.session)
+    fetched, failing = [], {2019}
+    get_raw_games = games_by_year(local_games)
+
+    def fetch(year_from, year_to, **urls):
+        fetched.append((year_from, tuple(url is not None for url in urls.values())))
+        if year_from in failing:
+            raise ConnectionError('worker died')
+        return get_raw_games(year_from, year_to, **urls)
+
+    monkeypatch.setattr('src.workers.get_raw_players', lambda: local_players)
+    monkeypatch.setattr('src.workers.get_raw_games', fetch)
+
+    with pytest.raises(ConnectionError):
+        bootstrap_data(command_db, 'FIRSTSHA', 2018, 2020, snapshot_dir='')
+    checkpoints = query_db.get_checkpoints()
+    assert {(checkpoint.year, checkpoint.circuit) for checkpoint in checkpoints if checkpoint.done} == \
+        {(2018, WTA_IDENTIFIER), (2018, ITF_IDENTIFIER)}
+
+    # as if the wta 2019 partition had been done, only the itf partition is refetched
+    command_db.start_checkpoints(2019, [WTA_IDENTIFIER], 'FIRSTSHA')
+    command_db.complete_checkpoints(2019, {WTA_IDENTIFIER: 5})
+    fetched.clear()
+    failing.clear()
+    bootstrap_data(command_db, 'SECONDSHA', 2018, 2020, checkpoints=query_db.get_checkpoints(), snapshot_dir='')
+
+    assert fetched == [(2019, (False, True)), (2020, (True, True))]
+    assert all(checkpoint.done for checkpoint in query_db.get_checkpoints())
+    # partitions keep the sha they were started at
+    assert query_db.get_checkpoints()[0].sha == 'FIRSTSHA'
+    assert sqlite_client.session.query(Tournament).filter(Tournament.id.like('2019%')).count() > 0
+    assert sqlite_client.session.query(Game).filter(Game.id.like('2019-W-ITF%')).count() == 2
+    assert sqlite_client.session.query(Game).count() == 3 * len(local_games) - 5
+
+
+def test_bootstrap_data_resume_partial_year(sqlite_client, monkeypatch, local_players, local_games):
+    command_db, query_db = CommandDB(sqlite_client.session), QueryDB(sqlite_client.session)
+    monkeypatch.setattr('src.workers.get_raw_players', lambda: local_players)
+    monkeypatch.setattr('src.workers.get_raw_games', lambda year_from, year_to, **urls: local_games)
+
+    def load_game_batches(command_db, batches, bulk=False):
+        # dies part way through loading the year
+        command_db.ingest_rows(batch_to_records(batches[0]), Tournament, bulk=bulk)
+        raise MemoryError()
+
+    monkeypatch.setattr('src.workers.load_game_batches', load_game_batches)
+    with pytest.raises(MemoryError):
+        bootstrap_data(command_db, 'TESTSHA', 2020, 2020, snapshot_dir='')
+    assert not any(checkpoint.done for checkpoint in query_db.get_checkpoints())
+
+    # rows left by the interrupted run don't conflict
+    monkeypatch.undo()
+    monkeypatch.setattr('src.workers.get_raw_players', lambda: local_players)
+    monkeypatch.setattr('src.workers.get_raw_games', lambda year_from, year_to, **urls: local_games)
+    bootstrap_data(command_db, 'TESTSHA', 2020, 2020, checkpoints=query_db.get_checkpoints(), snapshot_dir='')
+    assert sqlite_client.session.query(Game).count() == len(local_games)
+    assert all(checkpoint.done for checkpoint in query_db.get_checkpoints())